@@ -2,6 +2,8 @@ __version__ = "3.2.1-dev"
 
 from .resource import JSONResource  # noqa: F401
 from .conf import APIConfig, ResourceConfig, BodyParameter, QueryParameter  # noqa: F401
-from .conf import FileParameter  # noqa: F401
+from .conf import FileParameter, RelatedResource  # noqa: F401
 from .exception import RestClientConfigurationError  # noqa: F401
-from .resource import API  # noqa: F401
+from .api import API  # noqa: F401
+from .timeouts import deadline  # noqa: F401
+from .scheduler import priority  # noqa: F401
@@ -0,0 +1,323 @@
+"""Contains the API class, the main point of contact for end users, which creates the
+resources of a REST API from the APIConfig and ResourceConfigs in a configuration module.
+
+"""
+
+import contextlib
+import logging
+import threading
+from typing import Optional
+
+# ================================================================================================
+# local imports
+from .balancer import LoadBalancer, LoadBalancing
+from .conf import APIConfig, LazyEndpoints, ResourceConfig
+from .exception import RestClientConfigurationError, InvalidResourceError
+from . import resource
+from .resource import Resource, _tenant_auth
+from .utils import LazyModule
+
+transport = LazyModule("qrest.transport")
+
+logger = logging.getLogger(__name__)
+
+
+# ================================================================================================
+class API:
+    """
+    This is the main point of contact for end users
+    """
+
+    # placeholder for subclassed resources
+    config = None
+    auth = None
+
+    def __init__(
+        self,
+        imported_module,
+        lazy: bool = False,
+        snapshot_dir: Optional[str] = None,
+        snapshot_key: Optional[str] = None,
+    ):
+        """Initialize an API from the configurations in the given imported module.
+
+        An API describes a REST server, and contains a list of resources. We
+        allow customization of the "resource class", which is basically a
+        wrapper around the response object: default is JSON, so we pre-made a
+        JSON resource class. Optionally this resource class handles
+        non-standard responses such as pagination or a specific response format
+        from which the payload needs to be derived
+
+        :param imported_module: the module that contains the APIConfig and the ResourceConfigs
+        :param lazy: if True, the configuration of each resource is only created, validated and
+            configured when the resource is first accessed, which shortens the construction of an
+            API with many resources. Configuration errors of a resource then surface on that access
+        :param snapshot_dir: the directory of the compiled snapshots of configuration modules.
+            When given, the validated configurations are loaded from the snapshot of the module
+            if its source has not changed, and the snapshot is written otherwise. Only the source
+            files of the configuration classes and their base classes are checked: settings that
+            come from elsewhere, e.g. from environment variables or from constants in another
+            module, stay as they were in the snapshot unless they are part of ``snapshot_key``
+        :param snapshot_key: the other inputs of the configuration, e.g. the values of the
+            environment variables it reads; a snapshot is only loaded for the same key
+
+        """
+
+        if lazy and snapshot_dir is not None:
+            raise RestClientConfigurationError("an API cannot be both lazy and use a snapshot")
+
+        # the registry is looked up in the resource module, where the API class used to be
+        registry = resource.ModuleClassRegistry(imported_module)
+
+        api_configs = registry.retrieve(APIConfig)
+        if not api_configs:
+            raise RestClientConfigurationError(
+                f"Imported module '{imported_module.__name__}' does not contain a subclass of "
+                "APIConfig."
+            )
+        elif len(api_configs) > 1:
+            raise RestClientConfigurationError(
+                f"Imported module '{imported_module.__name__}' contains more than 1 subclass of "
+                "APIConfig."
+            )
+
+        resource_configs = registry.retrieve(ResourceConfig)
+        for c in resource_configs:
+            if not hasattr(c, "name"):
+                raise RestClientConfigurationError(
+                    f"Imported class '{c.__name__}' does not have a 'name' attribute."
+                )
+
+        classes = api_configs + resource_configs
+        if lazy:
+            config = api_configs[0](LazyEndpoints({c.name: c for c in resource_configs}))
+        elif snapshot_dir is not None:
+            # snapshots are loaded on demand, like the modules they depend on
+            from .snapshot import load_snapshot, save_snapshot
+
+            endpoints = load_snapshot(imported_module, classes, snapshot_dir, snapshot_key)
+            if endpoints is not None:
+                config = api_configs[0](endpoints, compiled=True)
+            else:
+                config = api_configs[0]({c.name: c.create() for c in resource_configs})
+                save_snapshot(imported_module, classes, config, snapshot_dir, snapshot_key)
+        else:
+            config = api_configs[0]({c.name: c.create() for c in resource_configs})
+
+        self._initialize(config)
+
+    def _initialize(self, config):
+        """Initialize the current API from the given APIConfig.
+
+        :param config: The configuration object of the REST API resources
+        :type config: Subclass of APIConfig
+
+        """
+
+        # check
+        if not isinstance(config, APIConfig):
+            raise RestClientConfigurationError("configuration is not a APIConfig instance")
+
+        self.config = config
+        self.verifySSL = config.verify_ssl
+        self.auth = self._get_authentication_module()
+        self.session = transport.create_session()
+        self.balancer = None
+        if len(config.urls) > 1:
+            self.balancer = LoadBalancer(config.urls, config.load_balancing or LoadBalancing())
+
+        # with lazy endpoints, each resource is created on first access, see __getattr__
+        self._resource_lock = threading.Lock()
+        if isinstance(config.endpoints, LazyEndpoints):
+            return
+
+        #  process the endpoints
+        for name, item_config in self.config.endpoints.items():
+            setattr(self, name, self._create_resource(name, item_config))
+
+        # the relations between endpoints can only be checked when all endpoints are known
+        for name, item_config in self.config.endpoints.items():
+            self._check_relations(name, item_config)
+
+    def __getattr__(self, name: str):
+        """Create and return the resource with the given name on its first access, for an API
+        whose endpoints are lazy.
+
+        """
+        endpoints = self.config.endpoints if self.config is not None else None
+        if not isinstance(endpoints, LazyEndpoints) or name not in endpoints:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        with self._resource_lock:
+            resource = self.__dict__.get(name)
+            if resource is None:
+                item_config = endpoints[name]
+                self._check_relations(name, item_config)
+                resource = self._create_resource(name, item_config)
+                setattr(self, name, resource)
+        return resource
+
+    def _create_resource(self, name: str, item_config):
+        """Return the configured resource of the given endpoint."""
+        if not isinstance(item_config.processor, Resource):
+            raise RestClientConfigurationError(
+                f"defined resource class for {name} is not a Resource instance"
+            )
+        return self._create_rest_resource(
+            item_config.processor, resource_name=name, config=item_config, auth=self.auth
+        )
+
+    def _check_relations(self, name: str, item_config):
+        """Check that the relations of the given endpoint refer to existing endpoints and
+        parameters.
+
+        """
+        for relation_name, relation in item_config.relations.items():
+            if relation.resource not in self.config.endpoints:
+                raise RestClientConfigurationError(
+                    f"relation '{relation_name}' of resource '{name}' refers to unknown "
+                    f"resource '{relation.resource}'"
+                )
+            related_config = self.config.endpoints[relation.resource]
+            if relation.parameter not in related_config.all_parameters:
+                raise RestClientConfigurationError(
+                    f"relation '{relation_name}' of resource '{name}' refers to unknown "
+                    f"parameter '{relation.parameter}' of resource '{relation.resource}'"
+                )
+
+    # ---------------------------------------------------------------------------------------------
+    @property
+    def resources(self):
+        """ Lists the available resources for this REST API
+
+            :return: A list of the available resources for this REST API
+            :rtype: ``list(string_type)``
+        """
+
+        if isinstance(self.config.endpoints, LazyEndpoints):
+            return sorted(self.config.endpoints)
+
+        resources = []
+        fieldnames = dir(self)
+        for fieldname in fieldnames:
+            # this exclusion is to prevent endless loops
+            if fieldname == "resources":
+                continue
+            field = getattr(self, fieldname)
+            if isinstance(field, Resource):
+                resources.append(field.name)
+        return resources
+
+    # ---------------------------------------------------------------------------------------------
+    def circuit_states(self) -> dict:
+        """ Return the state of the circuit breaker of each resource that has one.
+
+            :return: a dictionary that maps the name of each resource to the state of its circuit
+                breaker: "closed", "open" or "half-open"
+        """
+        states = {}
+        for name in self.config.endpoints:
+            # a lazy resource that has not been accessed has not sent any request either
+            resource = self.__dict__.get(name)
+            if resource is not None and resource._circuit_breaker is not None:
+                states[name] = resource._circuit_breaker.state
+        return states
+
+    # ---------------------------------------------------------------------------------------------
+    @contextlib.contextmanager
+    def as_tenant(self, auth):
+        """ Send the requests of the calls in the with block with the given authentication instead
+            of the authentication of the API.
+
+            The tenants of an API share its resources, configuration and connections, so a single
+            API can serve many tenants. Like a deadline, the authentication also applies to the
+            requests that are sent from other threads and asyncio tasks on behalf of the calls,
+            such as the queries of a BatchLoader, which collects the keys of each tenant in
+            separate batches::
+
+                auth = api.create_auth()
+                auth.set_credentials(username="tenant", password="secret")
+                with api.as_tenant(auth):
+                    posts = api.all_posts()
+
+            :param auth: the authentication of the tenant, e.g. the result of
+                :meth:`create_auth`, or any other authentication that Requests accepts
+        """
+        token = _tenant_auth.set({**_tenant_auth.get(), self: auth})
+        try:
+            yield
+        finally:
+            _tenant_auth.reset(token)
+
+    # ---------------------------------------------------------------------------------------------
+    def create_auth(self):
+        """ Return a new instance of the authentication module of the API, e.g. to hold the
+            credentials of a tenant, or None if the API has no authentication.
+
+        """
+        return self._get_authentication_module()
+
+    # ---------------------------------------------------------------------------------------------
+    def replica_states(self) -> dict:
+        """ Return the health of each base URL of the API.
+
+            :return: a dictionary that maps each base URL to "healthy" or "ejected". For an API
+                with a single base URL, that URL is always healthy
+        """
+        if self.balancer is None:
+            return {self.config.urls[0]: "healthy"}
+        return self.balancer.states()
+
+    # ---------------------------------------------------------------------------------------------
+    def _create_rest_resource(self, processor, resource_name, config, auth=None):
+        """ This function is used to dynamically create request functions for a specified REST API resource
+
+            :param resource: A string that represents the REST API resource
+            :type resource: ``string_type``
+
+            :return: A function that builds and sends a request for the specified REST API resource
+                and validates the function call
+            :rtype: ``list(string_type)``
+        """
+
+        if not config:
+            raise InvalidResourceError(name=type(self).__name__, resource=resource_name)
+
+        if not isinstance(processor, Resource):
+            raise RestClientConfigurationError("processor must be a Resource")
+
+        par = config.parameters
+        b_names = [par[x].name for x in par if par[x].call_location == "body"]
+
+        #  By default, body parameters are added to the body payload as a key-value pair,
+        #  assuming the body is a dictionary. To take a list or string as payload, the
+        #  name attribute of a body parameter should be set to None. In that case, only
+        #  one body parameter is allowed.
+        if b_names.count(None) > 0 and len(b_names) > 1:
+            msg = "No additional body parameters allowed if body parameter " \
+                  "has name attribute with value None."
+            raise RestClientConfigurationError(msg)
+
+        processor.configure(
+            name=resource_name, config=config, server_url=self.config.urls[0], auth=auth, api=self
+        )
+        return processor
+
+    def _get_authentication_module(self):
+        """Return authentication module."""
+        try:
+            auth_config = self.config.authentication
+        except AttributeError:
+            # default to no authentication
+            return None
+        else:
+            if auth_config is None:
+                return None
+            # the authentication modules are only imported when an API uses one
+            from .auth import AuthConfig
+
+            if not isinstance(auth_config, AuthConfig):
+                raise RestClientConfigurationError(
+                    "authentication attribute is not an instance of AuthConfig"
+                )
+            auth_module = auth_config.authentication_module
+            return auth_module(self, auth_config)
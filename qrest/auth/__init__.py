@@ -5,19 +5,85 @@ This module handle authentication against a variety of REST services
 
 import os
 import logging
+import threading
 from typing import Optional
 from netrc import netrc
 from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
 
 from abc import ABC, abstractmethod
 
 # ================================================================================================
 # local imports
+from .. import timeouts
 from ..exception import RestCredentailsError
 
+# like the sessions of the API, those of the authentication modules do not warn about unverified
+# HTTPS requests
+from .. import transport  # noqa: F401
+
 logger = logging.getLogger(__name__)
 
+_netrc_cache = {}  # path -> (file status, parsed netrc file)
+_netrc_cache_lock = threading.Lock()
+
+_sessions = {}  # maximum number of connections per host -> shared session
+_sessions_lock = threading.Lock()
+
+
+# ==========================================================================================
+def load_netrc(path: str) -> netrc:
+    """
+    Return the parsed netrc file at the given path. The parsed files are shared by all API
+    instances in the process, and a file is only parsed again when its modification time, size or
+    inode has changed.
+
+    :param path: The path to the netrc file
+    """
+    status = os.stat(path)
+    key = (status.st_mtime_ns, status.st_size, status.st_ino)
+    with _netrc_cache_lock:
+        cached = _netrc_cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    parsed = netrc(file=path)
+    with _netrc_cache_lock:
+        _netrc_cache[path] = (key, parsed)
+    return parsed
+
+
+# ==========================================================================================
+def shared_session(max_connections: int) -> requests.Session:
+    """
+    Return the session that sends the requests of the authentication modules that keep at most
+    the given number of connections to each authentication server open. The session is shared by
+    all authentication modules in the process, so the number of connections to an authentication
+    server does not grow with the number of API instances or tenants.
+
+    :param max_connections: the maximum number of connections per host
+    """
+    with _sessions_lock:
+        session = _sessions.get(max_connections)
+        if session is None:
+            adapter = HTTPAdapter(pool_maxsize=max_connections)
+            session = _sessions[max_connections] = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        return session
+
+
+def close_sessions():
+    """
+    Close the connections of the shared sessions of the authentication modules. A request that
+    follows creates a new session.
+    """
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
 
 # ==========================================================================================
 class RESTAuthentication(ABC, requests.auth.HTTPBasicAuth):
@@ -45,6 +111,30 @@ class RESTAuthentication(ABC, requests.auth.HTTPBasicAuth):
         self.rest_client = rest_client
         self.auth_config_object = auth_config_object
 
+    @property
+    def session(self) -> requests.Session:
+        """
+        returns the session that sends the requests of the authentication module, which keeps
+        its connections to the authentication server open for the requests that follow, see
+        :func:`shared_session`
+        """
+        config = self.auth_config_object or AuthConfig
+        return shared_session(config.max_connections)
+
+    def close(self):
+        """
+        releases the resources of the authentication module. The shared session stays open for
+        the other authentication modules, see :func:`close_sessions`
+        """
+
+    def _timeout(self):
+        """
+        returns the timeout of a request of the authentication module: the timeouts of the
+        AuthConfig, limited by the deadline of the current call
+        """
+        config = self.auth_config_object or AuthConfig
+        return timeouts.request_timeout(config.connect_timeout, config.read_timeout)
+
     @property
     def login_tuple(self):
         """
@@ -62,6 +152,16 @@ class RESTAuthentication(ABC, requests.auth.HTTPBasicAuth):
         """
         return credential is not None and credential.strip() != ""
 
+    @staticmethod
+    def can_resend(request):
+        """Return True iff the given prepared request can be sent once more.
+
+        A request whose body is a file or a generator cannot be resent, since the first attempt
+        has already read the body.
+
+        """
+        return request.body is None or isinstance(request.body, (bytes, str))
+
     def are_valid_credentials(self, username, password):
         """Return True iff both the given credentials are valid.
 
@@ -150,8 +250,8 @@ class NetRCAuth(RESTAuthentication):
                 self.netrc_path = os.path.expanduser(netrc_path)
             except AttributeError as e:
                 raise ValueError('could not expand netrc-path. error is "%s"' % str(e))
-            nrc = netrc(file=self.netrc_path)
-            host = urlparse(self.rest_client.config.url).hostname
+            nrc = load_netrc(self.netrc_path)
+            host = urlparse(self.rest_client.config.urls[0]).hostname
             try:
                 (netrc_login, _, netrc_password) = nrc.authenticators(host)
             except TypeError:
@@ -215,7 +315,12 @@ class AuthConfig(object):
     Configuration and validation for custom authentication schemas
     """
 
-    pass
+    # the timeouts in seconds of the requests to the authentication server
+    connect_timeout = 5
+    read_timeout = 30
+
+    # the maximum number of connections to the authentication server that are kept open
+    max_connections = 4
 
 
 # ==========================================================================================
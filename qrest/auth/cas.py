@@ -1,6 +1,17 @@
+import contextlib
 import os
 import logging
-import requests
+import math
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, where the TGT file is not locked
+    fcntl = None
 
 from ..exception import RestCredentailsError, RestClientConfigurationError
 from . import NetRCAuth, RESTAuthentication, AuthConfig
@@ -22,6 +33,190 @@ class CASServiceTicketError(CASCredentailsError):
     pass
 
 
+PREFETCHED_TICKET_LIFETIME = 10.0
+"""the number of seconds a prefetched service ticket is kept in the pool when the CasAuthConfig
+has no ticket_lifetime: the default lifetime of a service ticket on a CAS server"""
+
+
+# ==========================================================================================
+class ServiceTicketPool:
+    """
+    Pool of service tickets that a background thread requests ahead of time, so a request can
+    take a ticket without waiting for the CAS server.
+
+    The pool holds enough tickets to cover the requests that arrive while a ticket is requested,
+    estimated from the observed request rate and the duration of a ticket request, up to its
+    maximum size. A request that finds the pool empty requests a ticket itself.
+    """
+
+    # the weight of a new observation in the moving averages of the rate and the duration
+    smoothing = 0.2
+
+    # the number of seconds to wait after a ticket request failed, which doubles after each
+    # consecutive failure up to the maximum
+    retry_delay = 1.0
+    max_retry_delay = 30.0
+
+    # the number of consecutive failed ticket requests after which the background thread stops,
+    # until the next call of take starts it again
+    max_failures = 5
+
+    def __init__(
+        self,
+        request_ticket: Callable[[], str],
+        max_size: int,
+        ticket_lifetime: Optional[float] = None,
+    ):
+        """
+        :param request_ticket: The function that requests a new service ticket from the CAS server
+        :param max_size: The maximum number of tickets in the pool
+        :param ticket_lifetime: The number of seconds after which a ticket in the pool is
+            discarded, or None to keep it until it is used
+        """
+        self.request_ticket = request_ticket
+        self.max_size = max_size
+        self.ticket_lifetime = ticket_lifetime
+
+        self._tickets = deque()  # (ticket, time of the request) pairs, the oldest first
+        self._rate = 0.0  # the average number of requests per second
+        self._duration = None  # the average duration of a ticket request in seconds
+        self._last_take = None
+        self._failures = 0  # the number of consecutive failed ticket requests
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    # -------------------------------------------------------------------------------------
+    @property
+    def size(self) -> int:
+        """Return the number of tickets in the pool."""
+        with self._condition:
+            return len(self._tickets)
+
+    # -------------------------------------------------------------------------------------
+    @property
+    def target_size(self) -> int:
+        """Return the number of tickets the background thread keeps in the pool."""
+        if self._duration is None:
+            return 1
+        size = math.ceil(self._rate * self._duration) + 1
+        return max(1, min(self.max_size, size))
+
+    # -------------------------------------------------------------------------------------
+    def take(self) -> str:
+        """Return a ticket from the pool, or a new ticket if the pool is empty."""
+        with self._condition:
+            self._record_take()
+            self._discard_expired()
+            ticket = self._tickets.popleft()[0] if self._tickets else None
+            self._start()
+            self._condition.notify_all()
+        if ticket is not None:
+            return ticket
+
+        logger.debug("[CAS] service ticket pool is empty")
+        return self._request()
+
+    # -------------------------------------------------------------------------------------
+    def clear(self):
+        """Discard the tickets in the pool, e.g. because the ticket granting ticket changed."""
+        with self._condition:
+            self._tickets.clear()
+
+    # -------------------------------------------------------------------------------------
+    def close(self):
+        """Stop the background thread and discard the tickets in the pool. The next call of take
+        starts a new background thread."""
+        with self._condition:
+            self._closed = True
+            self._tickets.clear()
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        with self._condition:
+            self._thread = None
+            self._closed = False
+
+    # -------------------------------------------------------------------------------------
+    def _record_take(self):
+        now = time.monotonic()
+        if self._last_take is not None:
+            rate = 1 / max(now - self._last_take, 1e-3)
+            self._rate += self.smoothing * (rate - self._rate)
+        self._last_take = now
+
+    # -------------------------------------------------------------------------------------
+    def _discard_expired(self):
+        if self.ticket_lifetime is None:
+            return
+        oldest = time.monotonic() - self.ticket_lifetime
+        while self._tickets and self._tickets[0][1] <= oldest:
+            self._tickets.popleft()
+
+    # -------------------------------------------------------------------------------------
+    def _start(self):
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(
+                target=self._refill, name="qrest-cas-tickets", daemon=True
+            )
+            self._thread.start()
+
+    # -------------------------------------------------------------------------------------
+    def _request(self) -> str:
+        start = time.monotonic()
+        try:
+            ticket = self.request_ticket()
+        except Exception:
+            with self._condition:
+                self._failures += 1
+            raise
+        duration = time.monotonic() - start
+        with self._condition:
+            self._failures = 0
+            if self._duration is None:
+                self._duration = duration
+            else:
+                self._duration += self.smoothing * (duration - self._duration)
+        return ticket
+
+    # -------------------------------------------------------------------------------------
+    def _refill(self):
+        """Is run by the background thread, which requests tickets while the pool is smaller
+        than its target size, and backs off when the ticket requests fail."""
+        while True:
+            with self._condition:
+                while not self._closed and len(self._tickets) >= self.target_size:
+                    self._condition.wait()
+                if self._closed:
+                    return
+            try:
+                ticket = self._request()
+            except Exception as e:
+                logger.debug("[CAS] could not prefetch a service ticket: %s", e)
+                with self._condition:
+                    if self._failures >= self.max_failures:
+                        logger.debug("[CAS] stopped prefetching after %d failures", self._failures)
+                        self._thread = None
+                        return
+                    self._back_off()
+                continue
+            with self._condition:
+                if not self._closed:
+                    self._tickets.append((ticket, time.monotonic()))
+
+    # -------------------------------------------------------------------------------------
+    def _back_off(self):
+        """Wait, with the lock held, until the delay after the consecutive failures has passed
+        or the pool is closed. Calls of take do not shorten the wait."""
+        delay = min(self.retry_delay * 2 ** (self._failures - 1), self.max_retry_delay)
+        end = time.monotonic() + delay
+        remaining = delay
+        while not self._closed and remaining > 0:
+            self._condition.wait(remaining)
+            remaining = end - time.monotonic()
+
+
 # ==========================================================================================
 
 
@@ -44,7 +239,7 @@ class CASAuth(RESTAuthentication):
 
         """
 
-        super(CASAuth, self).__init__(rest_client)
+        super(CASAuth, self).__init__(rest_client, auth_config_object)
 
         config = auth_config_object
 
@@ -56,6 +251,30 @@ class CASAuth(RESTAuthentication):
         self.tgt_volatile_storage = False
         self.tgt_file_name = None
         self.__ticket_granting_ticket = None  # content of the TGT
+        self._tgt_file_cache = None  # (file status, TGT) of the TGT file last read or written
+
+        # the service ticket that is reused until it expires or the server rejects it
+        self.ticket_lifetime = config.ticket_lifetime
+        self._service_ticket = None
+        self._service_ticket_expires_at = None
+        self._service_ticket_lock = threading.Lock()
+        self._ticket_pool = None
+        if config.prefetch_tickets:
+            lifetime = config.ticket_lifetime
+            if lifetime is None:
+                lifetime = PREFETCHED_TICKET_LIFETIME
+            self._ticket_pool = ServiceTicketPool(
+                self.request_new_service_ticket, config.prefetch_tickets, lifetime
+            )
+
+    # -------------------------------------------------------------------------------------
+    def close(self):
+        """
+        stops the thread that prefetches service tickets
+        """
+        if self._ticket_pool is not None:
+            self._ticket_pool.close()
+        super().close()
 
     # -------------------------------------------------------------------------------------
     def set_credentials(
@@ -157,8 +376,9 @@ class CASAuth(RESTAuthentication):
             self.ticket_granting_ticket = self.request_new_tgt(username, password)
 
         # ok, we should have a TGT, but it may be outdated or otherwise bad
+        self.invalidate_service_ticket()
         try:
-            self.request_new_service_ticket()
+            self.service_ticket()
         except CASServiceTicketError as e:
             # we could not get a service ticket, lets try a new tgt
             logger.debug("[CAS] could not get service ticket with old TGT, try to get a new one")
@@ -171,7 +391,7 @@ class CASAuth(RESTAuthentication):
                 )
             try:
                 self.ticket_granting_ticket = self.request_new_tgt(username, password)
-                self.request_new_service_ticket()
+                self.service_ticket()
             except CASGrantingTicketError as e2:
                 raise RestCredentailsError(
                     '[CAS] could not get TGT while using netrc credentials. Exact error msg="%s"'
@@ -207,8 +427,11 @@ request to the REST end-point.
             logger.debug("[CAS] No granting ticket available while asking for a service ticket")
             raise CASServiceTicketError("[CAS] No granting ticket available")
 
-        response = requests.post(
-            url=self.ticket_granting_ticket, data=body, verify=self.verify_ssl
+        response = self.session.post(
+            url=self.ticket_granting_ticket,
+            data=body,
+            verify=self.verify_ssl,
+            timeout=self._timeout(),
         )
         if not response.ok:
             logger.debug("[CAS] Service ticket request failed")
@@ -221,6 +444,45 @@ request to the REST end-point.
 
         return response.text
 
+    # -------------------------------------------------------------------------------------
+    def service_ticket(self) -> str:
+        """Return the cached service ticket, or request a new one if there is none or if it has
+        expired.
+
+        Threads that need a new service ticket at the same time share a single request. When
+        service tickets are prefetched, each call returns a different ticket from the pool.
+
+        :return: the service ticket
+        :rtype: ``string_type``
+        """
+        if self._ticket_pool is not None:
+            return self._ticket_pool.take()
+        with self._service_ticket_lock:
+            expires_at = self._service_ticket_expires_at
+            if self._service_ticket is None or (
+                expires_at is not None and time.monotonic() >= expires_at
+            ):
+                self._service_ticket = self.request_new_service_ticket()
+                if self.ticket_lifetime is None:
+                    self._service_ticket_expires_at = None
+                else:
+                    self._service_ticket_expires_at = time.monotonic() + self.ticket_lifetime
+            return self._service_ticket
+
+    # -------------------------------------------------------------------------------------
+    def invalidate_service_ticket(self, service_ticket: Optional[str] = None):
+        """Drop the cached service ticket, so the next request gets a new one.
+
+        :param service_ticket: only drop the cached service ticket if it is this one, so a ticket
+            that another thread has just renewed is kept
+        """
+        if service_ticket is None and self._ticket_pool is not None:
+            self._ticket_pool.clear()
+        with self._service_ticket_lock:
+            if service_ticket is None or service_ticket == self._service_ticket:
+                self._service_ticket = None
+                self._service_ticket_expires_at = None
+
     # -------------------------------------------------------------------------------------
     @property
     def ticket_granting_ticket(self):
@@ -250,19 +512,74 @@ request to the REST end-point.
                     os.mkdir(dirname, 0o700)
                 return None
             else:
-                with open(self.tgt_file_name, "r") as tgt_file:
-                    tgt = tgt_file.read().strip()
-                logger.debug(
-                    "[CAS] Reading TGT from file: contents are '%s'", tgt
-                )  # printing credentials here!
-                if tgt == "":
-                    os.remove(self.tgt_file_name)
-                    raise CASGrantingTicketError(
-                        "[CAS] TGT file at '%s' was empty and has been removed."
-                        % self.tgt_file_name
-                    )
-                else:
-                    return tgt
+                return self._read_tgt_file()
+
+    # -------------------------------------------------------------------------------------
+    def _read_tgt_file(self):
+        """
+        Return the TGT in the file, which is only read again when its modification time, size or
+        inode has changed since it was last read or written.
+        """
+        try:
+            status = self._tgt_file_status()
+        except FileNotFoundError:
+            return None
+        if self._tgt_file_cache is not None and self._tgt_file_cache[0] == status:
+            return self._tgt_file_cache[1]
+
+        with open(self.tgt_file_name, "r") as tgt_file:
+            tgt = tgt_file.read().strip()
+        logger.debug(
+            "[CAS] Reading TGT from file: contents are '%s'", tgt
+        )  # printing credentials here!
+        if tgt == "":
+            self._tgt_file_cache = None
+            os.remove(self.tgt_file_name)
+            raise CASGrantingTicketError(
+                "[CAS] TGT file at '%s' was empty and has been removed." % self.tgt_file_name
+            )
+        self._tgt_file_cache = (status, tgt)
+        return tgt
+
+    # -------------------------------------------------------------------------------------
+    def _write_tgt_file(self, tgt):
+        """
+        Replace the TGT file with one that contains the given TGT. The new file is written next to
+        it and renamed, so other processes either read the old or the new TGT, and processes that
+        write at the same time take turns on an advisory lock.
+        """
+        tgt_dir = os.path.dirname(self.tgt_file_name)
+        if not os.path.isdir(tgt_dir):
+            os.makedirs(tgt_dir)
+        with self._tgt_file_lock():
+            fd, temp_name = tempfile.mkstemp(dir=tgt_dir, prefix=".tgt-")
+            try:
+                with os.fdopen(fd, "w") as tgt_file:
+                    tgt_file.write(tgt)
+                os.replace(temp_name, self.tgt_file_name)
+            except BaseException:
+                os.remove(temp_name)
+                raise
+            self._tgt_file_cache = (self._tgt_file_status(), tgt)
+
+    # -------------------------------------------------------------------------------------
+    @contextlib.contextmanager
+    def _tgt_file_lock(self):
+        """Hold an exclusive advisory lock on the lock file next to the TGT file."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.tgt_file_name + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # -------------------------------------------------------------------------------------
+    def _tgt_file_status(self):
+        status = os.stat(self.tgt_file_name)
+        return (status.st_mtime_ns, status.st_size, status.st_ino)
 
     # -------------------------------------------------------------------------------------
     @ticket_granting_ticket.setter
@@ -286,13 +603,7 @@ request to the REST end-point.
         else:
             # tgt is on file on disk
             logger.debug("[CAS] TGT URI is '%s'", tgt)
-            tgt_dir = os.path.dirname(self.tgt_file_name)
-            if not os.path.isdir(tgt_dir):
-                os.makedirs(tgt_dir)
-            if os.path.isfile(self.tgt_file_name):
-                os.remove(self.tgt_file_name)
-            with open(self.tgt_file_name, "w") as tgt_file:
-                tgt_file.write(tgt)
+            self._write_tgt_file(tgt)
 
     # -------------------------------------------------------------------------------------
     def request_new_tgt(self, username, password):
@@ -309,10 +620,11 @@ request to the REST end-point.
 
         logger.debug("[CAS] Renewing granting ticket")
         ticket_url = "{server}/{path}".format(server=self.server, path=self.ticket_path)
-        response = requests.post(
+        response = self.session.post(
             url=ticket_url,
             data={"username": username, "password": password},
             verify=self.verify_ssl,
+            timeout=self._timeout(),
         )
 
         if response.status_code == 401:
@@ -340,11 +652,50 @@ request to the REST end-point.
         to it.
 
         """
-        service_ticket = self.request_new_service_ticket()
+        service_ticket = self.service_ticket()
         logger.debug("[CAS] add service ticket to request header")
         r.headers["Authorization"] = "CAS {service_ticket}".format(service_ticket=service_ticket)
+        r.register_hook("response", self._handle_401)
         return r
 
+    # -------------------------------------------------------------------------------------
+    def _handle_401(self, response, **kwargs):
+        """Is called by the requests library with the response to a request.
+
+        When the server no longer accepts the service ticket, send the request once more with a
+        new service ticket. The prefetched tickets were requested no later than the rejected one,
+        so they are discarded and the new ticket is requested from the CAS server.
+
+        """
+        if response.status_code != 401:
+            return response
+
+        rejected = response.request.headers.get("Authorization", "")[len("CAS "):]
+        logger.debug("[CAS] service ticket was rejected, renew it and resend the request")
+        self.invalidate_service_ticket(rejected)
+        if self._ticket_pool is not None:
+            self._ticket_pool.clear()
+        if not self.can_resend(response.request):
+            logger.debug("[CAS] the body of the request cannot be sent again")
+            return response
+
+        # consume the content, so the connection can be reused
+        response.content
+        response.close()
+        request = response.request.copy()
+        request.deregister_hook("response", self._handle_401)
+        if self._ticket_pool is not None:
+            service_ticket = self.request_new_service_ticket()
+        else:
+            service_ticket = self.service_ticket()
+        request.headers["Authorization"] = "CAS {service_ticket}".format(
+            service_ticket=service_ticket
+        )
+        new_response = response.connection.send(request, **kwargs)
+        new_response.history.append(response)
+        new_response.request = request
+        return new_response
+
 
 # ==========================================================================================
 class CasAuthConfig(AuthConfig):
@@ -355,7 +706,7 @@ class CasAuthConfig(AuthConfig):
     authentication_module = CASAuth
 
     # -------------------------------------------------------------------------------------
-    def __init__(self, path, service_name):
+    def __init__(self, path, service_name, ticket_lifetime=None, prefetch_tickets=0):
         """
         :param path: The absolute path for the ticket granting tickets
         :type path: ``list``
@@ -363,7 +714,30 @@ class CasAuthConfig(AuthConfig):
         :param service: The service name used to authenticate with the CAS end-point
         :type service: ``string_type``
 
+        :param ticket_lifetime: The number of seconds a service ticket is reused, or None to reuse
+            it until the REST end-point rejects it. With 0, each request gets a new service ticket
+        :type ticket_lifetime: ``float_or_none``
+
+        :param prefetch_tickets: The maximum number of single-use service tickets that a
+            background thread requests ahead of time, or 0 to reuse a single service ticket. A
+            prefetched ticket is discarded after ticket_lifetime seconds, or after
+            PREFETCHED_TICKET_LIFETIME seconds when ticket_lifetime is None, so it cannot be 0
+        :type prefetch_tickets: ``int``
+
         """
 
+        if ticket_lifetime is not None and (
+            not isinstance(ticket_lifetime, (int, float)) or ticket_lifetime < 0
+        ):
+            raise RestClientConfigurationError("ticket_lifetime is not a positive number or 0")
+        if not isinstance(prefetch_tickets, int) or prefetch_tickets < 0:
+            raise RestClientConfigurationError("prefetch_tickets is not a positive integer or 0")
+        if prefetch_tickets and ticket_lifetime == 0:
+            raise RestClientConfigurationError(
+                "prefetched service tickets need a ticket_lifetime that is not 0"
+            )
+
         self.path = path
         self.service_name = service_name
+        self.ticket_lifetime = ticket_lifetime
+        self.prefetch_tickets = prefetch_tickets
@@ -0,0 +1,318 @@
+import os
+import logging
+import math
+import threading
+import time
+from typing import Optional
+
+from ..exception import (
+    RestCredentailsError,
+    RestClientConfigurationError,
+    RestDeadlineExceededError,
+)
+from .. import timeouts
+from . import NetRCAuth, RESTAuthentication, AuthConfig
+from ..utils import URLValidator
+
+
+logger = logging.getLogger(__name__)
+
+
+class OAuth2TokenError(RestCredentailsError):
+    pass
+
+
+# ==========================================================================================
+
+
+class OAuth2Auth(RESTAuthentication):
+    """
+    Subclass of the RESTAuthentication that requests an access token from an OAuth2 token
+    end-point with the client credentials grant, and sends it as bearer token.
+
+    The token is reused until shortly before it expires. Only one thread at a time requests a new
+    token: the other threads keep using the token while it is still valid, or wait for the new one.
+    """
+
+    # -------------------------------------------------------------------------------------
+    def __init__(self, rest_client, auth_config_object):
+        """
+        OAuth2Auth constructor
+
+        :param rest_client: A reference to the RESTclient object
+        :type rest_client: ``RESTclient``
+
+        :param auth_config_object: The configuration object
+        :type auth_config_object: ``AuthConfig``
+
+        """
+
+        super(OAuth2Auth, self).__init__(rest_client, auth_config_object)
+
+        config = auth_config_object
+        self.token_url = config.token_url
+        self.scope = config.scope
+        self.refresh_margin = config.refresh_margin
+        self.verify_ssl = True
+
+        self._access_token = None
+        self._expires_at = None  # None if the token does not expire
+        self._refresh_at = None
+        self._refreshing = False
+        self._condition = threading.Condition()
+
+    # -------------------------------------------------------------------------------------
+    def set_credentials(
+        self,
+        client_id=None,
+        client_secret=None,
+        verify_ssl=True,
+        netrc_path=os.path.expanduser("~/.netrc"),
+    ):
+        """
+        Allow logins via either the client credentials or netRC, where the login of the host of
+        the API is the client ID and its password the client secret.
+        If neither is available, raise error
+
+        :param client_id: The client ID registered with the OAuth2 server
+        :type client_id: ``string_type_or_none``
+
+        :param client_secret: The client secret registered with the OAuth2 server
+        :type client_secret: ``string_type_or_none``
+
+        :param verify_ssl: Whether the OAuth2 client should verify SSL certificates upon making
+            requests
+        :type verify_ssl: ``bool``  or `` string_type``
+
+        :param netrc_path: The path to Netrc
+        :type netrc_path: ``string_type_or_none``
+        """
+
+        self.verify_ssl = verify_ssl
+        if not self.are_valid_credentials(client_id, client_secret) and netrc_path:
+            parent_auth = NetRCAuth(rest_client=self.rest_client)
+            try:
+                parent_auth.set_credentials(netrc_path=netrc_path)
+            except (ValueError, OSError) as e:
+                raise RestCredentailsError(
+                    "[OAuth2] no client credentials are provided via parameters or in netrc "
+                    'file. Exact error msg="%s"' % str(e)
+                )
+            client_id = parent_auth.username
+            client_secret = parent_auth.password
+        if not self.are_valid_credentials(client_id, client_secret):
+            raise RestCredentailsError("no client ID or client secret is provided")
+
+        self.username = client_id
+        self.password = client_secret
+
+        # request a token right away, so bad credentials are reported here
+        self.invalidate_access_token()
+        self.access_token()
+
+        self.credentials_are_set = True
+
+    # -------------------------------------------------------------------------------------
+    def request_new_token(self):
+        """
+        Retrieves a new access token from the token end-point.
+
+        :return: The access token and the number of seconds until it expires, or None if the
+            server did not specify it as a number
+        :rtype: ``tuple``
+        """
+        logger.debug("[OAuth2] Requesting new access token")
+        body = {"grant_type": "client_credentials"}
+        if self.scope:
+            body["scope"] = self.scope
+
+        response = self.session.post(
+            url=self.token_url,
+            data=body,
+            auth=self.login_tuple,
+            verify=self.verify_ssl,
+            timeout=self._timeout(),
+        )
+        if not response.ok:
+            logger.debug("[OAuth2] Access token request failed")
+            raise OAuth2TokenError(
+                "Cannot get an access token from '{url}'. HTTP status code: '{status}'".format(
+                    url=self.token_url, status=response.status_code
+                )
+            )
+
+        try:
+            content = response.json()
+            access_token = content["access_token"]
+        except (ValueError, KeyError, TypeError):
+            raise OAuth2TokenError("The response of '%s' has no access token" % self.token_url)
+        token_type = content.get("token_type", "bearer")
+        if token_type.lower() != "bearer":
+            raise OAuth2TokenError("Token type '%s' is not supported" % token_type)
+        return access_token, self._parse_expires_in(content.get("expires_in"))
+
+    # -------------------------------------------------------------------------------------
+    def _parse_expires_in(self, expires_in) -> Optional[float]:
+        """
+        Return the given expires_in of a token response as a number of seconds, or None if it is
+        missing or not a number, e.g. the string "3600" some servers send gives 3600.0
+        """
+        if expires_in is None:
+            return None
+        try:
+            seconds = float(expires_in)
+        except (TypeError, ValueError):
+            seconds = math.nan
+        if not math.isfinite(seconds):
+            logger.warning(
+                "[OAuth2] ignoring expires_in %r of '%s', the token does not expire",
+                expires_in,
+                self.token_url,
+            )
+            return None
+        return seconds
+
+    # -------------------------------------------------------------------------------------
+    def access_token(self) -> str:
+        """
+        Return the access token, and request a new one if it expires within the refresh margin.
+
+        While a thread requests a new token, the other threads use the current one if it is still
+        valid, or wait for the new one.
+
+        :return: The access token
+        :rtype: ``string_type``
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                valid = self._access_token is not None and (
+                    self._expires_at is None or now < self._expires_at
+                )
+                if valid and (self._refresh_at is None or now < self._refresh_at):
+                    return self._access_token
+                if not self._refreshing:
+                    self._refreshing = True
+                    break
+                if valid:
+                    return self._access_token
+                remaining = timeouts.remaining()
+                if remaining is not None and remaining <= 0:
+                    raise RestDeadlineExceededError("deadline exceeded while waiting for a token")
+                self._condition.wait(remaining)
+
+        try:
+            access_token, expires_in = self.request_new_token()
+        except Exception:
+            with self._condition:
+                self._refreshing = False
+                self._condition.notify_all()
+                if valid:
+                    # the current token can still be used, and the next call tries again
+                    logger.warning("[OAuth2] could not refresh the access token", exc_info=True)
+                    return self._access_token
+            raise
+
+        with self._condition:
+            self._set_access_token(access_token, expires_in)
+            self._refreshing = False
+            self._condition.notify_all()
+            return access_token
+
+    # -------------------------------------------------------------------------------------
+    def _set_access_token(self, access_token, expires_in):
+        self._access_token = access_token
+        if expires_in is None:
+            self._expires_at = self._refresh_at = None
+            return
+        now = time.monotonic()
+        self._expires_at = now + expires_in
+        # refresh ahead of expiry, but not before half of the lifetime of the token has passed
+        self._refresh_at = self._expires_at - min(self.refresh_margin, expires_in / 2)
+
+    # -------------------------------------------------------------------------------------
+    def invalidate_access_token(self, access_token: Optional[str] = None):
+        """Drop the access token, so the next request gets a new one.
+
+        :param access_token: only drop the access token if it is this one, so a token that
+            another thread has just renewed is kept
+        """
+        with self._condition:
+            if access_token is None or access_token == self._access_token:
+                self._access_token = None
+                self._expires_at = self._refresh_at = None
+
+    # -------------------------------------------------------------------------------------
+    def __call__(self, r):
+        """Is called by the requests library when authentication is needed while
+        issuing a RESTful request.
+
+        Adds the Authorization header with the access token, and requests a new token first if
+        necessary.
+
+        """
+        access_token = self.access_token()
+        r.headers["Authorization"] = "Bearer {token}".format(token=access_token)
+        r.register_hook("response", self._handle_401)
+        return r
+
+    # -------------------------------------------------------------------------------------
+    def _handle_401(self, response, **kwargs):
+        """Is called by the requests library with the response to a request.
+
+        When the server no longer accepts the access token, e.g. because it was revoked, send the
+        request once more with a new access token.
+
+        """
+        if response.status_code != 401:
+            return response
+
+        rejected = response.request.headers.get("Authorization", "")[len("Bearer "):]
+        logger.debug("[OAuth2] access token was rejected, renew it and resend the request")
+        self.invalidate_access_token(rejected)
+        if not self.can_resend(response.request):
+            logger.debug("[OAuth2] the body of the request cannot be sent again")
+            return response
+
+        # consume the content, so the connection can be reused
+        response.content
+        response.close()
+        request = response.request.copy()
+        request.deregister_hook("response", self._handle_401)
+        request.headers["Authorization"] = "Bearer {token}".format(token=self.access_token())
+        new_response = response.connection.send(request, **kwargs)
+        new_response.history.append(response)
+        new_response.request = request
+        return new_response
+
+
+# ==========================================================================================
+class OAuth2AuthConfig(AuthConfig):
+    """
+    OAuth2 authentication with the client credentials grant
+    """
+
+    authentication_module = OAuth2Auth
+
+    # -------------------------------------------------------------------------------------
+    def __init__(self, token_url, scope=None, refresh_margin=60.0):
+        """
+        :param token_url: The URL of the token end-point of the OAuth2 server
+        :type token_url: ``string_type``
+
+        :param scope: The space-separated scopes to request, or None for the default scopes
+        :type scope: ``string_type_or_none``
+
+        :param refresh_margin: The number of seconds before the access token expires that a new
+            token is requested. At most half of the lifetime of the token is used as margin
+        :type refresh_margin: ``float``
+
+        """
+
+        URLValidator().check(token_url)
+        if not isinstance(refresh_margin, (int, float)) or refresh_margin < 0:
+            raise RestClientConfigurationError("refresh_margin is not a positive number or 0")
+
+        self.token_url = token_url
+        self.scope = scope
+        self.refresh_margin = refresh_margin
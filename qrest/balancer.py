@@ -0,0 +1,173 @@
+"""Contains the client-side load balancer, which spreads the requests over the replicas of a REST
+API.
+
+"""
+import itertools
+import logging
+import threading
+import time
+from typing import Iterable, List, Optional
+
+# ================================================================================================
+# local imports
+from .exception import RestClientConfigurationError
+
+logger = logging.getLogger(__name__)
+
+
+# ================================================================================================
+class LoadBalancing:
+    """Configure how the requests are spread over the base URLs of an API.
+
+    As this is a configuration container only, the actual state is kept by a LoadBalancer that
+    each API creates for itself.
+
+    """
+
+    strategies = ["least_outstanding", "ewma"]
+
+    def __init__(
+        self,
+        strategy: str = "least_outstanding",
+        max_failures: int = 3,
+        ejection_duration: float = 30.0,
+        decay: float = 0.3,
+    ):
+        """
+        :param strategy: "least_outstanding" to send each request to the replica with the fewest
+            requests in flight, or "ewma" to send it to the replica with the lowest moving
+            average of the latency, weighted by its requests in flight
+        :param max_failures: the number of consecutive failed requests after which a replica is
+            ejected, i.e. receives no requests while other replicas are available
+        :param ejection_duration: the time in seconds a replica stays ejected
+        :param decay: the weight of each new latency in the moving average of the latency
+
+        """
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.ejection_duration = ejection_duration
+        self.decay = decay
+        self._validate()
+
+    def _validate(self):
+        """internal routine to check if the LoadBalancing is configured correctly
+
+        """
+        if self.strategy not in self.strategies:
+            raise RestClientConfigurationError(
+                f"strategy must be one of {', '.join(self.strategies)}"
+            )
+        if not isinstance(self.max_failures, int) or self.max_failures < 1:
+            raise RestClientConfigurationError("max_failures must be a positive integer")
+        if self.ejection_duration < 0:
+            raise RestClientConfigurationError("ejection_duration must not be negative")
+        if not 0 < self.decay <= 1:
+            raise RestClientConfigurationError("decay must be larger than 0 and at most 1")
+
+
+class _Replica:
+    """The state of a single base URL."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.latency = 0.0
+        self.failures = 0
+        self.ejected_until = None
+        self.last_chosen = -1
+
+    def is_ejected(self, now: float) -> bool:
+        return self.ejected_until is not None and now < self.ejected_until
+
+
+# ================================================================================================
+class LoadBalancer:
+    """Choose the base URL of each request, and keep track of the health of each base URL.
+
+    A replica whose requests fail a number of times in a row, through a connection error, a
+    timeout or a 5xx status, is ejected for a while. When all replicas are ejected, the one that
+    is ejected the longest is used anyway.
+
+    A LoadBalancer can be used from multiple threads at the same time.
+
+    """
+
+    def __init__(self, urls: List[str], config: LoadBalancing):
+        """
+        :param urls: the base URLs of the replicas of the REST API
+        :param config: the configuration of the load balancer
+
+        """
+        self.config = config
+        self._replicas = {url: _Replica(url) for url in urls}
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def urls(self) -> List[str]:
+        """Return the base URLs of the replicas."""
+        return list(self._replicas)
+
+    def states(self) -> dict:
+        """Return a dictionary that maps each base URL to "healthy" or "ejected"."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                url: "ejected" if replica.is_ejected(now) else "healthy"
+                for url, replica in self._replicas.items()
+            }
+
+    def acquire(self, exclude: Iterable[str] = ()) -> str:
+        """Choose the base URL for a request and register the request as outstanding.
+
+        :param exclude: the base URLs that should not be chosen, e.g. because the request already
+            failed on them, unless no other base URL is left
+        :return: the chosen base URL
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                replica for url, replica in self._replicas.items() if url not in exclude
+            ] or list(self._replicas.values())
+            healthy = [replica for replica in candidates if not replica.is_ejected(now)]
+            if healthy:
+                # ties go to the replica chosen longest ago, so equal replicas share the load
+                replica = min(
+                    healthy, key=lambda candidate: (self._cost(candidate), candidate.last_chosen)
+                )
+            else:
+                replica = min(candidates, key=lambda candidate: candidate.ejected_until)
+            replica.outstanding += 1
+            replica.last_chosen = next(self._order)
+            return replica.url
+
+    def _cost(self, replica: _Replica) -> float:
+        if self.config.strategy == "ewma":
+            return replica.latency * (replica.outstanding + 1)
+        return replica.outstanding
+
+    def release(self, url: str, latency: float, success: Optional[bool]):
+        """Register the outcome of a request to the given base URL.
+
+        :param url: the base URL returned by :meth:`acquire`
+        :param latency: the latency of the request in seconds
+        :param success: False if and only if the request failed, or None if the request ended
+            without an outcome, e.g. because its deadline passed, which only ends the request
+        """
+        with self._lock:
+            replica = self._replicas[url]
+            replica.outstanding -= 1
+            if success is None:
+                return
+            if replica.latency == 0.0:
+                replica.latency = latency
+            else:
+                replica.latency += self.config.decay * (latency - replica.latency)
+            if success:
+                replica.failures = 0
+                return
+            replica.failures += 1
+            if replica.failures >= self.config.max_failures:
+                logger.warning("ejecting %s after %d failures", url, replica.failures)
+                replica.ejected_until = time.monotonic() + self.config.ejection_duration
+                replica.failures = 0
@@ -0,0 +1,205 @@
+"""Implements BatchLoader, which combines lookups of single items into a single query for
+multiple items.
+
+"""
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, List
+
+# ================================================================================================
+# local imports
+from .exception import RestClientConfigurationError, RestResourceMissingContentError
+from .utils import LazyModule
+
+asyncio = LazyModule("asyncio")
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    """The keys that are collected for a single query, and the futures of their callers.
+
+    The query is sent in a copy of the context of the caller that started the batch, so it uses
+    the authentication of its tenant and its deadline.
+
+    """
+
+    def __init__(self, tenant: int):
+        self.tenant = tenant
+        self.futures = {}
+        self.context = contextvars.copy_context()
+        self.timer = None
+        self.dispatched = False
+
+
+class BatchLoader:
+    """Combine individual lookups into queries of a resource that accepts multiple values.
+
+    Many REST APIs have a resource to retrieve a single item, e.g. ``posts/{item}``, and a
+    resource to retrieve the items that match a list of values, e.g. ``posts?id=1&id=2``. A
+    BatchLoader lets you use the latter as if it was the former: it collects the keys that are
+    looked up within a short window, or until a maximum number of keys is collected, retrieves
+    these keys with a single call, and hands each caller the item that matches its key::
+
+      loader = BatchLoader(api.filter_posts, parameter="post_id", key_field="id")
+
+      post = loader.load(42)  # in each of many threads
+
+    A key that is looked up multiple times within the same batch, is only sent once. The keys of
+    different tenants (see :meth:`API.as_tenant`) are collected in different batches.
+
+    """
+
+    def __init__(
+        self,
+        resource,
+        parameter: str,
+        key_field: str,
+        max_batch_size: int = 100,
+        window: float = 0.005,
+        **fixed_parameters,
+    ):
+        """
+        :param resource: the Resource to query, which should return a list of items
+        :param parameter: the name of the multiple parameter of the resource that receives the
+            list of keys
+        :param key_field: the field of each returned item that holds its key
+        :param max_batch_size: the maximum number of keys in a single query
+        :param window: the maximum time in seconds to wait for other lookups before the query is
+            sent
+        :param fixed_parameters: additional parameters passed to each query
+
+        """
+        if parameter not in resource.config.multiple_parameters:
+            raise RestClientConfigurationError(
+                f"parameter '{parameter}' of resource '{resource.name}' is not multiple"
+            )
+        if not isinstance(max_batch_size, int) or max_batch_size < 1:
+            raise RestClientConfigurationError("max_batch_size must be a positive integer")
+        if window < 0:
+            raise RestClientConfigurationError("window must not be negative")
+
+        self.resource = resource
+        self.parameter = parameter
+        self.key_field = key_field
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.fixed_parameters = fixed_parameters
+
+        self._lock = threading.Lock()
+        self._batches = {}  # the batch that collects keys, by the id of the auth of its tenant
+
+    # ---------------------------------------------------------------------------------------------
+    def load(self, key) -> Any:
+        """Return the item for the given key, or None if the REST API does not return it."""
+        return self.future(key).result()
+
+    def load_many(self, keys: list) -> List[Any]:
+        """Return the items for the given keys, in the order of the keys."""
+        futures = [self.future(key) for key in keys]
+        return [future.result() for future in futures]
+
+    async def aload(self, key) -> Any:
+        """Coroutine version of :meth:`load`.
+
+        A batch that becomes full is sent from the default executor of the running event loop, so
+        the query doesn't block the event loop.
+
+        """
+        future, full_batch = self._add(key)
+        if full_batch is not None:
+            run = self._dispatcher(full_batch)
+            await asyncio.get_running_loop().run_in_executor(None, run, self._dispatch, full_batch)
+        return await asyncio.wrap_future(future)
+
+    def future(self, key) -> Future:
+        """Add the given key to the current batch and return the future of its item.
+
+        When the key fills the batch, its query is sent from the calling thread.
+
+        """
+        future, full_batch = self._add(key)
+        if full_batch is not None:
+            self._dispatcher(full_batch)(self._dispatch, full_batch)
+        return future
+
+    # ---------------------------------------------------------------------------------------------
+    def _add(self, key):
+        """Add the given key to the current batch of the tenant and return the future of its item,
+        and the batch if the key filled it, or None otherwise.
+
+        """
+        tenant = id(self.resource._current_auth())
+        full_batch = None
+        with self._lock:
+            batch = self._batches.get(tenant)
+            if batch is None:
+                batch = self._batches[tenant] = _Batch(tenant)
+                batch.timer = threading.Timer(
+                    self.window, batch.context.run, args=(self._dispatch, batch)
+                )
+                batch.timer.daemon = True
+                batch.timer.start()
+            future = batch.futures.get(key)
+            if future is None:
+                future = batch.futures[key] = Future()
+            if len(batch.futures) >= self.max_batch_size:
+                full_batch = batch
+                del self._batches[tenant]
+
+        return future, full_batch
+
+    @staticmethod
+    def _dispatcher(full_batch: _Batch):
+        """Stop the timer of the given full batch and return the function that runs a callable in
+        its context.
+
+        """
+        full_batch.timer.cancel()
+        # the timer may have entered the context of the batch already
+        return full_batch.context.copy().run
+
+    # ---------------------------------------------------------------------------------------------
+    def _dispatch(self, batch: _Batch):
+        """Query the resource for the keys in the given batch and resolve the futures."""
+        with self._lock:
+            if batch.dispatched:
+                return
+            batch.dispatched = True
+            if self._batches.get(batch.tenant) is batch:
+                del self._batches[batch.tenant]
+
+        keys = list(batch.futures)
+        logger.debug("loading %d keys from resource '%s'", len(keys), self.resource.name)
+        try:
+            items = self._query(keys)
+        except BaseException as e:
+            for future in batch.futures.values():
+                future.set_exception(e)
+            return
+
+        for key, future in batch.futures.items():
+            future.set_result(items.get(str(key)))
+
+    def _query(self, keys: list) -> dict:
+        """Return the items for the given keys, indexed by the string value of their key."""
+        parameters = dict(self.fixed_parameters)
+        parameters[self.parameter] = keys
+        data = self.resource._get_isolated_response(**parameters).fetch()
+        if not isinstance(data, list):
+            raise RestResourceMissingContentError(
+                f"resource '{self.resource.name}' did not return a list of items"
+            )
+
+        items = {}
+        for item in data:
+            try:
+                items[str(item[self.key_field])] = item
+            except (KeyError, TypeError):
+                raise RestResourceMissingContentError(
+                    f"item returned by resource '{self.resource.name}' has no field "
+                    f"'{self.key_field}'"
+                )
+        return items
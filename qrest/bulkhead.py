@@ -0,0 +1,108 @@
+"""Contains the Bulkhead, which caps the number of concurrent requests to a single endpoint.
+
+"""
+import logging
+import threading
+from typing import Optional
+
+# ================================================================================================
+# local imports
+from . import timeouts
+from .exception import RestBulkheadFullError
+from .utils import LazyModule
+
+asyncio = LazyModule("asyncio")
+
+logger = logging.getLogger(__name__)
+
+
+class Bulkhead:
+    """Cap the number of concurrent requests to an endpoint, so a misbehaving endpoint cannot use
+    every thread or connection.
+
+    A request that finds the bulkhead full waits at most timeout seconds for another request to
+    complete, and then raises a RestBulkheadFullError. With a timeout of 0, it raises the error
+    right away, and with a timeout of None, it waits until a slot is available or the deadline of
+    the call passes.
+
+    Threads and asyncio tasks can share a single bulkhead: a thread waits on a semaphore, and a
+    task awaits the release of a slot without blocking its event loop.
+
+    """
+
+    def __init__(self, name: str, max_concurrency: int, timeout: Optional[float] = None):
+        """
+        :param name: the name of the endpoint, used in error messages
+        :param max_concurrency: the maximum number of concurrent requests
+        :param timeout: the maximum time in seconds to wait for a slot, or None to wait forever
+
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = threading.Semaphore(max_concurrency)
+        self._waiters = []
+        self._lock = threading.Lock()
+
+    def _wait_time(self) -> Optional[float]:
+        """Return the maximum time to wait for a slot, given the timeout and the deadline."""
+        remaining = timeouts.remaining()
+        if remaining is None:
+            return self.timeout
+        if self.timeout is None:
+            return max(0.0, remaining)
+        return max(0.0, min(self.timeout, remaining))
+
+    def _full(self) -> RestBulkheadFullError:
+        logger.debug("bulkhead of '%s' is full", self.name)
+        return RestBulkheadFullError(
+            f"resource '{self.name}' already has {self.max_concurrency} requests in flight"
+        )
+
+    def acquire(self):
+        """Take a slot, and block until one is available or the wait time has passed.
+
+        :raises RestBulkheadFullError: when no slot became available in time
+        """
+        wait_time = self._wait_time()
+        if wait_time == 0:
+            acquired = self._semaphore.acquire(blocking=False)
+        else:
+            acquired = self._semaphore.acquire(timeout=wait_time)
+        if not acquired:
+            raise self._full()
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is available right away, and return True if it did."""
+        return self._semaphore.acquire(blocking=False)
+
+    async def aacquire(self):
+        """Coroutine version of :meth:`acquire`."""
+        loop = asyncio.get_running_loop()
+        wait_time = self._wait_time()
+        end = None if wait_time is None else loop.time() + wait_time
+        while True:
+            future = loop.create_future()
+
+            def wake_up(future=future):
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+            with self._lock:
+                if self._semaphore.acquire(blocking=False):
+                    return
+                self._waiters.append(wake_up)
+            left = None if end is None else end - loop.time()
+            if left is not None and left <= 0:
+                raise self._full()
+            try:
+                await asyncio.wait_for(future, left)
+            except asyncio.TimeoutError:
+                raise self._full()
+
+    def release(self):
+        """Return a slot taken by :meth:`acquire` or :meth:`aacquire`."""
+        with self._lock:
+            self._semaphore.release()
+            waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            waiter()
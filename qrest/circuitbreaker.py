@@ -0,0 +1,192 @@
+"""Contains the circuit breaker, which stops sending requests to an endpoint that fails.
+
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# ================================================================================================
+# local imports
+from .exception import RestClientConfigurationError, RestCircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+# ================================================================================================
+class CircuitBreakerPolicy:
+    """Configure when a circuit breaker opens and how it recovers.
+
+    As this is a configuration container only, the actual state is kept by a CircuitBreaker that
+    each resource creates for itself.
+
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        slow_call_duration: Optional[float] = None,
+        window_size: int = 20,
+        minimum_calls: int = 10,
+        open_duration: float = 30.0,
+        half_open_calls: int = 1,
+    ):
+        """
+        :param failure_rate: the fraction of failed calls in the window at which the circuit
+            opens. A call fails when its connection fails or times out, or when the server
+            responds with a 5xx status
+        :param slow_call_duration: the duration in seconds after which a call also counts as
+            failed, or None to ignore the duration of calls
+        :param window_size: the number of most recent calls the failure rate is computed over
+        :param minimum_calls: the minimum number of calls in the window before the circuit can
+            open
+        :param open_duration: the time in seconds the circuit stays open before it lets calls
+            through to probe whether the endpoint has recovered
+        :param half_open_calls: the number of probe calls that are let through at the same time
+
+        """
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.window_size = window_size
+        self.minimum_calls = minimum_calls
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self._validate()
+
+    def _validate(self):
+        """internal routine to check if the CircuitBreakerPolicy is configured correctly
+
+        """
+        if not 0 < self.failure_rate <= 1:
+            raise RestClientConfigurationError("failure_rate must be larger than 0 and at most 1")
+        if self.slow_call_duration is not None and self.slow_call_duration <= 0:
+            raise RestClientConfigurationError("slow_call_duration must be positive")
+        for attribute in ["window_size", "minimum_calls", "half_open_calls"]:
+            value = getattr(self, attribute)
+            if not isinstance(value, int) or value < 1:
+                raise RestClientConfigurationError(f"{attribute} must be a positive integer")
+        if self.minimum_calls > self.window_size:
+            raise RestClientConfigurationError("minimum_calls must be at most window_size")
+        if self.open_duration < 0:
+            raise RestClientConfigurationError("open_duration must not be negative")
+
+
+# ================================================================================================
+class CircuitBreaker:
+    """Keep track of the outcome of the calls to a single endpoint, and fail fast when it fails.
+
+    The breaker starts closed, letting every call through. When the failure rate over the most
+    recent calls reaches the configured threshold, it opens and rejects every call with a
+    RestCircuitOpenError. After the open duration, it becomes half-open and lets a limited number
+    of probe calls through: if a probe succeeds, the breaker closes, and if it fails, the breaker
+    opens again.
+
+    A CircuitBreaker can be used from multiple threads at the same time.
+
+    """
+
+    def __init__(self, name: str, config: CircuitBreakerPolicy):
+        """
+        :param name: the name of the endpoint, used in error messages
+        :param config: the configuration of the breaker
+
+        """
+        self.name = name
+        self.config = config
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=config.window_size)
+        self._state = CLOSED
+        self._opened_at = None
+        self._probes = 0
+        self._half_opened = 0  # the number of times the breaker became half-open
+
+    @property
+    def state(self) -> str:
+        """Return the current state: "closed", "open" or "half-open"."""
+        with self._lock:
+            self._update_state()
+            return self._state
+
+    def _update_state(self):
+        """Let an open breaker become half-open when its open duration has passed."""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.config.open_duration:
+            logger.info("circuit of '%s' is half-open", self.name)
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._half_opened += 1
+
+    def before_call(self) -> Optional[int]:
+        """Register the start of a call.
+
+        :return: the token of the call, which is passed to :meth:`record` or :meth:`cancel`: None
+            for a regular call, or a number that identifies the half-open period of a probe call
+        :raises RestCircuitOpenError: when the breaker does not let the call through
+        """
+        with self._lock:
+            self._update_state()
+            if self._state == OPEN:
+                raise RestCircuitOpenError(f"circuit of resource '{self.name}' is open")
+            if self._state == HALF_OPEN:
+                if self._probes >= self.config.half_open_calls:
+                    raise RestCircuitOpenError(
+                        f"circuit of resource '{self.name}' is half-open and busy probing"
+                    )
+                self._probes += 1
+                return self._half_opened
+            return None
+
+    def _is_probe(self, token: Optional[int]) -> bool:
+        """Return True if the call with the given token is a probe of the current half-open
+        period."""
+        return self._state == HALF_OPEN and token == self._half_opened
+
+    def record(self, success: bool, duration: float, token: Optional[int] = None):
+        """Register the outcome of a call that was let through.
+
+        Only a probe of the current half-open period decides whether the breaker closes. The
+        outcome of a call that started before the breaker opened, or during an earlier half-open
+        period, is ignored.
+
+        :param success: False if and only if the call failed
+        :param duration: the duration of the call in seconds
+        :param token: the token that :meth:`before_call` returned for the call
+        """
+        slow_call_duration = self.config.slow_call_duration
+        failed = not success or (slow_call_duration is not None and duration > slow_call_duration)
+        with self._lock:
+            if self._is_probe(token):
+                self._probes -= 1
+                if failed:
+                    self._open()
+                else:
+                    logger.info("circuit of '%s' is closed", self.name)
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                return
+            if self._state != CLOSED or token is not None:
+                return
+
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.config.minimum_calls:
+                if sum(self._outcomes) / len(self._outcomes) >= self.config.failure_rate:
+                    self._open()
+
+    def cancel(self, token: Optional[int] = None):
+        """Register that a call that was let through was not sent after all.
+
+        :param token: the token that :meth:`before_call` returned for the call
+        """
+        with self._lock:
+            if self._is_probe(token):
+                self._probes -= 1
+
+    def _open(self):
+        logger.warning("circuit of '%s' is open", self.name)
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
@@ -0,0 +1,107 @@
+"""Implements SingleFlight, which lets identical concurrent requests share a single execution.
+
+"""
+import logging
+import threading
+
+# ================================================================================================
+# local imports
+from .utils import LazyModule
+
+asyncio = LazyModule("asyncio")
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """The state of a single execution that is shared by all callers of the same key."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicate concurrent executions of the same work.
+
+    The first caller for a given key, the leader, executes the work. Every caller that arrives
+    with the same key while the leader is still busy waits for it and receives the same result,
+    or the same exception. As soon as the leader has finished, the key is forgotten, so this is
+    not a cache: a later call for the same key executes the work again.
+
+    Both threads and asyncio tasks can use a SingleFlight. Threads share the executions of
+    :meth:`do`, and the tasks of an event loop share the executions of :meth:`ado`, where waiting
+    tasks don't block the event loop.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._futures = {}
+
+    def do(self, key, function):
+        """Return the result of function(), shared with concurrent callers of the same key.
+
+        :param key: a hashable that identifies the work
+        :param function: a callable without arguments that executes the work
+
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            logger.debug("joining in-flight call for %s", key)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def ado(self, key, function):
+        """Coroutine version of :meth:`do`, where function is a coroutine function.
+
+        The work runs in a task of its own, which every caller awaits, so a caller that is
+        cancelled, even the leader, does not cancel the work for the other callers.
+
+        """
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        with self._lock:
+            task = self._futures.get(loop_key)
+            if task is None:
+                task = self._futures[loop_key] = loop.create_task(self._arun(loop_key, function))
+                # retrieve the exception so asyncio doesn't complain when every caller is gone
+                task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            else:
+                logger.debug("joining in-flight task for %s", key)
+
+        return await asyncio.shield(task)
+
+    async def _arun(self, loop_key, function):
+        """Return the result of the given coroutine function, and forget the key afterwards."""
+        try:
+            return await function()
+        finally:
+            with self._lock:
+                del self._futures[loop_key]
+
+    @property
+    def in_flight(self) -> int:
+        """Return the number of keys that are currently being executed."""
+        with self._lock:
+            return len(self._calls) + len(self._futures)
@@ -0,0 +1,62 @@
+"""Contains the helpers qrest uses to execute work concurrently, either from threads or from
+asyncio tasks.
+
+"""
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List
+
+# ================================================================================================
+# local imports
+from .utils import LazyModule
+
+asyncio = LazyModule("asyncio")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+"""the default maximum number of requests a single fan-out sends at the same time"""
+
+
+def fan_out(function: Callable, items: Iterable, max_workers: int = DEFAULT_MAX_WORKERS) -> List:
+    """Return the results of function(item) for each item, in the order of the items.
+
+    The calls are executed concurrently by at most max_workers threads. Each call runs in a copy
+    of the context of the caller, so context variables such as a deadline keep applying. If one
+    of the calls raises an exception, the first exception is raised after all calls have
+    finished.
+
+    """
+    items = list(items)
+    if len(items) == 1:
+        return [function(items[0])]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, function, item) for item in items
+        ]
+    return [future.result() for future in futures]
+
+
+async def afan_out(
+    function: Callable, items: Iterable, max_workers: int = DEFAULT_MAX_WORKERS
+) -> List:
+    """Coroutine version of :func:`fan_out`, where function is a coroutine function."""
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def bounded(item):
+        async with semaphore:
+            return await function(item)
+
+    return list(await asyncio.gather(*[bounded(item) for item in items]))
+
+
+async def run_in_executor(function: Callable, *args):
+    """Return the result of function(*args) executed in the default executor.
+
+    Contrary to loop.run_in_executor, the function runs in a copy of the context of the caller.
+
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, contextvars.copy_context().run, function, *args)
@@ -1,27 +1,29 @@
 """
-Contains the configuration classes to create a :class:`qrest.resource.API`.
+Contains the configuration classes to create a :class:`qrest.api.API`.
 """
 from collections import defaultdict
-from typing import Dict, Optional, Type
+from collections.abc import Mapping
+from typing import Callable, Dict, Optional, Type
 
 import logging
+import threading
 
 # ================================================================================================
 # local imports
-from .auth import AuthConfig
 from .resource import Resource, JSONResource
 from .exception import RestClientConfigurationError
+from .balancer import LoadBalancing
+from .circuitbreaker import CircuitBreakerPolicy
+from .hedging import HedgePolicy
+from .limiter import AdaptiveConcurrency
+from .ratelimit import TokenBucket
+from .retry import RetryPolicy
+from .scheduler import RequestScheduler
+from .timeouts import AdaptiveTimeout
 from .utils import URLValidator
 
-# ================================================================================================
-#  Interface tweak
-from requests.packages.urllib3 import disable_warnings
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-
 logger = logging.getLogger(__name__)
 
-disable_warnings(InsecureRequestWarning)
-
 
 class ParameterConfig:
     """Contain and validate parameters for a REST endpoint. As this is a
@@ -103,6 +105,24 @@ class QueryParameter(ParameterConfig):
 
     call_location = "query"
 
+    encodings = ["repeat", "comma", "pipe", "brackets"]
+    """the ways a list of values can be encoded in the query string"""
+
+    def __init__(self, *args, encoding: str = "repeat", **kwargs):
+        """
+        :param encoding: how a list of values of a multiple parameter is encoded in the query
+            string. For values 1 and 2 of parameter "id" these are
+
+            - "repeat": ``id=1&id=2``, the default
+            - "comma": ``id=1,2``
+            - "pipe": ``id=1|2``
+            - "brackets": ``id[]=1&id[]=2``
+
+            See :class:`ParameterConfig` for the other parameters.
+        """
+        self.encoding = encoding
+        super().__init__(*args, **kwargs)
+
     def _validate(self):
         """
         internal routine to check a set of rules to validate if the QueryParameter
@@ -110,6 +130,15 @@ class QueryParameter(ParameterConfig):
         """
         super()._validate()
 
+        if self.encoding not in self.encodings:
+            raise RestClientConfigurationError(
+                "parameter 'encoding' must be one of %s" % ", ".join(self.encodings)
+            )
+        if self.encoding != "repeat" and not self.multiple:
+            raise RestClientConfigurationError(
+                "parameter 'encoding' is only applicable to a multiple QueryParameter"
+            )
+
         #  Query parameters always need a name.
         if not self.name:
             raise RestClientConfigurationError(
@@ -160,6 +189,39 @@ class FileParameter(ParameterConfig):
             )
 
 
+# ================================================================================================
+class RelatedResource:
+    """Describe how the items returned by one endpoint relate to another endpoint. As this is a
+    configuration container only, the actual retrieval is done by
+    :meth:`qrest.resource.Resource.prefetch_related`
+
+    """
+
+    # -----------------------------------------------------------------------------------------------------
+    def __init__(self, resource: str, field: str, parameter: str):
+        """
+        :param resource: the name of the related resource, e.g. "comments"
+        :param field: the field of each item returned by the current resource whose value is
+            passed to the related resource, e.g. "id"
+        :param parameter: the parameter of the related resource that receives the value of the
+            field, e.g. "post_id"
+        """
+        self.resource = resource
+        self.field = field
+        self.parameter = parameter
+        self._validate()
+
+    # -----------------------------------------------------------------------------------------------------
+    def _validate(self):
+        """internal routine to check if the RelatedResource is configured correctly
+
+        """
+        for attribute in ["resource", "field", "parameter"]:
+            value = getattr(self, attribute)
+            if not isinstance(value, str) or not value.strip():
+                raise RestClientConfigurationError(f"'{attribute}' must be a non-empty string")
+
+
 # ================================================================================================
 class ResourceConfig:
     """contain and validate details for a REST endpoint. Effectively this creates
@@ -177,6 +239,20 @@ class ResourceConfig:
         processor: Optional[Type[Resource]] = None,
         description: Optional[str] = None,
         path_description: Optional[dict] = None,
+        coalesce: Optional[bool] = None,
+        max_url_length: Optional[int] = None,
+        relations: Optional[dict] = None,
+        retry: Optional[RetryPolicy] = None,
+        rate_limit: Optional[TokenBucket] = None,
+        circuit_breaker: Optional[CircuitBreakerPolicy] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        hedge: Optional[HedgePolicy] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        priority: Optional[str] = None,
+        adaptive_timeout: Optional[AdaptiveTimeout] = None,
+        max_concurrency: Optional[int] = None,
+        bulkhead_timeout: Optional[float] = None,
     ):
         """
         Constructor, stores externally supplied parameters and validate the quality of it
@@ -195,6 +271,38 @@ class ResourceConfig:
         :param description: A general description of the endpoint that can be obtained by the user
             through the description property of the endpointconfig instance
         :param path_description: a dictionary that provides a description for each path parameter.
+        :param coalesce: if True, identical concurrent GET requests share a single call to the
+            server and a single response. Defaults to the setting of the APIConfig
+        :param max_url_length: the maximum length of the URL of a request. A request whose URL
+            would be longer is split over the values of its multiple query parameter. Defaults to
+            the setting of the APIConfig
+        :param relations: a dictionary of RelatedResource instances that each describe how the
+            returned items relate to another endpoint. The key is the name of the relation and
+            the field of each item where the related data is stored
+        :param retry: the RetryPolicy that specifies when a failed request is retried. Defaults to
+            the setting of the APIConfig
+        :param rate_limit: the TokenBucket that limits the rate of requests to this endpoint. This
+            limit applies in addition to the rate limit of the APIConfig
+        :param circuit_breaker: the CircuitBreakerPolicy that specifies when requests to this
+            endpoint fail fast. Defaults to the setting of the APIConfig
+        :param connect_timeout: the number of seconds to wait for the connection to the server.
+            Defaults to the setting of the APIConfig
+        :param read_timeout: the number of seconds to wait for the server to send data. Defaults
+            to the setting of the APIConfig
+        :param hedge: the HedgePolicy that specifies when a slow GET request is sent a second
+            time, or None to never do so
+        :param concurrency: the AdaptiveConcurrency that specifies how many requests of this
+            endpoint a fan-out sends at the same time. Defaults to the setting of the APIConfig
+        :param priority: the priority class of the requests of this endpoint, which the
+            RequestScheduler of the APIConfig uses. Defaults to the default priority of that
+            scheduler
+        :param adaptive_timeout: the AdaptiveTimeout that derives the read timeout from the
+            observed latencies of this endpoint. Defaults to the setting of the APIConfig
+        :param max_concurrency: the maximum number of requests of this endpoint in flight at the
+            same time, or None for no maximum
+        :param bulkhead_timeout: the maximum time in seconds a request waits when this endpoint
+            has max_concurrency requests in flight: 0 to fail right away, or None to wait until
+            the deadline of the call
 
         """
         self.path = path
@@ -203,6 +311,20 @@ class ResourceConfig:
         self.method = method
         self.parameters = parameters or {}
         self.headers = headers
+        self.coalesce = coalesce
+        self.max_url_length = max_url_length
+        self.relations = relations or {}
+        self.retry = retry
+        self.rate_limit = rate_limit
+        self.circuit_breaker = circuit_breaker
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.hedge = hedge
+        self.concurrency = concurrency
+        self.priority = priority
+        self.adaptive_timeout = adaptive_timeout
+        self.max_concurrency = max_concurrency
+        self.bulkhead_timeout = bulkhead_timeout
 
         #  we cannot set default processor above in the parameters as this means all endpoints
         #  share the same processor instance, and they cross-contaminate . By setting this below
@@ -227,7 +349,25 @@ class ResourceConfig:
         args = [cls.path, cls.method]
 
         kwargs = {}
-        optional_attributes = ["description", "headers", "path_description", "processor"]
+        optional_attributes = [
+            "description",
+            "headers",
+            "path_description",
+            "processor",
+            "coalesce",
+            "max_url_length",
+            "retry",
+            "rate_limit",
+            "circuit_breaker",
+            "connect_timeout",
+            "read_timeout",
+            "hedge",
+            "concurrency",
+            "priority",
+            "adaptive_timeout",
+            "max_concurrency",
+            "bulkhead_timeout",
+        ]
         for attribute in optional_attributes:
             if attribute in all_attributes:
                 kwargs[attribute] = getattr(cls, attribute)
@@ -237,6 +377,9 @@ class ResourceConfig:
             if isinstance(attribute, ParameterConfig):
                 parameters = kwargs.setdefault("parameters", {})
                 parameters[attribute_name] = attribute
+            elif isinstance(attribute, RelatedResource):
+                relations = kwargs.setdefault("relations", {})
+                relations[attribute_name] = attribute
 
         return cls(*args, **kwargs)
 
@@ -269,6 +412,48 @@ class ResourceConfig:
         else:
             self.headers = {}
 
+        # settings  --------------------
+        if self.coalesce is not None and not isinstance(self.coalesce, bool):
+            raise RestClientConfigurationError("coalesce is not True or False")
+        if self.max_url_length is not None:
+            if not isinstance(self.max_url_length, int) or self.max_url_length <= 0:
+                raise RestClientConfigurationError("max_url_length is not a positive integer")
+        if self.retry is not None and not isinstance(self.retry, RetryPolicy):
+            raise RestClientConfigurationError("retry is not a RetryPolicy instance")
+        if self.rate_limit is not None and not isinstance(self.rate_limit, TokenBucket):
+            raise RestClientConfigurationError("rate_limit is not a TokenBucket instance")
+        if self.circuit_breaker is not None:
+            if not isinstance(self.circuit_breaker, CircuitBreakerPolicy):
+                raise RestClientConfigurationError(
+                    "circuit_breaker is not a CircuitBreakerPolicy instance"
+                )
+        for timeout in ["connect_timeout", "read_timeout"]:
+            value = getattr(self, timeout)
+            if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+                raise RestClientConfigurationError(f"{timeout} is not a positive number")
+        if self.hedge is not None and not isinstance(self.hedge, HedgePolicy):
+            raise RestClientConfigurationError("hedge is not a HedgePolicy instance")
+        if self.concurrency is not None:
+            if not isinstance(self.concurrency, AdaptiveConcurrency):
+                raise RestClientConfigurationError(
+                    "concurrency is not an AdaptiveConcurrency instance"
+                )
+        if self.priority is not None and not isinstance(self.priority, str):
+            raise RestClientConfigurationError("priority is not a string")
+        if self.adaptive_timeout is not None:
+            if not isinstance(self.adaptive_timeout, AdaptiveTimeout):
+                raise RestClientConfigurationError(
+                    "adaptive_timeout is not an AdaptiveTimeout instance"
+                )
+        if self.max_concurrency is not None:
+            if not isinstance(self.max_concurrency, int) or self.max_concurrency < 1:
+                raise RestClientConfigurationError("max_concurrency is not a positive integer")
+        if self.bulkhead_timeout is not None:
+            if not isinstance(self.bulkhead_timeout, (int, float)) or self.bulkhead_timeout < 0:
+                raise RestClientConfigurationError(
+                    "bulkhead_timeout is not a positive number or 0"
+                )
+
         # method  --------------------
         if self.method not in ["GET", "POST", "PUT"]:
             raise RestClientConfigurationError("method must be GET, POST or PUT")
@@ -282,6 +467,15 @@ class ResourceConfig:
                     "Parameter '%s' must be ParameterConfig instance" % str(key)
                 )
 
+        #  relations -------------------------------
+        if not isinstance(self.relations, dict):
+            raise RestClientConfigurationError("relations must be dictionary")
+        for key, val in self.relations.items():
+            if not isinstance(val, RelatedResource):
+                raise RestClientConfigurationError(
+                    "Relation '%s' must be RelatedResource instance" % str(key)
+                )
+
         #  resource class ----------------------------------
         if self.processor:
             if not isinstance(self.processor, Resource):
@@ -319,6 +513,18 @@ class ResourceConfig:
         # re-validate to be sure current data is OK
         self.validate()
 
+    # --------------------------------------------------------------------------------------------
+    def apply_default_settings(self, **defaults):
+        """For internal use. Fill in the settings this endpoint leaves open (None) from the
+        values the APIConfig specifies for all endpoints.
+
+        """
+        for setting, value in defaults.items():
+            if getattr(self, setting) is None:
+                setattr(self, setting, value)
+
+        self.validate()
+
     # ---------------------------------------------------------------------------------------------
     @property
     def path_parameters(self) -> list:
@@ -454,59 +660,250 @@ class ResourceConfig:
 
 
 # ==================================================================================================
+class LazyEndpoints(Mapping):
+    """A mapping of the names of endpoints to their ResourceConfig, which creates each
+    ResourceConfig from its class on first access.
+
+    An APIConfig applies its defaults to, and validates, each ResourceConfig when it is created,
+    so an API with many endpoints only pays for the endpoints it uses.
+
+    """
+
+    def __init__(self, classes: Dict[str, Type[ResourceConfig]]):
+        """
+        :param classes: the ResourceConfig subclass of each endpoint name
+
+        """
+        self._classes = classes
+        self._configs = {}
+        self._on_create = None
+        self._lock = threading.RLock()
+
+    def __getitem__(self, name: str) -> ResourceConfig:
+        config = self._configs.get(name)
+        if config is not None:
+            return config
+        with self._lock:
+            if name not in self._configs:
+                config = self._classes[name].create()
+                if self._on_create is not None:
+                    self._on_create(name, config)
+                self._configs[name] = config
+            return self._configs[name]
+
+    def __iter__(self):
+        return iter(self._classes)
+
+    def __len__(self) -> int:
+        return len(self._classes)
+
+    def created(self) -> Dict[str, ResourceConfig]:
+        """Return the ResourceConfig of each endpoint that has been created so far."""
+        with self._lock:
+            return dict(self._configs)
+
+    def on_create(self, callback: Callable[[str, ResourceConfig], None]):
+        """For internal use. Call the given function with the name and the ResourceConfig of
+        each endpoint that is created from now on.
+
+        """
+        self._on_create = callback
+
+
 class APIConfig:
     """
     Class to configure and validate endpoints
     """
 
     url = None
-    """base URL of the REST API"""
+    """base URL of the REST API, or a list of the base URLs of its replicas"""
+
+    load_balancing = None
+    """the LoadBalancing that spreads the requests over a list of base URLs, or None for the
+    default LoadBalancing"""
 
     authentication = None
 
     verify_ssl = False
     """False if and only if verification of the SSL certificate should be ignored"""
 
+    coalesce = False
+    """True if and only if identical concurrent GET requests should share a single call"""
+
+    max_url_length = 8000
+    """maximum length of a URL: longer requests are split over their multiple query parameter"""
+
+    retry = None
+    """the RetryPolicy of the endpoints, or None to never retry a failed request"""
+
+    rate_limit = None
+    """the TokenBucket that limits the rate of the requests to all endpoints together"""
+
+    circuit_breaker = None
+    """the CircuitBreakerPolicy of the endpoints, or None to never stop sending requests"""
+
+    connect_timeout = 10
+    """seconds to wait for the connection to the server, or None to wait forever"""
+
+    read_timeout = 60
+    """seconds to wait for the server to send data, or None to wait forever"""
+
+    adaptive_timeout = None
+    """the AdaptiveTimeout of the endpoints, or None to always use the read timeout"""
+
+    concurrency = None
+    """the AdaptiveConcurrency of the endpoints, or None for a fixed number of threads"""
+
+    scheduler = None
+    """the RequestScheduler that limits the requests in flight per host, or None for no limit"""
+
     endpoints: Dict[str, ResourceConfig]
 
-    def __init__(self, endpoints: Dict[str, ResourceConfig]):
+    def __init__(self, endpoints: Dict[str, ResourceConfig], compiled: bool = False):
         """Configure and validate the current APIConfig for the given endpoints.
 
+        :param endpoints: the ResourceConfig of each endpoint
+        :param compiled: True when the defaults have already been applied to the endpoints,
+            e.g. because they were loaded from a snapshot
         :raises RestClientConfigurationError: when validation fails
 
         """
         if not endpoints:
             raise RestClientConfigurationError("no endpoints defined for this REST client at all!")
         self.endpoints = endpoints
-        self._apply_defaults()
+        if not compiled:
+            self._apply_defaults()
         self._validate()
+        if isinstance(endpoints, LazyEndpoints):
+            endpoints.on_create(self._configure_endpoint)
+
+    @property
+    def urls(self) -> list:
+        """Return the list of base URLs of the REST API."""
+        return list(self.url) if isinstance(self.url, list) else [self.url]
+
+    def _created_endpoints(self) -> Dict[str, ResourceConfig]:
+        """
+        return the ResourceConfig of each endpoint that exists, which excludes the endpoints of
+        LazyEndpoints that have not been accessed
+        """
+        if isinstance(self.endpoints, LazyEndpoints):
+            return self.endpoints.created()
+        return self.endpoints
+
+    def _configure_endpoint(self, name: str, endpoint: ResourceConfig):
+        """
+        apply the default settings to, and validate, an endpoint of LazyEndpoints when it is
+        created
+        """
+        self._apply_endpoint_defaults(endpoint)
+        self._validate_endpoint(name, endpoint)
 
     def _apply_defaults(self):
         """
         rotate through the endpoints and apply the default settings
         """
+        for endpoint in self._created_endpoints().values():
+            self._apply_endpoint_defaults(endpoint)
+
+    def _apply_endpoint_defaults(self, endpoint: ResourceConfig):
+        """
+        apply the default settings to a single endpoint
+        """
         if "default_headers" in dir(self):
-            for endpoint in self.endpoints.values():
-                endpoint.apply_default_headers(self.default_headers)
+            endpoint.apply_default_headers(self.default_headers)
+        endpoint.apply_default_settings(
+            coalesce=self.coalesce,
+            max_url_length=self.max_url_length,
+            retry=self.retry,
+            circuit_breaker=self.circuit_breaker,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            concurrency=self.concurrency,
+            adaptive_timeout=self.adaptive_timeout,
+        )
 
     def _validate(self):
         """
         Validates a resources configuration and raises appropriate exceptions
         """
-        for resource_name, resource_config in self.endpoints.items():
+        for resource_name in self.endpoints:
             if resource_name == "data":
                 raise RestClientConfigurationError("resource name may not be named 'data'")
 
         # check url definition
         if not self.url:
             raise RestClientConfigurationError("url is not set")
-        URLValidator().check(self.url, require_path=False)
+        if not isinstance(self.url, (str, list)):
+            raise RestClientConfigurationError("url is not a string or a list of strings")
+        for url in self.urls:
+            URLValidator().check(url, require_path=False)
+
+        if self.load_balancing is not None and not isinstance(self.load_balancing, LoadBalancing):
+            raise RestClientConfigurationError("load_balancing is not a LoadBalancing instance")
 
         if not isinstance(self.verify_ssl, bool):
             raise RestClientConfigurationError("verify_ssl is not True or False")
 
-        # optional auth module
-        if self.authentication and not isinstance(self.authentication, AuthConfig):
-            raise RestClientConfigurationError(
-                "authentication attribute is not an initiated instance of AuthConfig"
-            )
+        if not isinstance(self.coalesce, bool):
+            raise RestClientConfigurationError("coalesce is not True or False")
+
+        if self.max_url_length is not None:
+            if not isinstance(self.max_url_length, int) or self.max_url_length <= 0:
+                raise RestClientConfigurationError("max_url_length is not a positive integer")
+
+        if self.retry is not None and not isinstance(self.retry, RetryPolicy):
+            raise RestClientConfigurationError("retry is not a RetryPolicy instance")
+
+        if self.rate_limit is not None and not isinstance(self.rate_limit, TokenBucket):
+            raise RestClientConfigurationError("rate_limit is not a TokenBucket instance")
+
+        if self.circuit_breaker is not None:
+            if not isinstance(self.circuit_breaker, CircuitBreakerPolicy):
+                raise RestClientConfigurationError(
+                    "circuit_breaker is not a CircuitBreakerPolicy instance"
+                )
+
+        for timeout in ["connect_timeout", "read_timeout"]:
+            value = getattr(self, timeout)
+            if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+                raise RestClientConfigurationError(f"{timeout} is not a positive number")
+
+        if self.concurrency is not None:
+            if not isinstance(self.concurrency, AdaptiveConcurrency):
+                raise RestClientConfigurationError(
+                    "concurrency is not an AdaptiveConcurrency instance"
+                )
+
+        if self.adaptive_timeout is not None:
+            if not isinstance(self.adaptive_timeout, AdaptiveTimeout):
+                raise RestClientConfigurationError(
+                    "adaptive_timeout is not an AdaptiveTimeout instance"
+                )
+
+        if self.scheduler is not None:
+            if not isinstance(self.scheduler, RequestScheduler):
+                raise RestClientConfigurationError("scheduler is not a RequestScheduler instance")
+
+        # optional auth module, which is only imported when it is configured
+        if self.authentication:
+            from .auth import AuthConfig
+
+            if not isinstance(self.authentication, AuthConfig):
+                raise RestClientConfigurationError(
+                    "authentication attribute is not an initiated instance of AuthConfig"
+                )
+
+        for resource_name, resource_config in self._created_endpoints().items():
+            self._validate_endpoint(resource_name, resource_config)
+
+    def _validate_endpoint(self, resource_name: str, resource_config: ResourceConfig):
+        """
+        Validates the settings of an endpoint that depend on the APIConfig
+        """
+        if self.scheduler is not None and resource_config.priority is not None:
+            if resource_config.priority not in self.scheduler.priorities:
+                raise RestClientConfigurationError(
+                    f"priority '{resource_config.priority}' of resource '{resource_name}' is "
+                    f"not one of {', '.join(self.scheduler.priorities)}"
+                )
@@ -2,9 +2,6 @@
 local exceptions
 """
 
-from requests import HTTPError
-from requests.models import Response
-
 
 # ================================================================================================
 class RestClientException(Exception):
@@ -102,32 +99,37 @@ class RestBadRequestError(RestClientResourceError):
     pass
 
 
-class RestResourceHTTPError(HTTPError):
-    """An error when specifying an invalid target for a given REST API."""
+class RestCircuitOpenError(RestClientResourceError):
+    """An error when a request is not sent because the circuit breaker of its resource is open."""
 
-    def __init__(self, response_object, *args, **kwargs):
-        """
-        RestResourceError constructor
-        """
+    pass
+
+
+class RestDeadlineExceededError(RestClientResourceError):
+    """An error when a request is not sent or not retried because the deadline has passed."""
+
+    pass
+
+
+class RestRequestShedError(RestClientResourceError):
+    """An error when a request is not sent because the scheduler shed it to limit the load."""
+
+    pass
+
+
+class RestBulkheadFullError(RestClientResourceError):
+    """An error when a request is not sent because its resource has too many requests in flight."""
+
+    pass
+
+
+def __getattr__(name: str):
+    """Return RestResourceHTTPError, which is part of the transport module since it is a subclass
+    of an exception of requests, from this module as well.
+
+    """
+    if name == "RestResourceHTTPError":
+        from .transport import RestResourceHTTPError
 
-        assert isinstance(response_object, Response)
-        self.response = response_object
-        self.code = self.response.status_code
-        self.reason = self.response.reason
-
-        if self.code == 400:
-            raise RestBadRequestError("Bad request for resource %s" % (self.response.url,))
-        elif self.code == 404:
-            raise RestResourceNotFoundError("Object could not be found in database")
-        elif self.code in (401, 402, 403):
-            raise RestAccessDeniedError(
-                "error %d: Access is denied to resource %s" % (self.code, self.response.url)
-            )
-        elif self.code in (500,):
-            raise RestInternalServerError(
-                "error %d: Internal Server error (%s)" % (self.code, self.reason)
-            )
-        else:
-            raise Exception("REST error %d: %s" % (self.code, self.reason))
-
-        super().__init__(*args, **kwargs)
+        return RestResourceHTTPError
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -0,0 +1,274 @@
+"""Contains the configuration and the execution of hedged requests.
+
+"""
+import contextvars
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+# ================================================================================================
+# local imports
+from .concurrency import run_in_executor
+from .exception import RestClientConfigurationError
+from .latency import LatencySketch
+from .utils import LazyModule
+
+asyncio = LazyModule("asyncio")
+
+logger = logging.getLogger(__name__)
+
+MAX_PRIMARIES_IN_FLIGHT = 64
+"""the maximum number of first requests that can be hedged in flight at the same time, for all
+APIs together"""
+
+MAX_HEDGES_IN_FLIGHT = 32
+"""the maximum number of second requests in flight at the same time, for all APIs together"""
+
+_executors = {}  # thread name prefix -> executor
+_executor_lock = threading.Lock()
+_primaries_in_flight = threading.BoundedSemaphore(MAX_PRIMARIES_IN_FLIGHT)
+_hedges_in_flight = threading.BoundedSemaphore(MAX_HEDGES_IN_FLIGHT)
+
+
+# ================================================================================================
+class HedgeBudget:
+    """Limit the number of hedged requests relative to the number of requests.
+
+    Each request adds a fraction of a token, up to a maximum, and each hedged request takes a
+    whole token. So in the long run, at most that fraction of the requests is hedged.
+
+    A HedgeBudget can be used from multiple threads at the same time.
+
+    """
+
+    def __init__(self, max_tokens: float = 10, token_ratio: float = 0.05):
+        """
+        :param max_tokens: the maximum number of tokens, which is also the initial number
+        :param token_ratio: the number of tokens each request adds, i.e. the fraction of requests
+            that can be hedged
+
+        """
+        if max_tokens < 1:
+            raise RestClientConfigurationError("max_tokens must be at least 1")
+        if token_ratio <= 0:
+            raise RestClientConfigurationError("token_ratio must be positive")
+
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        """Return the number of tokens left."""
+        return self._tokens
+
+    def record_request(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.token_ratio)
+
+    def try_hedge(self) -> bool:
+        """Take a token and return True, or return False if no token is left."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+# ================================================================================================
+class HedgePolicy:
+    """Configure when a second, identical request is sent for a request that is slow.
+
+    A GET request that has not completed after the hedge delay is sent a second time. The first
+    of both to respond wins, and the other is abandoned.
+
+    """
+
+    def __init__(
+        self,
+        delay: Optional[float] = None,
+        percentile: Optional[float] = None,
+        min_samples: int = 20,
+        budget: Optional[HedgeBudget] = None,
+    ):
+        """
+        :param delay: the hedge delay in seconds. If a percentile is also specified, this delay
+            is only used until enough latencies have been observed
+        :param percentile: the percentile (between 0 and 100) of the observed latencies of the
+            endpoint to use as hedge delay, e.g. 95
+        :param min_samples: the minimum number of observed latencies to use the percentile
+        :param budget: the HedgeBudget that limits the number of hedged requests. Defaults to a
+            budget that allows to hedge 5% of the requests
+
+        """
+        if delay is None and percentile is None:
+            raise RestClientConfigurationError("specify a delay, a percentile or both")
+        if delay is not None and (not isinstance(delay, (int, float)) or delay < 0):
+            raise RestClientConfigurationError("delay must be a number that is not negative")
+        if percentile is not None and not 0 < percentile < 100:
+            raise RestClientConfigurationError("percentile must be between 0 and 100")
+        if not isinstance(min_samples, int) or min_samples < 1:
+            raise RestClientConfigurationError("min_samples must be a positive integer")
+        if budget is not None and not isinstance(budget, HedgeBudget):
+            raise RestClientConfigurationError("budget is not a HedgeBudget instance")
+
+        self.delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.budget = budget if budget is not None else HedgeBudget()
+
+    def hedge_delay(self, latencies: LatencySketch) -> Optional[float]:
+        """Return the hedge delay given the observed latencies of the endpoint, or None if the
+        request should not be hedged.
+        """
+        if self.percentile is not None and latencies.count >= self.min_samples:
+            return latencies.percentile(self.percentile)
+        return self.delay
+
+
+# ================================================================================================
+def _get_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """Return the executor whose threads have the given name, which is created on first use."""
+    with _executor_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = _executors[name] = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix=name
+            )
+        return executor
+
+
+def _try_start_primary(function: Callable) -> Optional[Future]:
+    """Call function() in the executor of the first calls, in a copy of the context of the
+    caller, and return the future of its result, or return None if that executor is busy.
+
+    The executor has a thread for each first call it accepts, so the first call does not wait for
+    a thread and the hedge delay only counts the time of the request itself.
+
+    """
+    if not _primaries_in_flight.acquire(blocking=False):
+        logger.debug("no hedging: %d hedgeable requests are in flight", MAX_PRIMARIES_IN_FLIGHT)
+        return None
+    executor = _get_executor("qrest-hedge-primary", MAX_PRIMARIES_IN_FLIGHT)
+    primary = executor.submit(contextvars.copy_context().run, function)
+    primary.add_done_callback(lambda _: _primaries_in_flight.release())
+    return primary
+
+
+def _try_start_hedge(
+    function: Callable, budget: HedgeBudget, bulkhead, primary: Future
+) -> Optional[Future]:
+    """Call function() a second time in the executor, and return the future of its result, or
+    return None if the budget, the number of second requests in flight or the bulkhead does not
+    allow it.
+
+    The second call takes a slot of the bulkhead, which is released when both calls have
+    finished, so the call that loses keeps counting in the bulkhead until it completes.
+
+    :param primary: the future of the first call
+    """
+    if not _hedges_in_flight.acquire(blocking=False):
+        logger.debug("no hedging: %d hedged requests are in flight", MAX_HEDGES_IN_FLIGHT)
+        return None
+    if bulkhead is not None and not bulkhead.try_acquire():
+        _hedges_in_flight.release()
+        logger.debug("no hedging: the bulkhead of '%s' is full", bulkhead.name)
+        return None
+    if not budget.try_hedge():
+        _hedges_in_flight.release()
+        if bulkhead is not None:
+            bulkhead.release()
+        return None
+
+    running = [2]
+    lock = threading.Lock()
+
+    def finished(_):
+        with lock:
+            running[0] -= 1
+            last = running[0] == 0
+        if last and bulkhead is not None:
+            bulkhead.release()
+
+    executor = _get_executor("qrest-hedge", MAX_HEDGES_IN_FLIGHT)
+    secondary = executor.submit(contextvars.copy_context().run, function)
+    secondary.add_done_callback(lambda _: _hedges_in_flight.release())
+    secondary.add_done_callback(finished)
+    primary.add_done_callback(finished)
+    return secondary
+
+
+def hedge(function: Callable, delay: float, budget: HedgeBudget, bulkhead=None):
+    """Return the result of function(), which is called a second time if the first call has not
+    returned after delay seconds and the budget allows it.
+
+    The result of the first call that returns is used. If that call raised an exception, the other
+    one is waited for, and if both raised an exception, the exception of the first is raised.
+
+    When the budget has no token left, the function is simply called in the calling thread.
+    Otherwise, the first call is sent from a bounded executor, and the second one from another
+    bounded executor, which are shared by all APIs. When the first executor is full, the function
+    is called in the calling thread, without hedging. The second call is not sent when the second
+    executor or the given Bulkhead is full.
+
+    :param bulkhead: the Bulkhead of the endpoint, of which the caller holds a slot for the first
+        call. A second call takes another slot, which it keeps until both calls have finished
+
+    """
+    budget.record_request()
+    primary = _try_start_primary(function) if budget.tokens >= 1 else None
+    if primary is None:
+        return function()
+
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+    secondary = _try_start_hedge(function, budget, bulkhead, primary)
+    if secondary is None:
+        return primary.result()
+
+    logger.debug("hedging request after %.3f seconds", delay)
+    pending = {primary, secondary}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+    return primary.result()
+
+
+async def ahedge(function: Callable, delay: float, budget: HedgeBudget, bulkhead=None):
+    """Coroutine version of :func:`hedge`. The function is still a regular function, which is
+    called from the default executor when the budget has no token left or the executor of the
+    first calls is full, and from the executors of :func:`hedge` otherwise.
+    """
+    budget.record_request()
+    first = _try_start_primary(function) if budget.tokens >= 1 else None
+    if first is None:
+        return await run_in_executor(function)
+
+    primary = asyncio.wrap_future(first)
+    futures = {primary}
+    try:
+        done, _ = await asyncio.wait(futures, timeout=delay)
+        if done:
+            return await primary
+        secondary = _try_start_hedge(function, budget, bulkhead, first)
+        if secondary is None:
+            return await primary
+
+        logger.debug("hedging request after %.3f seconds", delay)
+        futures.add(asyncio.wrap_future(secondary))
+        pending = futures
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+        return primary.result()
+    finally:
+        # the abandoned call keeps running, but its result no longer goes to the event loop
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,78 @@
+"""Contains the LatencySketch, which summarizes the latencies of the recent requests of an
+endpoint.
+
+"""
+import logging
+import math
+import threading
+from collections import Counter
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_MIN_LATENCY = 1e-6
+"""the smallest latency the sketch distinguishes, in seconds"""
+
+
+class LatencySketch:
+    """Summarize the latencies of the most recent requests and estimate their percentiles.
+
+    The sketch counts the latencies in buckets whose bounds grow geometrically, so it only uses
+    memory for each distinct order of magnitude and each estimated percentile is within the
+    relative accuracy of the exact one. To follow changes in the latency, the sketch keeps two
+    generations of counts: when the current generation holds window_size latencies, it replaces
+    the previous one. So the percentiles cover between window_size and twice as many of the most
+    recent latencies.
+
+    A LatencySketch can be used from multiple threads at the same time.
+
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, window_size: int = 1000):
+        """
+        :param relative_accuracy: the maximum relative error of an estimated percentile
+        :param window_size: the number of latencies per generation
+
+        """
+        self.relative_accuracy = relative_accuracy
+        self.window_size = window_size
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._current = Counter()
+        self._previous = Counter()
+        self._current_count = 0
+        self._previous_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        """Return the number of latencies the percentiles cover."""
+        return self._current_count + self._previous_count
+
+    def record(self, latency: float):
+        """Add the given latency in seconds."""
+        index = math.ceil(math.log(max(latency, _MIN_LATENCY)) / self._log_gamma)
+        with self._lock:
+            self._current[index] += 1
+            self._current_count += 1
+            if self._current_count >= self.window_size:
+                self._previous, self._current = self._current, Counter()
+                self._previous_count, self._current_count = self._current_count, 0
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Return an estimate of the given percentile (between 0 and 100) of the latencies, or
+        None if no latency has been recorded.
+        """
+        with self._lock:
+            counts = self._current + self._previous
+        total = sum(counts.values())
+        if total == 0:
+            return None
+        rank = max(1, math.ceil(percentile / 100 * total))
+        seen = 0
+        for index in sorted(counts):
+            seen += counts[index]
+            if seen >= rank:
+                break
+        # the value in the middle of the bucket, relative to its bounds
+        return 2 * self._gamma ** index / (self._gamma + 1)
@@ -0,0 +1,209 @@
+"""Contains the adaptive concurrency limiter, which adjusts the number of concurrent requests to
+the latency and the errors of an endpoint.
+
+"""
+import logging
+import math
+import threading
+
+# ================================================================================================
+# local imports
+from .exception import RestClientConfigurationError
+from .utils import LazyModule
+
+asyncio = LazyModule("asyncio")
+
+logger = logging.getLogger(__name__)
+
+
+# ================================================================================================
+class AdaptiveConcurrency:
+    """Configure how the number of concurrent requests to an endpoint adapts.
+
+    As this is a configuration container only, the actual limit is kept by a ConcurrencyLimiter
+    that each resource creates for itself.
+
+    """
+
+    algorithms = ["aimd", "gradient"]
+
+    def __init__(
+        self,
+        algorithm: str = "aimd",
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        tolerance: float = 1.5,
+        backoff_ratio: float = 0.9,
+        smoothing: float = 0.2,
+    ):
+        """
+        :param algorithm: "aimd" to add 1 to the limit for every limit successful requests and
+            to multiply it by backoff_ratio when the latency increases or a request fails, or
+            "gradient" to set the limit proportional to the ratio of the long-term latency and
+            the short-term latency
+        :param initial_limit: the number of concurrent requests to start with
+        :param min_limit: the minimum number of concurrent requests
+        :param max_limit: the maximum number of concurrent requests, which is also the number of
+            threads that send them
+        :param tolerance: how much larger than the long-term latency the short-term latency can
+            become before the limit is decreased
+        :param backoff_ratio: the factor by which the "aimd" algorithm decreases the limit
+        :param smoothing: the weight of each new limit that the "gradient" algorithm computes
+
+        """
+        self.algorithm = algorithm
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff_ratio = backoff_ratio
+        self.smoothing = smoothing
+        self._validate()
+
+    def _validate(self):
+        """internal routine to check if the AdaptiveConcurrency is configured correctly
+
+        """
+        if self.algorithm not in self.algorithms:
+            raise RestClientConfigurationError(
+                f"algorithm must be one of {', '.join(self.algorithms)}"
+            )
+        for attribute in ["initial_limit", "min_limit", "max_limit"]:
+            value = getattr(self, attribute)
+            if not isinstance(value, int) or value < 1:
+                raise RestClientConfigurationError(f"{attribute} must be a positive integer")
+        if not self.min_limit <= self.initial_limit <= self.max_limit:
+            raise RestClientConfigurationError(
+                "initial_limit must be between min_limit and max_limit"
+            )
+        if self.tolerance < 1:
+            raise RestClientConfigurationError("tolerance must be at least 1")
+        if not 0 < self.backoff_ratio < 1:
+            raise RestClientConfigurationError("backoff_ratio must be between 0 and 1")
+        if not 0 < self.smoothing <= 1:
+            raise RestClientConfigurationError("smoothing must be larger than 0 and at most 1")
+
+
+# ================================================================================================
+class ConcurrencyLimiter:
+    """Limit the number of concurrent requests to an endpoint, and adapt the limit to the
+    observed latencies and errors.
+
+    The limiter keeps a short-term and a long-term exponentially weighted moving average of the
+    latencies. When the short-term average rises above the long-term one, the server is queueing
+    requests and the limit goes down, and while both stay close, the limit goes up.
+
+    Threads and asyncio tasks can share a single limiter, and no lock is held while they wait.
+
+    """
+
+    _SHORT_TERM_WEIGHT = 0.5
+    _LONG_TERM_WEIGHT = 0.05
+
+    def __init__(self, config: AdaptiveConcurrency):
+        """
+        :param config: the configuration of the limiter
+
+        """
+        self.config = config
+        self._limit = float(config.initial_limit)
+        self._in_flight = 0
+        self._short_term = None
+        self._long_term = None
+        self._waiters = []
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """Return the current number of concurrent requests allowed."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """Return the current number of concurrent requests."""
+        return self._in_flight
+
+    def _try_acquire(self, waiter) -> bool:
+        """Take a slot and return True, or register the given waiter and return False."""
+        with self._lock:
+            if self._in_flight < int(self._limit):
+                self._in_flight += 1
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def _wake_up(self):
+        """Let all waiters try to take a slot again."""
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            waiter()
+
+    def acquire(self):
+        """Take a slot, and block until one is available."""
+        while True:
+            event = threading.Event()
+            if self._try_acquire(event.set):
+                return
+            event.wait()
+
+    async def aacquire(self):
+        """Coroutine version of :meth:`acquire`."""
+        loop = asyncio.get_running_loop()
+        while True:
+            future = loop.create_future()
+
+            def wake_up(future=future):
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+            if self._try_acquire(wake_up):
+                return
+            await future
+
+    def release(self):
+        """Return a slot taken by :meth:`acquire` or :meth:`aacquire`."""
+        with self._lock:
+            self._in_flight -= 1
+        self._wake_up()
+
+    def record(self, latency: float, success: bool):
+        """Adapt the limit to the outcome of a request.
+
+        :param latency: the latency of the request in seconds
+        :param success: False if and only if the request failed in a way that indicates the
+            server is overloaded
+        """
+        with self._lock:
+            previous_limit = int(self._limit)
+            if self._long_term is None:
+                self._short_term = self._long_term = latency
+            else:
+                self._short_term += self._SHORT_TERM_WEIGHT * (latency - self._short_term)
+                self._long_term += self._LONG_TERM_WEIGHT * (latency - self._long_term)
+            if self.config.algorithm == "aimd":
+                limit = self._aimd(success)
+            else:
+                limit = self._gradient(success)
+            self._limit = min(self.config.max_limit, max(self.config.min_limit, limit))
+            increased = int(self._limit) > previous_limit
+        if increased:
+            self._wake_up()
+
+    def _overloaded(self) -> bool:
+        return self._short_term > self.config.tolerance * self._long_term
+
+    def _aimd(self, success: bool) -> float:
+        if not success or self._overloaded():
+            return self._limit * self.config.backoff_ratio
+        return self._limit + 1 / self._limit
+
+    def _gradient(self, success: bool) -> float:
+        if success and self._short_term > 0:
+            gradient = self.config.tolerance * self._long_term / self._short_term
+            gradient = max(0.5, min(1.0, gradient))
+        else:
+            gradient = 0.5
+        # the square root allows a small queue, so the limit can grow while the latency is flat
+        new_limit = self._limit * gradient + math.sqrt(self._limit)
+        return (1 - self.config.smoothing) * self._limit + self.config.smoothing * new_limit
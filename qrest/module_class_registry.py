@@ -1,5 +1,4 @@
 """Implements ModuleClassRegistry."""
-import inspect
 
 
 class ModuleClassRegistry:
@@ -16,10 +15,10 @@ class ModuleClassRegistry:
 
         """
         classes = []
-        for name, value in inspect.getmembers(self._module):
-            # the member should be defined in the given module
-            if inspect.getmodule(value) == self._module:
-                # issubclass requires its first argument to be a class
-                if inspect.isclass(value) and issubclass(value, base_class):
+        for name, value in sorted(vars(self._module).items()):
+            # issubclass requires its first argument to be a class
+            if isinstance(value, type) and issubclass(value, base_class):
+                # the class should be defined in the given module
+                if value.__module__ == self._module.__name__:
                     classes.append(value)
         return classes
@@ -0,0 +1,92 @@
+"""Contains the TokenBucket, which limits the rate at which requests are sent.
+
+"""
+import logging
+import threading
+import time
+
+# ================================================================================================
+# local imports
+from . import timeouts
+from .exception import RestClientConfigurationError, RestDeadlineExceededError
+from .utils import LazyModule
+
+asyncio = LazyModule("asyncio")
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Limit the rate of requests with a token bucket.
+
+    The bucket holds at most capacity tokens and is refilled at a constant rate. Each request
+    takes a token: if none is available, the request waits until the bucket has been refilled
+    enough. This allows bursts of up to capacity requests while the average rate never exceeds
+    the refill rate.
+
+    A waiting request reserves its token before it waits, and no lock is held while it waits. So
+    threads and asyncio tasks can share a single bucket, and they are served in the order in which
+    they arrive. A request whose token would only be available after its deadline does not wait:
+    it returns its token and raises a RestDeadlineExceededError.
+
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        :param rate: the number of tokens added per second, i.e. the sustained number of requests
+            per second
+        :param capacity: the maximum number of tokens, i.e. the maximum burst of requests
+
+        """
+        if not isinstance(rate, (int, float)) or rate <= 0:
+            raise RestClientConfigurationError("rate must be a positive number")
+        if not isinstance(capacity, (int, float)) or capacity < 1:
+            raise RestClientConfigurationError("capacity must be at least 1")
+
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token and return the time in seconds to wait before it can be used."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def _wait_time(self) -> float:
+        """Take a token and return the time in seconds to wait before it can be used.
+
+        :raises RestDeadlineExceededError: when the deadline passes before the token can be used
+        """
+        wait = self._reserve()
+        if wait <= 0:
+            return wait
+        remaining = timeouts.remaining()
+        if remaining is not None and wait > remaining:
+            with self._lock:
+                self._tokens += 1
+            raise RestDeadlineExceededError("deadline exceeded while waiting for the rate limit")
+        logger.debug("rate limit reached, waiting %.3f seconds", wait)
+        return wait
+
+    def acquire(self):
+        """Take a token, and block until it can be used.
+
+        :raises RestDeadlineExceededError: when the deadline passes before the token can be used
+        """
+        wait = self._wait_time()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        """Coroutine version of :meth:`acquire`."""
+        wait = self._wait_time()
+        if wait > 0:
+            await asyncio.sleep(wait)
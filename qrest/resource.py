@@ -1,188 +1,114 @@
-"""The main working module of the package: contains the API class (to access
-the REST server), and the ResourceConfig class (which wraps around a single
-endpoint / resources ). The ResourceConfig class is encouraged to be subclassed
+"""The main working module of the package: contains the Resource class, which wraps around a
+single endpoint / resource of the REST API. The Resource class is encouraged to be subclassed
 to add functionality such as complex pagination or response processing
 
 """
 
-import requests
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import copy
+import itertools
 import logging
-from urllib.parse import quote, urljoin
+import threading
+import time
+from urllib.parse import quote, quote_plus, urljoin, urlencode
 from abc import ABC
 from typing import Optional
 from _io import BufferedReader
 
-from requests.packages.urllib3 import disable_warnings
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-
 # ================================================================================================
 # local imports
-from .module_class_registry import ModuleClassRegistry
+from .bulkhead import Bulkhead
+from .circuitbreaker import CircuitBreaker
+from .coalesce import SingleFlight
+from .hedging import hedge, ahedge
+from .latency import LatencySketch
+from .limiter import ConcurrencyLimiter
+from .scheduler import current_priority
+from . import timeouts
+from .concurrency import DEFAULT_MAX_WORKERS, fan_out, afan_out, run_in_executor
+from .module_class_registry import ModuleClassRegistry  # noqa: F401
 from .response import Response
-from .utils import URLValidator
+from .utils import LazyModule, URLValidator
 from .exception import (
     RestClientQueryError,
     RestClientConfigurationError,
     RestCredentailsError,
-    RestResourceHTTPError,
-    InvalidResourceError,
 )
 from .response import CSVResponse, JSONResponse
-from .auth import AuthConfig
-
-disable_warnings(InsecureRequestWarning)
-
-logger = logging.getLogger(__name__)
-
-
-# ================================================================================================
-class API:
-    """
-    This is the main point of contact for end users
-    """
 
-    # placeholder for subclassed resources
-    config = None
-    auth = None
+# requests, asyncio and the transport are only imported when they are first used
+asyncio = LazyModule("asyncio")
+requests = LazyModule("requests")
+transport = LazyModule("qrest.transport")
 
-    def __init__(self, imported_module):
-        """Initialize an API from the configurations in the given imported module.
+QUERY_DELIMITERS = {"comma": ",", "pipe": "|"}
+"""the delimiters of the query parameter encodings that join a list of values"""
 
-        An API describes a REST server, and contains a list of resources. We
-        allow customization of the "resource class", which is basically a
-        wrapper around the response object: default is JSON, so we pre-made a
-        JSON resource class. Optionally this resource class handles
-        non-standard responses such as pagination or a specific response format
-        from which the payload needs to be derived
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+"""the methods of the requests that can safely be sent to another replica"""
 
-        """
+SPLIT_METHODS = ("GET", "HEAD")
+"""the methods of the requests that can be split into multiple requests with shorter URLs"""
 
-        from .conf import APIConfig, ResourceConfig
+_holds_slot = contextvars.ContextVar("qrest_holds_slot", default=False)
+"""True if and only if the current work already holds a slot of a concurrency limiter"""
 
-        registry = ModuleClassRegistry(imported_module)
+_tenant_auth = contextvars.ContextVar("qrest_tenant_auth", default={})
+"""the authentication of the current tenant of each API, set by :meth:`API.as_tenant`"""
 
-        api_configs = registry.retrieve(APIConfig)
-        if not api_configs:
-            raise RestClientConfigurationError(
-                f"Imported module '{imported_module.__name__}' does not contain a subclass of "
-                "APIConfig."
-            )
-        elif len(api_configs) > 1:
-            raise RestClientConfigurationError(
-                f"Imported module '{imported_module.__name__}' contains more than 1 subclass of "
-                "APIConfig."
-            )
-
-        resource_configs = registry.retrieve(ResourceConfig)
-        for c in resource_configs:
-            if "name" not in dir(c):
-                raise RestClientConfigurationError(
-                    f"Imported class '{c.__name__}' does not have a 'name' attribute."
-                )
-        endpoints = {c.name: c.create() for c in resource_configs}
+_attempt_clocks = contextvars.ContextVar("qrest_attempt_clocks", default=())
+"""the clocks that measure the current attempt, see :func:`_attempt_clock`"""
 
-        self._initialize(api_configs[0](endpoints))
-
-    def _initialize(self, config):
-        """Initialize the current API from the given APIConfig.
-
-        :param config: The configuration object of the REST API resources
-        :type config: Subclass of APIConfig
-
-        """
-
-        # check
-        from .conf import APIConfig
+logger = logging.getLogger(__name__)
 
-        if not isinstance(config, APIConfig):
-            raise RestClientConfigurationError("configuration is not a APIConfig instance")
 
-        self.config = config
-        self.verifySSL = config.verify_ssl
-        self.auth = self._get_authentication_module()
+def __getattr__(name: str):
+    """Return API, which moved to the api module so this module does not depend on conf, from
+    this module as well.
 
-        #  process the endpoints
-        for name, item_config in self.config.endpoints.items():
-            if not isinstance(item_config.processor, Resource):
-                raise RestClientConfigurationError(
-                    f"defined resource class for {name} is not a Resource instance"
-                )
-            new_resource = self._create_rest_resource(
-                item_config.processor, resource_name=name, config=item_config, auth=self.auth
-            )
-            setattr(self, name, new_resource)
-
-    # ---------------------------------------------------------------------------------------------
-    @property
-    def resources(self):
-        """ Lists the available resources for this REST API
+    """
+    if name == "API":
+        from .api import API
 
-            :return: A list of the available resources for this REST API
-            :rtype: ``list(string_type)``
-        """
+        return API
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
 
-        resources = []
-        fieldnames = dir(self)
-        for fieldname in fieldnames:
-            # this exclusion is to prevent endless loops
-            if fieldname == "resources":
-                continue
-            field = getattr(self, fieldname)
-            if isinstance(field, Resource):
-                resources.append(field.name)
-        return resources
 
-    # ---------------------------------------------------------------------------------------------
-    def _create_rest_resource(self, processor, resource_name, config, auth=None):
-        """ This function is used to dynamically create request functions for a specified REST API resource
+class _AttemptClock:
+    """Measures the duration of an attempt, without the time its request waited for a slot of
+    the scheduler, so the latencies of the resource don't depend on the load of the scheduler.
 
-            :param resource: A string that represents the REST API resource
-            :type resource: ``string_type``
+    """
 
-            :return: A function that builds and sends a request for the specified REST API resource
-                and validates the function call
-            :rtype: ``list(string_type)``
-        """
+    def __init__(self):
+        self.start = time.monotonic()
+        self.queued = 0.0
 
-        if not config:
-            raise InvalidResourceError(name=type(self).__name__, resource=resource_name)
+    def elapsed(self) -> float:
+        return max(time.monotonic() - self.start - self.queued, 0.0)
 
-        if not isinstance(processor, Resource):
-            raise RestClientConfigurationError("processor must be a Resource")
 
-        par = config.parameters
-        b_names = [par[x].name for x in par if par[x].call_location == "body"]
+@contextlib.contextmanager
+def _attempt_clock():
+    """Return an _AttemptClock that is started now, and that excludes the time the requests sent
+    in the with block wait for a slot of the scheduler.
 
-        #  By default, body parameters are added to the body payload as a key-value pair,
-        #  assuming the body is a dictionary. To take a list or string as payload, the
-        #  name attribute of a body parameter should be set to None. In that case, only
-        #  one body parameter is allowed.
-        if b_names.count(None) > 0 and len(b_names) > 1:
-            msg = "No additional body parameters allowed if body parameter " \
-                  "has name attribute with value None."
-            raise RestClientConfigurationError(msg)
+    """
+    clock = _AttemptClock()
+    token = _attempt_clocks.set(_attempt_clocks.get() + (clock,))
+    try:
+        yield clock
+    finally:
+        _attempt_clocks.reset(token)
 
-        processor.configure(
-            name=resource_name, config=config, server_url=self.config.url, auth=auth
-        )
-        return processor
 
-    def _get_authentication_module(self):
-        """Return authentication module."""
-        try:
-            auth_config = self.config.authentication
-        except AttributeError:
-            # default to no authentication
-            return None
-        else:
-            if auth_config is None:
-                return None
-            if not isinstance(auth_config, AuthConfig):
-                raise RestClientConfigurationError(
-                    "authentication attribute is not an instance of AuthConfig"
-                )
-            auth_module = auth_config.authentication_module
-            return auth_module(self, auth_config)
+def _record_queued(queued: float):
+    """Exclude the given time a request waited for a slot from each clock of the attempt."""
+    for clock in _attempt_clocks.get():
+        clock.queued += queued
 
 
 # ===================================================================================================
@@ -197,17 +123,26 @@ class Resource(ABC):
 
     is_configured = False
     config = None
+    api = None
 
     server_url = None
     request_parameters = None
     verify_ssl = False
     auth = None
-    cleaned_data = None
 
     response: Response
 
+    _call_state = None
+    _in_flight = None
+    _circuit_breaker = None
+    _latencies = None
+    _limiter = None
+    _bulkhead = None
+
     # ---------------------------------------------------------------------------------------------
-    def configure(self, name: str, server_url: str, config, auth=None, verify_ssl: bool = False):
+    def configure(
+        self, name: str, server_url: str, config, auth=None, verify_ssl: bool = False, api=None
+    ):
         """Configure the resource. This is a required procedure to set all parameters.
         Setting these parameters is not possible by using __init__, because
         this class is initialized within the config, to enable setting custom
@@ -221,19 +156,47 @@ class Resource(ABC):
         :type auth: subclass of AuthConfig
         :param config: which ResourceConfig to use
         :type config: subclass of ResourceConfig
+        :param api: the API this resource belongs to, which provides the related resources
 
         """
 
         self.name = name
+        self.api = api
         self.server_url = server_url
         self.config = config
         self.auth = auth
         self.verify_ssl = verify_ssl
+        self._session = api.session if api is not None else transport.create_session()
+
+        # the data of a call is kept per thread so concurrent calls don't overwrite each other
+        self._call_state = threading.local()
+        self._in_flight = SingleFlight()
+        self._latencies = LatencySketch()
+        if config.circuit_breaker is not None:
+            self._circuit_breaker = CircuitBreaker(name, config.circuit_breaker)
+        if config.concurrency is not None:
+            self._limiter = ConcurrencyLimiter(config.concurrency)
+        if config.max_concurrency is not None:
+            self._bulkhead = Bulkhead(name, config.max_concurrency, config.bulkhead_timeout)
 
         self.cleaned_data = {}
         self.request_parameters = None
         self.is_configured = True
 
+    # ---------------------------------------------------------------------------------------------
+    @property
+    def cleaned_data(self) -> Optional[dict]:
+        """
+        the validated input of the current call in the current thread
+        """
+        return getattr(self._call_state, "cleaned_data", None)
+
+    @cleaned_data.setter
+    def cleaned_data(self, value: dict):
+        if self._call_state is None:
+            raise RestClientConfigurationError(f"resource {type(self).__name__} is not configured")
+        self._call_state.cleaned_data = value
+
     # ---------------------------------------------------------------------------------------------
     def __call__(self, *args, **kwargs):
         """Execute the REST query and return the content of interest of the response."""
@@ -251,6 +214,149 @@ class Resource(ABC):
         self.check(**kwargs)
         return self._get()
 
+    def _get_isolated_response(self, **kwargs):
+        """Execute the REST query like :meth:`get_response`, but process the server response in a
+        private copy of the response object.
+
+        Use this method for calls that qrest itself runs concurrently, so their results don't
+        overwrite each other.
+
+        """
+        self._call_state.response_handler = copy.copy(self.response)
+        try:
+            return self.get_response(**kwargs)
+        finally:
+            self._call_state.response_handler = None
+
+    async def acall(self, **kwargs):
+        """Coroutine version of :meth:`__call__`."""
+        response = await self.aget_response(**kwargs)
+        return response.fetch()
+
+    async def aget_response(self, **kwargs):
+        """Coroutine version of :meth:`get_response`.
+
+        The request itself is sent from the default executor of the running event loop. As calls
+        from different tasks can overlap, each call processes the server response in its own copy
+        of the response object.
+
+        """
+        self.cleaned_data = {}
+        self.check(**kwargs)
+        request = self._prepare()
+        response_handler = copy.copy(self.response)
+
+        requests_to_send = self._split(request)
+        if len(requests_to_send) == 1:
+            return await self._adispatch(request, response_handler)
+
+        responses = await afan_out(
+            lambda part: self._alimited(
+                lambda: self._adispatch(part, copy.copy(response_handler))
+            ),
+            requests_to_send,
+            max_workers=self._max_workers,
+        )
+        return response_handler.merge(responses)
+
+    # ---------------------------------------------------------------------------------------------
+    def prefetch_related(self, *relations: str, max_workers: Optional[int] = None, **kwargs):
+        """Execute the REST query and add the data of the given relations to each returned item.
+
+        For each relation, the related resource is queried once for every distinct value of the
+        relation field. These queries are sent concurrently by at most max_workers threads. The
+        result of each query is stored in the item under the name of the relation::
+
+          posts = api.all_posts.prefetch_related("comments")
+          comments_of_first_post = posts[0]["comments"]
+
+        :param relations: the names of the relations as configured in the ResourceConfig
+        :param max_workers: the maximum number of related queries that are sent at the same time.
+            Defaults to the maximum limit of the adaptive concurrency of the related resource, or
+            to DEFAULT_MAX_WORKERS if it has none
+        :param kwargs: the parameters of the REST query of the current resource
+
+        """
+        data = self(**kwargs)
+        items = self._items(data)
+        for relation_name in relations:
+            relation, related_resource, keys = self._relation_keys(relation_name, items)
+            related_data = fan_out(
+                lambda key: related_resource._limited(
+                    lambda: related_resource._get_isolated_response(
+                        **{relation.parameter: key}
+                    ).fetch()
+                ),
+                keys,
+                max_workers=max_workers or related_resource._max_workers,
+            )
+            self._attach(relation_name, relation, items, dict(zip(keys, related_data)))
+        return items[0] if isinstance(data, dict) else items
+
+    async def aprefetch_related(
+        self, *relations: str, max_workers: Optional[int] = None, **kwargs
+    ):
+        """Coroutine version of :meth:`prefetch_related`."""
+        data = await self.acall(**kwargs)
+        items = self._items(data)
+        for relation_name in relations:
+            relation, related_resource, keys = self._relation_keys(relation_name, items)
+            related_data = await afan_out(
+                lambda key: related_resource._alimited(
+                    lambda: related_resource.acall(**{relation.parameter: key})
+                ),
+                keys,
+                max_workers=max_workers or related_resource._max_workers,
+            )
+            self._attach(relation_name, relation, items, dict(zip(keys, related_data)))
+        return items[0] if isinstance(data, dict) else items
+
+    def _items(self, data) -> list:
+        """
+        return a copy of the item or items in the given data, so adding related data does not
+        modify a response that might be shared with other callers
+        """
+        if isinstance(data, dict):
+            return [dict(data)]
+        if isinstance(data, list) and all(isinstance(item, dict) for item in data):
+            return [dict(item) for item in data]
+        raise RestClientQueryError(
+            f"resource '{self.name}' did not return a dictionary or a list of dictionaries"
+        )
+
+    def _relation_keys(self, relation_name: str, items: list):
+        """
+        return the configuration and the resource of the given relation, and the distinct values
+        of its field in the given items
+        """
+        if relation_name not in self.config.relations:
+            raise RestClientQueryError(
+                f"'{relation_name}' is not a relation of resource '{self.name}'"
+            )
+        if self.api is None:
+            raise RestClientConfigurationError(f"resource '{self.name}' is not part of an API")
+        relation = self.config.relations[relation_name]
+        related_resource = getattr(self.api, relation.resource)
+
+        keys = []
+        for item in items:
+            if relation.field not in item:
+                raise RestClientQueryError(
+                    f"item returned by resource '{self.name}' has no field '{relation.field}'"
+                )
+            keys.append(item[relation.field])
+        # remove the duplicate keys but keep their order
+        keys = list(dict.fromkeys(keys))
+        return relation, related_resource, keys
+
+    @staticmethod
+    def _attach(relation_name: str, relation, items: list, related_data: dict):
+        """
+        store the related data of each item under the name of the relation
+        """
+        for item in items:
+            item[relation_name] = related_data[item[relation.field]]
+
     # ---------------------------------------------------------------------------------------------
     @property
     def parameters(self) -> dict:
@@ -406,7 +512,8 @@ class Resource(ABC):
     @property
     def query_url(self):
         """
-        returns the URL that is actually queried
+        returns the URL that is actually queried. When the API has multiple base URLs, this URL
+        uses the first one, and each request resolves it against the replica it is sent to
         """
 
         # url and parameters
@@ -478,16 +585,107 @@ class Resource(ABC):
             It returns a dictionary of the response or throws an appropriate
             error, depending on the HTTP return code.
 
-            This should be the *only* place in the module where the Requests module is called!
+        """
+        request = self._prepare(extra_request, extra_body, extra_file)
+        isolated_handler = getattr(self._call_state, "response_handler", None)
+        # as calls from different threads can overlap, each call processes the server response in
+        # its own copy of the response object
+        response_handler = isolated_handler or copy.copy(self.response)
+
+        requests_to_send = self._split(request)
+        if len(requests_to_send) == 1:
+            result = self._dispatch(request, response_handler)
+        else:
+            responses = fan_out(
+                lambda part: self._limited(
+                    lambda: self._dispatch(part, copy.copy(response_handler))
+                ),
+                requests_to_send,
+                max_workers=self._max_workers,
+            )
+            result = response_handler.merge(responses)
+
+        if isolated_handler is None and isinstance(result, Response):
+            # the response attribute keeps giving access to the response of the latest call
+            self.response = result
+        return result
+
+    @property
+    def _max_workers(self) -> int:
+        """
+        the number of threads or tasks a fan-out to this resource uses: when the concurrency is
+        adaptive, the limiter decides how many of them actually send a request
+        """
+        if self._limiter is not None:
+            return self._limiter.config.max_limit
+        return DEFAULT_MAX_WORKERS
+
+    def _limited(self, function):
+        """ Return function(), called once the concurrency limiter of the resource allows it.
+
+            Work that already holds a slot, e.g. a related query that is split over multiple
+            requests, does not take another one, as it could wait forever for itself.
 
         """
+        if self._limiter is None or _holds_slot.get():
+            return function()
+        self._limiter.acquire()
+        token = _holds_slot.set(True)
+        try:
+            return function()
+        finally:
+            _holds_slot.reset(token)
+            self._limiter.release()
 
-        # check if user is logged in
-        if self.auth and not self.auth.credentials_are_set:
+    async def _alimited(self, function):
+        """ Coroutine version of :meth:`_limited`, where function is a coroutine function.
+
+        """
+        if self._limiter is None or _holds_slot.get():
+            return await function()
+        await self._limiter.aacquire()
+        token = _holds_slot.set(True)
+        try:
+            return await function()
+        finally:
+            _holds_slot.reset(token)
+            self._limiter.release()
+
+    def _dispatch(self, request: dict, response_handler: Response):
+        """ Send the given request, unless an identical request is already in flight and can be
+            shared.
+
+        """
+        send = lambda: self._send(request, response_handler)  # noqa: E731
+        if self._coalesce:
+            return self._in_flight.do(self._tenant_request_key(request), send)
+        return send()
+
+    async def _adispatch(self, request: dict, response_handler: Response):
+        """ Coroutine version of :meth:`_dispatch`.
+
+        """
+        send = lambda: self._asend(request, response_handler)  # noqa: E731
+        if self._coalesce:
+            return await self._in_flight.ado(self._tenant_request_key(request), send)
+        return await send()
+
+    # ---------------------------------------------------------------------------------------------
+    def _prepare(self, extra_request=None, extra_body=None, extra_file=None) -> dict:
+        """ Build the arguments of the request from the validated input of the current call.
+
+            :return: the keyword arguments for requests.request, except for the authentication
+
+        """
+
+        # check if user is logged in; other authentications than those of qrest.auth, e.g. of a
+        # tenant, have no credentials_are_set
+        auth = self._current_auth()
+        if auth is not None and not getattr(auth, "credentials_are_set", True):
             raise RestCredentailsError("user credentials are not set")
 
         # url and parameters
-        if "cleaned_data" not in dir(self):
+        if self.cleaned_data is None:
             raise KeyError("request data is not cleaned. Run validate_query first")
 
         query_parameters = self.query_parameters
@@ -527,23 +725,651 @@ class Resource(ABC):
                         )
             query_parameters['file'].extend(extra_file)
 
+        return {
+            "method": self.config.method,
+            "url": self.query_url,
+            "params": query_parameters["request"],
+            "json": query_parameters["body"],
+            "files": query_parameters["file"],
+            "headers": self.config.headers,
+        }
+
+    # ---------------------------------------------------------------------------------------------
+    def _encode_params(self, params: dict):
+        """
+        return the query parameters of a request with each list of values encoded according to
+        the encoding of its QueryParameter, as a dict, or as a query string when a list is joined
+        with a delimiter, as requests would percent-encode the delimiter of a value in a dict
+        """
+        query_configs = {
+            parameter.name: parameter
+            for parameter in self.config.parameters.values()
+            if parameter.call_location == "query"
+        }
+
+        encoded_params = {}
+        joined = False
+        for name, value in params.items():
+            encoding = getattr(query_configs.get(name), "encoding", "repeat")
+            if not isinstance(value, list) or encoding == "repeat":
+                encoded_params[name] = value
+            elif encoding == "brackets":
+                encoded_params[name + "[]"] = value
+            else:
+                delimiter = QUERY_DELIMITERS[encoding]
+                encoded_params[name] = delimiter.join(str(item) for item in value)
+                joined = True
+        return self._query_string(encoded_params) if joined else encoded_params
+
+    @staticmethod
+    def _query_string(params) -> str:
+        """
+        return the query string of the given encoded query parameters, which keeps the delimiters
+        of joined lists of values
+        """
+        if isinstance(params, str):
+            return params
+        return urlencode(params, doseq=True, safe="".join(QUERY_DELIMITERS.values()))
+
+    def _url_length(self, request: dict) -> int:
+        """
+        return the length of the URL of the given request, including its query string
+        """
+        query_string = self._query_string(self._encode_params(request["params"]))
+        return len(request["url"]) + (1 + len(query_string) if query_string else 0)
+
+    def _split(self, request: dict) -> list:
+        """ Split the given request into requests whose URL does not exceed the maximum URL length.
+
+            Only the longest list of values of a multiple query parameter is split. If the URL is
+            short enough, or there is no list to split, the list contains the request itself. So
+            does the list of a request that is not a GET or HEAD request, since the other methods
+            can change the state of the server and a request with such a method cannot be sent
+            more than once.
+
+            :raises RestClientQueryError: when a URL with a single value of the list is already too
+                long
+
+        """
+        max_length = self.config.max_url_length
+        if (
+            not max_length
+            or request["method"] not in SPLIT_METHODS
+            or self._url_length(request) <= max_length
+        ):
+            return [request]
+
+        multiple_names = [
+            parameter.name
+            for parameter in self.config.parameters.values()
+            if parameter.multiple and parameter.call_location == "query"
+        ]
+        params = request["params"]
+        split_names = [
+            name for name in multiple_names if isinstance(params.get(name), list) and params[name]
+        ]
+        if not split_names:
+            logger.warning("URL of resource '%s' is longer than %d", self.name, max_length)
+            return [request]
+        split_name = max(split_names, key=lambda name: len(params[name]))
+        encoding = next(
+            parameter.encoding
+            for parameter in self.config.parameters.values()
+            if parameter.name == split_name and parameter.call_location == "query"
+        )
+
+        # pack the values greedily, where each value adds either "name=value" and a separator,
+        # or the value and an encoded delimiter
+        if encoding in QUERY_DELIMITERS:
+            base_params = dict(params, **{split_name: [""]})
+        else:
+            base_params = dict(params, **{split_name: []})
+        base_length = self._url_length(dict(request, params=base_params))
+        parts = [[]]
+        length = base_length
+        for value in params[split_name]:
+            if encoding in QUERY_DELIMITERS:
+                delimiter_length = len(quote_plus(QUERY_DELIMITERS[encoding]))
+                value_length = len(quote_plus(str(value))) + delimiter_length
+            else:
+                encoded_name = split_name + "[]" if encoding == "brackets" else split_name
+                value_length = len(urlencode({encoded_name: value})) + 1
+            if base_length + value_length > max_length:
+                raise RestClientQueryError(
+                    f"the URL of resource '{self.name}' exceeds the maximum length of "
+                    f"{max_length} for a single value of parameter '{split_name}'"
+                )
+            if parts[-1] and length + value_length > max_length:
+                parts.append([])
+                length = base_length
+            parts[-1].append(value)
+            length += value_length
+
+        logger.debug("split request to resource '%s' into %d requests", self.name, len(parts))
+        return [dict(request, params=dict(params, **{split_name: part})) for part in parts]
+
+    # ---------------------------------------------------------------------------------------------
+    @property
+    def _coalesce(self) -> bool:
+        """
+        True if and only if identical concurrent calls of this resource share a single request
+        """
+        return bool(self.config.coalesce) and self.config.method == "GET"
+
+    @staticmethod
+    def _request_key(request: dict) -> tuple:
+        """
+        return a hashable that identifies the given request, i.e. its method, URL and parameters
+        """
+        params = tuple(sorted((name, repr(value)) for name, value in request["params"].items()))
+        return (request["method"], request["url"], params)
+
+    def _tenant_request_key(self, request: dict) -> tuple:
+        """
+        return a hashable that identifies the given request of the current tenant, so only the
+        identical requests of a single tenant share a response
+        """
+        return (id(self._current_auth()),) + self._request_key(request)
+
+    def _current_auth(self):
+        """
+        return the authentication of the current tenant, or of the API if there is none
+        """
+        return _tenant_auth.get().get(self.api, self.auth)
+
+    # ---------------------------------------------------------------------------------------------
+    def _send(self, request: dict, response_handler: Response):
+        """ Send the given request to the REST API, retry it if needed and allowed, and process
+            the response with the given response handler.
+
+        """
+        response = self._request_with_retries(request)
+        return self._handle_response(response, response_handler)
+
+    async def _asend(self, request: dict, response_handler: Response):
+        """ Coroutine version of :meth:`_send`.
+
+        """
+        response = await self._arequest_with_retries(request)
+        return self._handle_response(response, response_handler)
+
+    def _request_with_retries(self, request: dict) -> requests.Response:
+        """ Send the given request, and retry it according to the retry policy of the resource.
+
+            :return: the last response, which can still indicate an error
+            :raises requests.ConnectionError: when the connection for the last attempt failed
+            :raises requests.Timeout: when the last attempt timed out
+            :raises RestCircuitOpenError: when the circuit breaker of the resource is open
+
+        """
+        positions = self._file_positions(request)
+        attempt = 0
+        delay = None
+        while True:
+            attempt += 1
+            if attempt > 1:
+                self._rewind_files(positions)
+            try:
+                response = self._attempt(request)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                delay = self._retry_delay(request, attempt, delay, None, positions)
+                if delay is None:
+                    raise
+                logger.debug("retry %s in %.3f seconds after '%s'", request["url"], delay, e)
+            else:
+                delay = self._retry_delay(request, attempt, delay, response, positions)
+                if delay is None:
+                    return response
+                logger.debug(
+                    "retry %s in %.3f seconds after status %d",
+                    request["url"],
+                    delay,
+                    response.status_code,
+                )
+            time.sleep(delay)
+
+    async def _arequest_with_retries(self, request: dict) -> requests.Response:
+        """ Coroutine version of :meth:`_request_with_retries`.
+
+        """
+        positions = self._file_positions(request)
+        attempt = 0
+        delay = None
+        while True:
+            attempt += 1
+            if attempt > 1:
+                self._rewind_files(positions)
+            try:
+                response = await self._aattempt(request)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self._retry_delay(request, attempt, delay, None, positions)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(request, attempt, delay, response, positions)
+                if delay is None:
+                    return response
+            await asyncio.sleep(delay)
+
+    def _attempt(self, request: dict) -> requests.Response:
+        """ Send a single attempt of the given request, once the rate limits, the bulkhead and the
+            circuit breaker let it through.
+
+            :raises RestBulkheadFullError: when the bulkhead of the resource stays full
+            :raises RestCircuitOpenError: when the circuit breaker rejects the attempt
+            :raises RestDeadlineExceededError: when the deadline has passed
+
+        """
+        for rate_limit in self._rate_limits:
+            rate_limit.acquire()
+        if self._bulkhead is None:
+            return self._checked_attempt(request)
+        self._bulkhead.acquire()
+        try:
+            return self._checked_attempt(request)
+        finally:
+            self._bulkhead.release()
+
+    async def _aattempt(self, request: dict) -> requests.Response:
+        """ Coroutine version of :meth:`_attempt`.
+
+        """
+        for rate_limit in self._rate_limits:
+            await rate_limit.aacquire()
+        if self._bulkhead is None:
+            return await self._achecked_attempt(request)
+        await self._bulkhead.aacquire()
+        try:
+            return await self._achecked_attempt(request)
+        finally:
+            self._bulkhead.release()
+
+    def _checked_attempt(self, request: dict) -> requests.Response:
+        """ Send a single attempt of the given request, once the circuit breaker lets it through,
+            and register its outcome.
+
+        """
+        token = self._before_attempt()
+        with _attempt_clock() as clock:
+            try:
+                response = self._hedged_request(request)
+            except requests.RequestException:
+                self._after_attempt(clock.elapsed(), None, token)
+                raise
+            except BaseException:
+                # e.g. a shed request or a cancelled task, which must not keep its probe slot
+                self._cancel_attempt(token)
+                raise
+        self._after_attempt(clock.elapsed(), response, token)
+        return response
+
+    async def _achecked_attempt(self, request: dict) -> requests.Response:
+        """ Coroutine version of :meth:`_checked_attempt`.
+
+        """
+        token = self._before_attempt()
+        with _attempt_clock() as clock:
+            try:
+                response = await self._ahedged_request(request)
+            except requests.RequestException:
+                self._after_attempt(clock.elapsed(), None, token)
+                raise
+            except BaseException:
+                # e.g. a shed request or a cancelled task, which must not keep its probe slot
+                self._cancel_attempt(token)
+                raise
+        self._after_attempt(clock.elapsed(), response, token)
+        return response
+
+    def _hedged_request(self, request: dict) -> requests.Response:
+        """ Send the given request, and send it a second time if it is slow and the hedge policy
+            of the resource allows it.
+
+        """
+        delay = self._hedge_delay(request)
+        if delay is None:
+            return self._timed_request(request)
+        return hedge(
+            self._hedged_attempt(request), delay, self.config.hedge.budget, self._bulkhead
+        )
+
+    async def _ahedged_request(self, request: dict) -> requests.Response:
+        """ Coroutine version of :meth:`_hedged_request`.
+
+        """
+        delay = self._hedge_delay(request)
+        if delay is None:
+            return await self._atimed_request(request)
+        return await ahedge(
+            self._hedged_attempt(request), delay, self.config.hedge.budget, self._bulkhead
+        )
+
+    def _hedged_attempt(self, request: dict):
+        """ Return the function that :func:`hedge` calls to send the given request.
+
+        """
+        calls = itertools.count()
+
+        def send():
+            if next(calls):
+                # the hedge waits for its slot while the first request is in flight, which is
+                # part of the duration of the attempt as a whole
+                _attempt_clocks.set(())
+            return self._timed_request(request)
+
+        return send
+
+    def _hedge_delay(self, request: dict) -> Optional[float]:
+        """ Return the time after which the given request is sent a second time, or None if it
+            should not be hedged.
+
+        """
+        if self.config.hedge is None or request["method"] != "GET":
+            return None
+        return self.config.hedge.hedge_delay(self._latencies)
+
+    def _timed_request(self, request: dict) -> requests.Response:
+        """ Send the given request once and record its latency.
+
+        """
+        with _attempt_clock() as clock:
+            try:
+                response = self._balanced_request(request)
+            except requests.Timeout:
+                # the latency of a request that timed out is at least its timeout
+                self._latencies.record(clock.elapsed())
+                raise
+        self._latencies.record(clock.elapsed())
+        return response
+
+    async def _atimed_request(self, request: dict) -> requests.Response:
+        """ Coroutine version of :meth:`_timed_request`.
+
+        """
+        with _attempt_clock() as clock:
+            try:
+                response = await self._abalanced_request(request)
+            except requests.Timeout:
+                # the latency of a request that timed out is at least its timeout
+                self._latencies.record(clock.elapsed())
+                raise
+        self._latencies.record(clock.elapsed())
+        return response
+
+    def _balanced_request(self, request: dict) -> requests.Response:
+        """ Send the given request to the replica the load balancer of the API chooses. When the
+            connection to that replica fails, an idempotent request fails over to the next one.
+
+        """
+        balancer = self.api.balancer if self.api is not None else None
+        if balancer is None:
+            return self._request(request)
+
+        positions = self._file_positions(request)
+        tried = []
+        while True:
+            replica = balancer.acquire(exclude=tried)
+            with _attempt_clock() as clock:
+                try:
+                    response = self._request(
+                        dict(request, url=self._replica_url(request["url"], replica))
+                    )
+                except requests.RequestException as e:
+                    balancer.release(replica, clock.elapsed(), False)
+                    tried.append(replica)
+                    if (
+                        isinstance(e, requests.ConnectionError)
+                        and request["method"] in IDEMPOTENT_METHODS
+                        and positions is not None
+                        and len(tried) < len(balancer.urls)
+                    ):
+                        logger.debug("failing over %s after '%s'", request["url"], e)
+                        self._rewind_files(positions)
+                        continue
+                    raise
+                except BaseException:
+                    # e.g. a deadline, a shed request or a cancelled task, which says nothing
+                    # about the replica
+                    balancer.release(replica, clock.elapsed(), None)
+                    raise
+                balancer.release(replica, clock.elapsed(), response.status_code < 500)
+            return response
+
+    async def _abalanced_request(self, request: dict) -> requests.Response:
+        """ Coroutine version of :meth:`_balanced_request`.
+
+        """
+        balancer = self.api.balancer if self.api is not None else None
+        if balancer is None:
+            return await self._arequest(request)
+
+        positions = self._file_positions(request)
+        tried = []
+        while True:
+            replica = balancer.acquire(exclude=tried)
+            with _attempt_clock() as clock:
+                try:
+                    response = await self._arequest(
+                        dict(request, url=self._replica_url(request["url"], replica))
+                    )
+                except requests.RequestException as e:
+                    balancer.release(replica, clock.elapsed(), False)
+                    tried.append(replica)
+                    if (
+                        isinstance(e, requests.ConnectionError)
+                        and request["method"] in IDEMPOTENT_METHODS
+                        and positions is not None
+                        and len(tried) < len(balancer.urls)
+                    ):
+                        logger.debug("failing over %s after '%s'", request["url"], e)
+                        self._rewind_files(positions)
+                        continue
+                    raise
+                except BaseException:
+                    # e.g. a deadline, a shed request or a cancelled task, which says nothing
+                    # about the replica
+                    balancer.release(replica, clock.elapsed(), None)
+                    raise
+                balancer.release(replica, clock.elapsed(), response.status_code < 500)
+            return response
+
+    def _replica_url(self, url: str, replica: str) -> str:
+        """ Return the given URL, resolved against the server URL of the resource, resolved
+            against the given base URL instead.
+
+        """
+        return urljoin(replica, url[len(urljoin(self.server_url, ".")):])
+
+    def _timeout(self) -> Optional[tuple]:
+        """ Return the timeout of the next attempt: the configured timeouts, or the adaptive read
+            timeout, limited by the deadline.
+
+        """
+        read_timeout = self.config.read_timeout
+        if self.config.adaptive_timeout is not None:
+            adaptive_read_timeout = self.config.adaptive_timeout.read_timeout(self._latencies)
+            if adaptive_read_timeout is not None:
+                read_timeout = adaptive_read_timeout
+        return timeouts.request_timeout(self.config.connect_timeout, read_timeout)
+
+    def _before_attempt(self) -> Optional[int]:
+        """ Register the start of an attempt.
+
+            :return: the token of the attempt of the circuit breaker, see
+                :meth:`CircuitBreaker.before_call`
+
+        """
+        if self._circuit_breaker is not None:
+            return self._circuit_breaker.before_call()
+        return None
+
+    def _cancel_attempt(self, token: Optional[int]):
+        """ Register that an attempt failed before its request could be sent, e.g. because the
+            scheduler shed it.
+
+            :param token: the token that :meth:`_before_attempt` returned for the attempt
+
+        """
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.cancel(token)
+
+    def _after_attempt(
+        self, duration: float, response: Optional[requests.Response], token: Optional[int]
+    ):
+        """ Register the outcome of an attempt that took the given time.
+
+            :param duration: the duration of the attempt in seconds, without the time its
+                request waited for a slot of the scheduler
+            :param response: the response to the attempt, or None if the attempt failed without
+                a response
+            :param token: the token that :meth:`_before_attempt` returned for the attempt
+
+        """
+        success = response is not None and response.status_code < 500
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.record(success, duration, token)
+        if self._limiter is not None:
+            self._limiter.record(duration, success)
+
+    @property
+    def _rate_limits(self) -> list:
+        """
+        the TokenBuckets that each request of this resource has to pass: the one of the API
+        followed by the one of the resource itself
+        """
+        rate_limits = []
+        if self.api is not None and self.api.config.rate_limit is not None:
+            rate_limits.append(self.api.config.rate_limit)
+        if self.config.rate_limit is not None:
+            rate_limits.append(self.config.rate_limit)
+        return rate_limits
+
+    @staticmethod
+    def _file_positions(request: dict) -> Optional[list]:
+        """ Return the (file, position) pairs of the file objects of the given request, so they
+            can be rewound before the request is sent again, or None if one of them cannot be
+            rewound.
+
+        """
+        positions = []
+        for _, value in request.get("files") or []:
+            file = value[1] if isinstance(value, (tuple, list)) and len(value) > 1 else value
+            if isinstance(file, (str, bytes)) or not hasattr(file, "read"):
+                continue
+            try:
+                if not file.seekable():
+                    return None
+                positions.append((file, file.tell()))
+            except (AttributeError, OSError, ValueError):
+                return None
+        return positions
+
+    @staticmethod
+    def _rewind_files(positions: Optional[list]):
+        """ Move each file returned by :meth:`_file_positions` back to its original position.
+
+        """
+        for file, position in positions or []:
+            file.seek(position)
+
+    def _retry_delay(
+        self,
+        request: dict,
+        attempt: int,
+        previous_delay: Optional[float],
+        response: Optional[requests.Response],
+        positions: Optional[list],
+    ) -> Optional[float]:
+        """ Return the wait before the next attempt of the given request, or None if the request
+            should not be retried.
+
+            :param response: the response to the failed attempt, or None if the connection failed
+            :param positions: the result of :meth:`_file_positions` for the request, where None
+                means that its files cannot be sent again
+
+        """
+        policy = self.config.retry
+        if policy is None:
+            return None
+        if response is not None and not policy.retries_status(response.status_code):
+            policy.budget.record_success()
+            return None
+        policy.budget.record_failure()
+        if not policy.can_retry(request["method"], attempt):
+            return None
+        if positions is None:
+            logger.debug("no retry of %s as its files cannot be sent again", request["url"])
+            return None
+        delay = policy.delay(previous_delay, response)
+        remaining = timeouts.remaining()
+        if delay is not None and remaining is not None and delay >= remaining:
+            logger.debug("no retry of %s as the deadline would pass", request["url"])
+            return None
+        return delay
+
+    def _request(self, request: dict, scheduled: bool = False) -> requests.Response:
+        """ Send the given request to the REST API once, as soon as the scheduler of the API
+            grants it a slot.
+
+            This should be the *only* place in the module where the Requests module is called!
+
+            :param scheduled: True if the caller already holds the slot of the request
+
+        """
+        scheduler = self.api.config.scheduler if self.api is not None else None
+        if scheduler is not None and not scheduled:
+            queued_since = time.monotonic()
+            with scheduler.slot(request["url"], current_priority() or self.config.priority):
+                _record_queued(time.monotonic() - queued_since)
+                return self._request(request, scheduled=True)
+
         # Do HTTP request to REST API
-        logger.debug(" running %s" % self.query_url)
+        logger.debug(" running %s" % request["url"])
+        params = self._encode_params(request["params"])
+        auth = self._current_auth()
+        # the timeouts are computed once the request has its slot, as they are limited by the
+        # deadline, and the time the request waited for its slot has passed
+        return self._session.request(
+            auth=auth,
+            verify=self.verify_ssl,
+            timeout=self._timeout(),
+            **dict(request, params=params),
+        )
+
+    async def _arequest(self, request: dict) -> requests.Response:
+        """ Coroutine version of :meth:`_request`. The request waits for its slot in the event
+            loop, and is sent from the default executor once it has its slot.
+
+        """
+        scheduler = self.api.config.scheduler if self.api is not None else None
+        if scheduler is None:
+            return await run_in_executor(self._request, request)
+
+        url = request["url"]
+        queued_since = time.monotonic()
+        await scheduler.aacquire(url, current_priority() or self.config.priority)
+        _record_queued(time.monotonic() - queued_since)
+
+        def scheduled_request():
+            try:
+                return self._request(request, scheduled=True)
+            finally:
+                scheduler.release(url)
+
+        # the slot is released by the executor, so a cancelled task cannot leak it
+        return await asyncio.shield(run_in_executor(scheduled_request))
+
+    @staticmethod
+    def _handle_response(response: requests.Response, response_handler: Response):
+        """ Process the given response with the given response handler, or raise the exception
+            that matches its HTTP error.
+
+        """
         try:
-            response = requests.request(
-                method=self.config.method,
-                auth=self.auth,
-                verify=self.verify_ssl,
-                url=self.query_url,
-                params=query_parameters["request"],
-                json=query_parameters["body"],
-                files=query_parameters["file"],
-                headers=self.config.headers,
-            )
             assert isinstance(response, requests.Response)
 
             if response.status_code > 399:  # Nicely catch exceptions
-                raise RestResourceHTTPError(response_object=response)
+                raise transport.RestResourceHTTPError(response_object=response)
             # for completeness sake: let requests check for valid output
             # code should not get here...
             response.raise_for_status()
@@ -556,7 +1382,7 @@ class Resource(ABC):
             # not get here
             raise http
         else:
-            r = self.response(response)
+            r = response_handler(response)
             return r
 
 
@@ -3,20 +3,24 @@ around the data the comes from the REST server after the client asks for it.
 
 """
 
+from __future__ import annotations
+
 import copy
-import requests
 import logging
 from abc import ABC, abstractmethod
 from typing import List, Optional, Type
 
-from requests.packages.urllib3 import disable_warnings
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-
 # ================================================================================================
 # local imports
-from .exception import RestResourceMissingContentError, RestClientConfigurationError
+from .exception import (
+    RestResourceMissingContentError,
+    RestClientConfigurationError,
+    RestClientQueryError,
+)
+from .utils import LazyModule
+
+requests = LazyModule("requests")
 
-disable_warnings(InsecureRequestWarning)
 logger = logging.getLogger(__name__)
 
 # =================================================================================================
@@ -69,6 +73,30 @@ class Response(ABC):
         """Return the data of interest of the REST response."""
         return self.data
 
+    def merge(self, responses: List["Response"]):
+        """Combine the given responses, each to a part of a single query, into the current one.
+
+        This is used when a query is split into several requests, e.g. because its URL would
+        become too long. By default the data of interest of each response should be a list, and
+        the combined data is the concatenation of these lists.
+
+        """
+        data = []
+        for response in responses:
+            if not isinstance(response, Response) or not isinstance(response.data, list):
+                raise RestClientQueryError(
+                    f"cannot combine the responses to a split query into {type(self).__name__}"
+                )
+            data.extend(response.data)
+
+        first = responses[0]
+        self._response = first._response
+        self.headers = first.headers
+        self._headers_lowercase = first._headers_lowercase
+        self.raw = [response.raw for response in responses]
+        self.data = data
+        return self
+
     @abstractmethod
     def _check_content(self):
         pass
@@ -131,6 +159,17 @@ class JSONResponse(Response):
         setattr(self, self.create_attribute, json)
         self.data = json
 
+    def merge(self, responses: List[Response]):
+        """Combine the given responses into the current one.
+
+        The lists that are found at the extract_section of each response are concatenated.
+        Attribute raw contains the list of the complete JSON responses.
+
+        """
+        super().merge(responses)
+        setattr(self, self.create_attribute, self.data)
+        return self
+
 
 class CSVResponse(Response):
     """Wrap a REST response for content type text/csv.
@@ -0,0 +1,182 @@
+"""Contains the configuration of the retries of failed requests.
+
+"""
+import logging
+import random
+import threading
+from typing import Iterable, Optional
+
+# ================================================================================================
+# local imports
+from .exception import RestClientConfigurationError
+
+logger = logging.getLogger(__name__)
+
+
+# ================================================================================================
+class RetryBudget:
+    """Limit the number of retries relative to the number of successful requests.
+
+    The budget holds a number of tokens. Each failed request removes a token, each successful
+    request adds a fraction of a token, and a retry is only allowed while more than half of the
+    tokens are left. When a server fails most requests, the retries soon stop, so they cannot
+    multiply the load on a server that is already in trouble.
+
+    A RetryBudget can be used from multiple threads at the same time.
+
+    """
+
+    def __init__(self, max_tokens: float = 10, token_ratio: float = 0.1):
+        """
+        :param max_tokens: the maximum number of tokens, which is also the initial number
+        :param token_ratio: the number of tokens a successful request adds
+
+        """
+        if max_tokens <= 0:
+            raise RestClientConfigurationError("max_tokens must be positive")
+        if token_ratio <= 0:
+            raise RestClientConfigurationError("token_ratio must be positive")
+
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        """Return the number of tokens left."""
+        return self._tokens
+
+    def record_success(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.token_ratio)
+
+    def record_failure(self):
+        with self._lock:
+            self._tokens = max(0, self._tokens - 1)
+
+    def allows_retry(self) -> bool:
+        """Return True if and only if the budget allows another retry."""
+        return self._tokens > self.max_tokens / 2
+
+
+# ================================================================================================
+class RetryPolicy:
+    """Configure when and how often a failed request is retried.
+
+    A request is retried when the connection fails or times out, or when the server responds with
+    one of the retry statuses. Only idempotent methods are retried, as the server might already
+    have processed a request that failed.
+
+    The wait before each retry uses "decorrelated jitter": it is a random time between the base
+    delay and three times the previous wait, limited by the maximum delay. This spreads the
+    retries of many clients, so they don't hit the server again at the same time. When the server
+    responds with a Retry-After header, that time is used instead.
+
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 10.0,
+        statuses: Iterable[int] = (429, 500, 502, 503, 504),
+        methods: Iterable[str] = ("GET", "PUT"),
+        max_retry_after: Optional[float] = 60.0,
+        budget: Optional[RetryBudget] = None,
+    ):
+        """
+        :param max_attempts: the maximum number of attempts of a request, including the first one
+        :param base_delay: the minimum wait in seconds before a retry
+        :param max_delay: the maximum wait in seconds before a retry
+        :param statuses: the HTTP status codes of a response that cause a retry
+        :param methods: the HTTP methods that are retried
+        :param max_retry_after: the maximum wait in seconds the server can ask for in a
+            Retry-After header: if it asks for more, the request is not retried. None for no
+            maximum
+        :param budget: the budget that limits the retries of all requests that use this policy.
+            Defaults to a RetryBudget with the default arguments
+
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+        self.max_retry_after = max_retry_after
+        self.budget = budget if budget is not None else RetryBudget()
+        self._validate()
+
+    def _validate(self):
+        """internal routine to check if the RetryPolicy is configured correctly
+
+        """
+        if not isinstance(self.max_attempts, int) or self.max_attempts < 1:
+            raise RestClientConfigurationError("max_attempts must be a positive integer")
+        if self.base_delay < 0 or self.max_delay < self.base_delay:
+            raise RestClientConfigurationError(
+                "base_delay must be at least 0 and at most max_delay"
+            )
+        if not isinstance(self.budget, RetryBudget):
+            raise RestClientConfigurationError("budget must be a RetryBudget instance")
+
+    # ---------------------------------------------------------------------------------------------
+    def can_retry(self, method: str, attempt: int) -> bool:
+        """Return True if and only if a request that failed its given attempt may be retried."""
+        if method not in self.methods or attempt >= self.max_attempts:
+            return False
+        if not self.budget.allows_retry():
+            logger.debug("retry budget is exhausted")
+            return False
+        return True
+
+    def retries_status(self, status_code: int) -> bool:
+        """Return True if and only if a response with the given status code should be retried."""
+        return status_code in self.statuses
+
+    def backoff(self, previous_delay: Optional[float] = None) -> float:
+        """Return the wait before the next retry, given the wait before the previous one."""
+        previous_delay = previous_delay or self.base_delay
+        upper = max(self.base_delay, previous_delay * 3)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+    def retry_after(self, response) -> Optional[float]:
+        """Return the wait the server asks for in the Retry-After header of the given response.
+
+        :return: the wait in seconds, or None if the response has no (valid) Retry-After header
+        """
+        value = response.headers.get("Retry-After") if response.headers else None
+        if value is None:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+
+        # a date is rare, so the modules to parse it are only imported when one is used
+        from datetime import datetime, timezone
+        from email.utils import parsedate_to_datetime
+
+        try:
+            retry_date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_date.tzinfo is None:
+            retry_date = retry_date.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+    def delay(self, previous_delay: Optional[float], response=None) -> Optional[float]:
+        """Return the wait before the next retry of a request.
+
+        :param previous_delay: the wait before the previous retry, or None for the first retry
+        :param response: the failed response, or None when the connection failed
+        :return: the wait in seconds, or None if the request should not be retried because the
+            server asks for a wait longer than max_retry_after
+
+        """
+        if response is not None and response.status_code in (429, 503):
+            retry_after = self.retry_after(response)
+            if retry_after is not None:
+                if self.max_retry_after is not None and retry_after > self.max_retry_after:
+                    return None
+                return retry_after
+        return self.backoff(previous_delay)
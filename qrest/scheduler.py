@@ -0,0 +1,275 @@
+"""Contains the RequestScheduler, which limits the number of requests in flight per host and lets
+the requests with the highest priority go first.
+
+"""
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+from typing import Optional, Sequence
+from urllib.parse import urlparse
+
+# ================================================================================================
+# local imports
+from . import timeouts
+from .exception import (
+    RestClientConfigurationError,
+    RestDeadlineExceededError,
+    RestRequestShedError,
+)
+from .utils import LazyModule
+
+asyncio = LazyModule("asyncio")
+
+logger = logging.getLogger(__name__)
+
+_priority = contextvars.ContextVar("qrest_priority", default=None)
+
+_WAITING = "waiting"
+_GRANTED = "granted"
+_SHED = "shed"
+
+
+@contextlib.contextmanager
+def priority(name: str):
+    """Send the requests of the calls in the with block with the given priority class.
+
+    The priority overrides the priority of the ResourceConfig, and like a deadline, it also applies
+    to the requests that are sent from other threads and asyncio tasks on behalf of the calls::
+
+        with qrest.priority("low"):
+            api.all_posts()
+
+    :param name: the name of a priority class of the RequestScheduler of the API
+    """
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Optional[str]:
+    """Return the priority class set by :func:`priority`, or None if there is none."""
+    return _priority.get()
+
+
+class _Waiter:
+    """A request that waits for a slot in a thread."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.status = _WAITING
+
+    def wake_up(self, status: str):
+        self.status = status
+        self.event.set()
+
+
+class _AsyncWaiter:
+    """A request that waits for a slot in an asyncio task, without blocking its event loop."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.status = _WAITING
+
+    def wake_up(self, status: str):
+        self.status = status
+        self.loop.call_soon_threadsafe(
+            lambda: self.future.done() or self.future.set_result(None)
+        )
+
+
+class _Host:
+    """The requests in flight to and waiting for a single host."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.queue = []
+
+
+# ================================================================================================
+class RequestScheduler:
+    """Limit the number of requests in flight per host, and queue the other ones by priority.
+
+    Each request belongs to a priority class. When a host has the maximum number of requests in
+    flight, new requests wait in a queue, and each request that completes lets the waiting request
+    with the highest priority go. When the queue is full, the waiting request with the lowest
+    priority is shed to make room, or the new request itself if none has a lower priority. A shed
+    request raises a RestRequestShedError.
+
+    Threads and asyncio tasks can share a single scheduler: a thread waits for a slot on an event,
+    and a task awaits its slot without blocking its event loop or a thread of an executor.
+
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        max_queued: int = 100,
+        priorities: Sequence[str] = ("high", "normal", "low"),
+        default_priority: str = "normal",
+    ):
+        """
+        :param max_in_flight: the maximum number of requests in flight per host
+        :param max_queued: the maximum number of requests that wait per host
+        :param priorities: the names of the priority classes, from the highest to the lowest
+        :param default_priority: the priority class of the requests of an endpoint that does not
+            specify one
+
+        """
+        if not isinstance(max_in_flight, int) or max_in_flight < 1:
+            raise RestClientConfigurationError("max_in_flight must be a positive integer")
+        if not isinstance(max_queued, int) or max_queued < 0:
+            raise RestClientConfigurationError(
+                "max_queued must be an integer that is not negative"
+            )
+        if not priorities or len(set(priorities)) != len(priorities):
+            raise RestClientConfigurationError("priorities must be a sequence of unique names")
+        if default_priority not in priorities:
+            raise RestClientConfigurationError(
+                f"default_priority must be one of {', '.join(priorities)}"
+            )
+
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.priorities = list(priorities)
+        self.default_priority = default_priority
+        self._hosts = {}
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def queued(self, host: str) -> int:
+        """Return the number of requests that wait for the given host."""
+        with self._lock:
+            return len(self._hosts[host].queue) if host in self._hosts else 0
+
+    def in_flight(self, host: str) -> int:
+        """Return the number of requests in flight to the given host."""
+        with self._lock:
+            return self._hosts[host].in_flight if host in self._hosts else 0
+
+    def _rank(self, priority: str) -> int:
+        try:
+            return self.priorities.index(priority)
+        except ValueError:
+            raise RestClientConfigurationError(
+                f"unknown priority '{priority}', use one of {', '.join(self.priorities)}"
+            )
+
+    @contextlib.contextmanager
+    def slot(self, url: str, priority: Optional[str] = None):
+        """Wait until a request to the given URL can be sent, and keep its slot in the with block.
+
+        :param url: the URL of the request, whose host is used
+        :param priority: the priority class of the request, or None for the default priority
+        :raises RestRequestShedError: when the request is shed
+        :raises RestDeadlineExceededError: when the deadline passes while the request waits
+        """
+        host = urlparse(url).netloc
+        self._acquire(host, self._rank(priority or self.default_priority))
+        try:
+            yield
+        finally:
+            self._release(host)
+
+    async def aacquire(self, url: str, priority: Optional[str] = None):
+        """Coroutine that waits until a request to the given URL can be sent and takes its slot,
+        like :meth:`slot`, without blocking the event loop or a thread of an executor. The slot
+        has to be returned with :meth:`release`.
+
+        :param url: the URL of the request, whose host is used
+        :param priority: the priority class of the request, or None for the default priority
+        :raises RestRequestShedError: when the request is shed
+        :raises RestDeadlineExceededError: when the deadline passes while the request waits
+        """
+        await self._aacquire(urlparse(url).netloc, self._rank(priority or self.default_priority))
+
+    def release(self, url: str):
+        """Return the slot of a request to the given URL that was taken by :meth:`aacquire`."""
+        self._release(urlparse(url).netloc)
+
+    def _enqueue(self, host: str, rank: int, waiter):
+        """Take a slot of the given host and return None, or add the given waiter to its queue
+        and return the state of the host.
+
+        """
+        with self._lock:
+            state = self._hosts.setdefault(host, _Host())
+            if state.in_flight < self.max_in_flight and not state.queue:
+                state.in_flight += 1
+                return None
+            if len(state.queue) >= self.max_queued:
+                lowest = max(state.queue, default=None)
+                if lowest is None or lowest[0] <= rank:
+                    raise RestRequestShedError(f"request to {host} is shed: the queue is full")
+                state.queue.remove(lowest)
+                heapq.heapify(state.queue)
+                lowest[2].wake_up(_SHED)
+            heapq.heappush(state.queue, (rank, next(self._order), waiter))
+            return state
+
+    def _leave(self, host: str, state: _Host, waiter) -> bool:
+        """Remove the given waiter from the queue of the host, unless it was granted a slot or
+        shed already, and return True if it was still waiting.
+
+        """
+        with self._lock:
+            if waiter.status != _WAITING:
+                return False
+            state.queue = [entry for entry in state.queue if entry[2] is not waiter]
+            heapq.heapify(state.queue)
+            return True
+
+    @staticmethod
+    def _check_shed(host: str, waiter):
+        if waiter.status == _SHED:
+            logger.debug("request to %s is shed for a request with a higher priority", host)
+            raise RestRequestShedError(f"request to {host} is shed for a higher priority")
+
+    def _acquire(self, host: str, rank: int):
+        waiter = _Waiter()
+        state = self._enqueue(host, rank, waiter)
+        if state is None:
+            return
+
+        remaining = timeouts.remaining()
+        waiter.event.wait(None if remaining is None else max(0, remaining))
+        if self._leave(host, state, waiter):
+            raise RestDeadlineExceededError(f"deadline exceeded while waiting for {host}")
+        self._check_shed(host, waiter)
+
+    async def _aacquire(self, host: str, rank: int):
+        waiter = _AsyncWaiter(asyncio.get_running_loop())
+        state = self._enqueue(host, rank, waiter)
+        if state is None:
+            return
+
+        remaining = timeouts.remaining()
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(waiter.future), None if remaining is None else max(0, remaining)
+            )
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            # a cancelled task passes on the slot it was granted in the meantime
+            if not self._leave(host, state, waiter) and waiter.status == _GRANTED:
+                self._release(host)
+            raise
+        if self._leave(host, state, waiter):
+            raise RestDeadlineExceededError(f"deadline exceeded while waiting for {host}")
+        self._check_shed(host, waiter)
+
+    def _release(self, host: str):
+        with self._lock:
+            state = self._hosts[host]
+            if state.queue:
+                # the slot goes to the waiting request with the highest priority
+                _, _, waiter = heapq.heappop(state.queue)
+                waiter.wake_up(_GRANTED)
+            else:
+                state.in_flight -= 1
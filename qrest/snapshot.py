@@ -0,0 +1,171 @@
+"""
+Compiled snapshots of configuration modules.
+
+Creating the ResourceConfigs of a configuration module validates every endpoint and each of its
+parameters, and applies the defaults of the APIConfig, on every process start. A snapshot stores
+the result of that work in a file, together with a hash of the source of the module, so that a
+later process can load the endpoints without repeating it. A snapshot is only used when the
+format version, the version of qrest and the hash of the source are the same as when it was
+written; otherwise the endpoints are created and validated as usual and the snapshot is replaced.
+
+The values of the class attributes that are not plain data, such as the RetryPolicy or the
+TokenBucket of an endpoint, are not copied into the snapshot. The snapshot refers to them by the
+name of the class and the attribute instead, so that the endpoints share the same objects as when
+they are created from the module.
+
+Only the source files of the configuration classes and their base classes are hashed. A module
+whose settings depend on other inputs, such as environment variables or constants imported from
+another module, has to pass those inputs as the ``key`` of the snapshot; otherwise a snapshot with
+the old settings is loaded after they change.
+
+A snapshot is a pickle file: only load snapshots from a directory that no one else can write to.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import tempfile
+from typing import Dict, Iterable, Optional
+
+from .conf import APIConfig, ParameterConfig, RelatedResource, ResourceConfig
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+"""the version of the format of the snapshot files"""
+
+PLAIN_TYPES = (str, bytes, int, float, bool, type(None), list, tuple, dict, set, frozenset)
+"""the types of the values that are copied into a snapshot"""
+
+
+def source_hash(classes: Iterable[type], key: Optional[str] = None) -> Optional[str]:
+    """Return the hash of the source files of the modules that define the given classes and
+    their base classes, and of the given key, or None when one of these modules has no source
+    file.
+
+    """
+    file_names = set()
+    for cls in classes:
+        for base in cls.__mro__:
+            if base is object:
+                continue
+            file_name = getattr(sys.modules.get(base.__module__), "__file__", None)
+            if file_name is None:
+                return None
+            file_names.add(file_name)
+
+    digest = hashlib.sha256()
+    try:
+        for file_name in sorted(file_names):
+            with open(file_name, "rb") as source_file:
+                digest.update(source_file.read())
+    except OSError:
+        return None
+    if key is not None:
+        digest.update(key.encode())
+    return digest.hexdigest()
+
+
+def snapshot_path(module, directory: str) -> str:
+    """Return the path of the snapshot of the given configuration module."""
+    return os.path.join(os.path.expanduser(directory), f"{module.__name__}.snapshot")
+
+
+def _header(digest: str) -> tuple:
+    """Return the header that identifies a snapshot of a module with the given source hash."""
+    from . import __version__
+
+    return (SNAPSHOT_FORMAT, __version__, digest)
+
+
+def _references(module, classes: Iterable[type]) -> Dict[int, tuple]:
+    """Return the name of the class and the attribute of each value of the class attributes of
+    the given classes that is not copied into a snapshot, by the id of the value.
+
+    """
+    references = {}
+    for cls in classes:
+        if getattr(module, cls.__name__, None) is not cls:
+            continue
+        for name in dir(cls):
+            value = getattr(cls, name, None)
+            if not isinstance(value, PLAIN_TYPES + (ParameterConfig, RelatedResource)):
+                references.setdefault(id(value), (cls.__name__, name))
+    return references
+
+
+def save_snapshot(
+    module, classes: Iterable[type], config: APIConfig, directory: str, key: Optional[str] = None
+):
+    """Write the endpoints of the given APIConfig to the snapshot of the given configuration
+    module.
+
+    A snapshot that cannot be written, e.g. because an endpoint holds a value that cannot be
+    pickled, is logged and skipped.
+
+    :param module: the configuration module
+    :param classes: the APIConfig and ResourceConfig classes of the module
+    :param config: the APIConfig of the module, with validated endpoints
+    :param directory: the directory of the snapshots
+    :param key: the other inputs of the configuration, e.g. the environment variables it reads
+    """
+    classes = list(classes)
+    digest = source_hash(classes, key)
+    if digest is None:
+        logger.debug(f"no snapshot of '{module.__name__}': the source is not available")
+        return
+
+    references = _references(module, classes)
+
+    class SnapshotPickler(pickle.Pickler):
+        def persistent_id(self, value):
+            if isinstance(value, PLAIN_TYPES):
+                return None
+            return references.get(id(value))
+
+    path = snapshot_path(module, directory)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as snapshot_file:
+            pickle.dump(_header(digest), snapshot_file, pickle.HIGHEST_PROTOCOL)
+            SnapshotPickler(snapshot_file, pickle.HIGHEST_PROTOCOL).dump(dict(config.endpoints))
+        os.replace(temp_path, path)
+    except Exception as e:
+        os.unlink(temp_path)
+        logger.debug(f"no snapshot of '{module.__name__}': {e}")
+
+
+def load_snapshot(
+    module, classes: Iterable[type], directory: str, key: Optional[str] = None
+) -> Optional[Dict[str, ResourceConfig]]:
+    """Return the endpoints in the snapshot of the given configuration module, or None when
+    there is no snapshot or it does not match the current source of the module.
+
+    :param module: the configuration module
+    :param classes: the APIConfig and ResourceConfig classes of the module
+    :param directory: the directory of the snapshots
+    :param key: the other inputs of the configuration, e.g. the environment variables it reads
+    """
+    digest = source_hash(classes, key)
+    if digest is None:
+        return None
+
+    class SnapshotUnpickler(pickle.Unpickler):
+        def persistent_load(self, reference):
+            class_name, name = reference
+            return getattr(getattr(module, class_name), name)
+
+    try:
+        with open(snapshot_path(module, directory), "rb") as snapshot_file:
+            if pickle.load(snapshot_file) != _header(digest):
+                logger.debug(f"snapshot of '{module.__name__}' is out of date")
+                return None
+            return SnapshotUnpickler(snapshot_file).load()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.debug(f"cannot load the snapshot of '{module.__name__}': {e}")
+        return None
@@ -0,0 +1,127 @@
+"""Contains the deadline of a call, which limits the total time of all the requests it sends,
+and the adaptive timeout of the requests of an endpoint.
+
+"""
+import contextlib
+import contextvars
+import logging
+import time
+from typing import Optional, Tuple
+
+# ================================================================================================
+# local imports
+from .exception import RestClientConfigurationError, RestDeadlineExceededError
+from .latency import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+_expires_at = contextvars.ContextVar("qrest_deadline", default=None)
+
+
+# ================================================================================================
+class AdaptiveTimeout:
+    """Configure a read timeout that follows the observed latencies of an endpoint.
+
+    The timeout is a multiple of a high percentile of the latencies, bounded by a floor and a
+    ceiling. Until enough latencies have been observed, the configured read timeout applies.
+
+    """
+
+    def __init__(
+        self,
+        percentile: float = 99,
+        multiplier: float = 3.0,
+        floor: float = 1.0,
+        ceiling: float = 60.0,
+        min_samples: int = 50,
+    ):
+        """
+        :param percentile: the percentile (between 0 and 100) of the observed latencies to use
+        :param multiplier: the factor by which the percentile is multiplied
+        :param floor: the minimum timeout in seconds
+        :param ceiling: the maximum timeout in seconds
+        :param min_samples: the minimum number of observed latencies to adapt the timeout
+
+        """
+        if not 0 < percentile <= 100:
+            raise RestClientConfigurationError("percentile must be larger than 0 and at most 100")
+        if multiplier < 1:
+            raise RestClientConfigurationError("multiplier must be at least 1")
+        if not 0 < floor <= ceiling:
+            raise RestClientConfigurationError("floor must be positive and at most ceiling")
+        if not isinstance(min_samples, int) or min_samples < 1:
+            raise RestClientConfigurationError("min_samples must be a positive integer")
+
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+
+    def read_timeout(self, latencies: LatencySketch) -> Optional[float]:
+        """Return the read timeout given the observed latencies of the endpoint, or None if too
+        few latencies have been observed.
+        """
+        if latencies.count < self.min_samples:
+            return None
+        timeout = self.multiplier * latencies.percentile(self.percentile)
+        return min(self.ceiling, max(self.floor, timeout))
+
+
+# ================================================================================================
+@contextlib.contextmanager
+def deadline(seconds: float):
+    """Limit the total time of the calls in the with block to the given number of seconds.
+
+    The deadline covers every request the calls send: the attempts of a retried request, the
+    requests of a call that is split over several requests and the requests of the authentication
+    module. Each request gets at most the time that remains, and once the deadline has passed, a
+    call raises a RestDeadlineExceededError. A nested deadline cannot extend an outer one.
+
+    As the deadline is stored in a context variable, it also applies to the requests that are sent
+    from other threads and asyncio tasks on behalf of the calls::
+
+        with qrest.deadline(5):
+            posts = api.all_posts()
+            comments = api.comments(post_id=[post["id"] for post in posts])
+
+    :param seconds: the maximum total time in seconds
+    """
+    expires_at = time.monotonic() + seconds
+    current = _expires_at.get()
+    if current is not None:
+        expires_at = min(expires_at, current)
+    token = _expires_at.set(expires_at)
+    try:
+        yield
+    finally:
+        _expires_at.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Return the number of seconds until the current deadline, or None if there is none."""
+    expires_at = _expires_at.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+def request_timeout(
+    connect_timeout: Optional[float], read_timeout: Optional[float]
+) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """Return the timeout argument for a request, which is not allowed to exceed the deadline.
+
+    :param connect_timeout: the configured connect timeout, or None for no timeout
+    :param read_timeout: the configured read timeout, or None for no timeout
+    :return: the (connect, read) tuple that requests accepts, or None for no timeout at all
+    :raises RestDeadlineExceededError: when the deadline has already passed
+    """
+    left = remaining()
+    if left is not None:
+        if left <= 0:
+            raise RestDeadlineExceededError("deadline exceeded before the request was sent")
+        connect_timeout = left if connect_timeout is None else min(connect_timeout, left)
+        read_timeout = left if read_timeout is None else min(read_timeout, left)
+    if connect_timeout is None and read_timeout is None:
+        return None
+    return (connect_timeout, read_timeout)
@@ -0,0 +1,75 @@
+"""Contains the parts of qrest that depend on requests: the session that sends the requests of an
+API and the exception for an HTTP error response.
+
+This module is only imported when it is first used, e.g. when the first API is created, since
+importing requests takes a large share of the import time of qrest.
+
+"""
+
+import requests
+
+from requests.packages.urllib3 import disable_warnings
+from requests.packages.urllib3.exceptions import InsecureRequestWarning
+
+# ================================================================================================
+# local imports
+from .exception import (
+    RestAccessDeniedError,
+    RestBadRequestError,
+    RestInternalServerError,
+    RestResourceNotFoundError,
+)
+
+disable_warnings(InsecureRequestWarning)
+
+
+# ===================================================================================================
+class _NoCookies(requests.cookies.RequestsCookieJar):
+    """ A cookie jar that stays empty. """
+
+    def set_cookie(self, cookie, *args, **kwargs):
+        pass
+
+
+def create_session() -> requests.Session:
+    """ Return the session that sends the requests of an API and keeps its connections open.
+
+        The session does not keep the cookies of responses, so requests do not depend on previous
+        ones and the tenants of an API do not share cookies.
+
+    """
+    session = requests.Session()
+    session.cookies = _NoCookies()
+    return session
+
+
+# ===================================================================================================
+class RestResourceHTTPError(requests.HTTPError):
+    """An error when specifying an invalid target for a given REST API."""
+
+    def __init__(self, response_object, *args, **kwargs):
+        """
+        RestResourceError constructor
+        """
+
+        assert isinstance(response_object, requests.Response)
+        self.response = response_object
+        self.code = self.response.status_code
+        self.reason = self.response.reason
+
+        if self.code == 400:
+            raise RestBadRequestError("Bad request for resource %s" % (self.response.url,))
+        elif self.code == 404:
+            raise RestResourceNotFoundError("Object could not be found in database")
+        elif self.code in (401, 402, 403):
+            raise RestAccessDeniedError(
+                "error %d: Access is denied to resource %s" % (self.code, self.response.url)
+            )
+        elif self.code in (500,):
+            raise RestInternalServerError(
+                "error %d: Internal Server error (%s)" % (self.code, self.reason)
+            )
+        else:
+            raise Exception("REST error %d: %s" % (self.code, self.reason))
+
+        super().__init__(*args, **kwargs)
@@ -1,6 +1,7 @@
 """ Contains a set of related and unrelated functions and classes used elsewhere in this module
 """
 
+import importlib
 import logging
 from urllib.parse import urlparse
 from .exception import RestClientConfigurationError
@@ -8,6 +9,31 @@ from .exception import RestClientConfigurationError
 logger = logging.getLogger(__name__)
 
 
+# ###############################################################
+class LazyModule:
+    """
+    stand-in for a module that is only imported when one of its attributes is first used. Some
+    dependencies, such as requests and asyncio, take a large share of the import time of qrest
+    while they are only needed to send requests.
+    """
+
+    def __init__(self, name: str):
+        """
+        set the name of the module to import on first use
+        """
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute: str):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attribute)
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self._name}'>"
+
+
 # ###############################################################
 class URLValidator:
     """
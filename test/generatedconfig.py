@@ -0,0 +1,30 @@
+"""Generate configuration modules with many endpoints."""
+
+import types
+
+ENDPOINT = '''
+class Resource{index}(ResourceConfig):
+    name = "resource_{index}"
+    path = ["items", "{{item_id}}", "resource{index}"]
+    method = "GET"
+    description = "retrieve resource {index} of an item"
+    path_description = {{"item_id": "the ID of the item"}}
+
+    user_id = QueryParameter(name="userId", description="the ID of the user", required=False)
+    limit = QueryParameter(name="limit", description="the maximum number of results", default=10)
+'''
+"""the source of a ResourceConfig with a path parameter and two query parameters"""
+
+
+def create_config_module(count: int) -> types.ModuleType:
+    """Return a configuration module with the given number of endpoints."""
+    module = types.ModuleType("generatedconfig")
+    source = [
+        "from qrest import APIConfig, ResourceConfig, QueryParameter",
+        "class GeneratedConfig(APIConfig):",
+        '    url = "https://api.example.com"',
+        '    default_headers = {"Content-type": "application/json; charset=UTF-8"}',
+    ]
+    source.extend(ENDPOINT.format(index=index) for index in range(count))
+    exec("\n".join(source), vars(module))
+    return module
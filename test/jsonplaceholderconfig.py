@@ -1,4 +1,5 @@
 from qrest import APIConfig, ResourceConfig, BodyParameter, QueryParameter, FileParameter
+from qrest import RelatedResource
 
 
 class JsonPlaceHolderConfig(APIConfig):
@@ -12,6 +13,8 @@ class AllPosts(ResourceConfig):
     method = "GET"
     description = "retrieve all posts"
 
+    comments = RelatedResource(resource="comments", field="id", parameter="post_id")
+
 
 class FilterPosts(ResourceConfig):
 
@@ -23,6 +26,16 @@ class FilterPosts(ResourceConfig):
     user_id = QueryParameter(name="userId", description="the user ID of the author of the post")
 
 
+class SelectPosts(ResourceConfig):
+
+    name = "select_posts"
+    path = ["posts"]
+    method = "GET"
+    description = "retrieve the posts with the given IDs"
+
+    post_id = QueryParameter(name="id", multiple=True, description="the IDs of the posts")
+
+
 class SinglePost(ResourceConfig):
 
     name = "single_post"
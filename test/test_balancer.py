@@ -0,0 +1,144 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.balancer import LoadBalancer, LoadBalancing
+from qrest.exception import RestClientConfigurationError, RestDeadlineExceededError
+
+from . import jsonplaceholderconfig
+
+REPLICAS = ["https://replica-1.example.com/", "https://replica-2.example.com/"]
+
+
+def _create_mock_response(status_code=200):
+    mock_response = mock.Mock(spec=requests.Response)
+    mock_response.status_code = status_code
+    mock_response.reason = "reason"
+    mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+    mock_response.json = mock.Mock(return_value=[])
+    return mock_response
+
+
+class LoadBalancerTests(unittest.TestCase):
+    def test_least_outstanding_chooses_the_least_busy_replica(self):
+        balancer = LoadBalancer(REPLICAS, LoadBalancing())
+        first = balancer.acquire()
+        second = balancer.acquire()
+
+        self.assertEqual(set(REPLICAS), {first, second})
+
+    def test_ewma_prefers_the_fastest_replica(self):
+        balancer = LoadBalancer(REPLICAS, LoadBalancing(strategy="ewma"))
+        balancer.release(balancer.acquire(exclude=[REPLICAS[1]]), 1.0, True)
+        balancer.release(balancer.acquire(exclude=[REPLICAS[0]]), 0.1, True)
+
+        self.assertEqual(REPLICAS[1], balancer.acquire())
+
+    def test_failing_replica_is_ejected(self):
+        balancer = LoadBalancer(REPLICAS, LoadBalancing(max_failures=2))
+        for _ in range(2):
+            balancer.release(balancer.acquire(exclude=[REPLICAS[1]]), 0.1, False)
+
+        self.assertEqual({REPLICAS[0]: "ejected", REPLICAS[1]: "healthy"}, balancer.states())
+        for _ in range(3):
+            self.assertEqual(REPLICAS[1], balancer.acquire())
+
+    def test_ejected_replica_is_used_when_no_other_is_left(self):
+        balancer = LoadBalancer(REPLICAS[:1], LoadBalancing(max_failures=1))
+        balancer.release(balancer.acquire(), 0.1, False)
+
+        self.assertEqual(REPLICAS[0], balancer.acquire())
+
+    def test_bad_configuration(self):
+        with self.assertRaises(RestClientConfigurationError):
+            LoadBalancing(strategy="round_robin")
+        with self.assertRaises(RestClientConfigurationError):
+            LoadBalancing(max_failures=0)
+
+
+class LoadBalancingResourceTests(unittest.TestCase):
+    def setUp(self):
+        config_class = jsonplaceholderconfig.JsonPlaceHolderConfig
+        with mock.patch.object(config_class, "url", REPLICAS):
+            self.api = qrest.API(jsonplaceholderconfig)
+
+    def test_requests_are_resolved_against_the_chosen_replica(self):
+        with mock.patch(
+            "requests.Session.request", return_value=_create_mock_response()
+        ) as request:
+            self.api.single_post(item=1)
+            self.api.single_post(item=1)
+
+            urls = sorted(call[1]["url"] for call in request.call_args_list)
+            self.assertEqual([replica + "posts/1" for replica in REPLICAS], urls)
+
+    def test_connection_error_fails_over_to_the_next_replica(self):
+        responses = [requests.ConnectionError("refused"), _create_mock_response()]
+        with mock.patch("requests.Session.request", side_effect=responses) as request:
+            self.assertEqual([], self.api.all_posts())
+
+            urls = [call[1]["url"] for call in request.call_args_list]
+            self.assertEqual(2, len(set(urls)))
+
+    def test_connection_error_fails_over_from_a_task(self):
+        responses = [requests.ConnectionError("refused"), _create_mock_response()]
+        with mock.patch("requests.Session.request", side_effect=responses) as request:
+            self.assertEqual([], asyncio.run(self.api.all_posts.acall()))
+
+            self.assertEqual(2, request.call_count)
+
+    def test_errors_without_response_end_the_outstanding_requests(self):
+        side_effect = RestDeadlineExceededError("deadline exceeded")
+        with mock.patch("requests.Session.request", side_effect=side_effect):
+            for _ in range(3):
+                with self.assertRaises(RestDeadlineExceededError):
+                    self.api.all_posts()
+                with self.assertRaises(RestDeadlineExceededError):
+                    asyncio.run(self.api.all_posts.acall())
+
+        replicas = self.api.balancer._replicas
+        outstanding = {url: replica.outstanding for url, replica in replicas.items()}
+        self.assertEqual({replica: 0 for replica in REPLICAS}, outstanding)
+        self.assertEqual({replica: "healthy" for replica in REPLICAS}, self.api.replica_states())
+
+    def test_failover_sends_the_whole_file(self):
+        self.api.upload_file.config.method = "PUT"
+        bodies = []
+
+        def request(**kwargs):
+            (_, (_, upload)), = kwargs["files"]
+            bodies.append(upload.read())
+            if len(bodies) == 1:
+                raise requests.ConnectionError("reset")
+            return _create_mock_response()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "upload.txt")
+            with open(path, "wb") as upload:
+                upload.write(b"content" * 100)
+            with open(path, "rb") as upload:
+                with mock.patch("requests.Session.request", side_effect=request):
+                    self.api.upload_file(file=("upload.txt", upload))
+
+        self.assertEqual([b"content" * 100] * 2, bodies)
+
+    def test_post_does_not_fail_over(self):
+        with mock.patch("requests.Session.request", side_effect=requests.ConnectionError("reset")):
+            with self.assertRaises(requests.ConnectionError):
+                self.api.create_post(title="title", content="content")
+
+    def test_replica_states_of_the_api(self):
+        self.assertEqual(
+            {replica: "healthy" for replica in REPLICAS}, self.api.replica_states()
+        )
+
+    def test_bad_url_in_list_is_rejected(self):
+        config_class = jsonplaceholderconfig.JsonPlaceHolderConfig
+        with mock.patch.object(config_class, "url", [REPLICAS[0], "replica-2"]):
+            with self.assertRaises(RestClientConfigurationError):
+                qrest.API(jsonplaceholderconfig)
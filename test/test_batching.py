@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.batching import BatchLoader
+from qrest.exception import RestClientConfigurationError
+
+from . import jsonplaceholderconfig
+
+
+def _create_mock_response(**kwargs):
+    """Return a requests.Response that contains a post for each requested ID."""
+    mock_response = mock.Mock(spec=requests.Response)
+    mock_response.status_code = 200
+    mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+    posts = [{"id": post_id, "title": f"post {post_id}"} for post_id in kwargs["params"]["id"]]
+    mock_response.json = mock.Mock(return_value=posts)
+    return mock_response
+
+
+class BatchLoaderTests(unittest.TestCase):
+    def setUp(self):
+        self.api = qrest.API(jsonplaceholderconfig)
+
+    def test_concurrent_lookups_are_sent_as_a_single_query(self):
+        loader = BatchLoader(
+            self.api.select_posts, parameter="post_id", key_field="id", window=0.1
+        )
+
+        with mock.patch(
+            "requests.Session.request", side_effect=_create_mock_response
+        ) as mock_request:
+            results = {}
+
+            def load(post_id):
+                results[post_id] = loader.load(post_id)
+
+            threads = [threading.Thread(target=load, args=(i,)) for i in range(1, 6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(1, mock_request.call_count)
+            self.assertEqual([1, 2, 3, 4, 5], sorted(mock_request.call_args[1]["params"]["id"]))
+            for post_id in range(1, 6):
+                self.assertEqual({"id": post_id, "title": f"post {post_id}"}, results[post_id])
+
+    def test_full_batch_is_sent_without_waiting_for_the_window(self):
+        loader = BatchLoader(
+            self.api.select_posts, parameter="post_id", key_field="id", max_batch_size=2, window=60
+        )
+
+        with mock.patch(
+            "requests.Session.request", side_effect=_create_mock_response
+        ) as mock_request:
+            posts = loader.load_many([1, 2, 3, 4])
+
+            self.assertEqual(2, mock_request.call_count)
+            self.assertEqual([1, 2, 3, 4], [post["id"] for post in posts])
+
+    def test_duplicate_keys_are_sent_once(self):
+        loader = BatchLoader(self.api.select_posts, parameter="post_id", key_field="id")
+
+        with mock.patch(
+            "requests.Session.request", side_effect=_create_mock_response
+        ) as mock_request:
+            posts = loader.load_many([1, 1, 2])
+
+            self.assertEqual([1, 2], mock_request.call_args[1]["params"]["id"])
+            self.assertEqual([1, 1, 2], [post["id"] for post in posts])
+
+    def test_missing_item_loads_as_None(self):
+        loader = BatchLoader(self.api.select_posts, parameter="post_id", key_field="id")
+
+        def response_without_posts(**kwargs):
+            return _create_mock_response(params={"id": []})
+
+        with mock.patch("requests.Session.request", side_effect=response_without_posts):
+            self.assertIsNone(loader.load(1))
+
+    def test_lookups_from_tasks_are_sent_as_a_single_query(self):
+        loader = BatchLoader(self.api.select_posts, parameter="post_id", key_field="id")
+
+        async def main():
+            return await asyncio.gather(*[loader.aload(i) for i in range(1, 4)])
+
+        with mock.patch(
+            "requests.Session.request", side_effect=_create_mock_response
+        ) as mock_request:
+            posts = asyncio.run(main())
+
+            self.assertEqual(1, mock_request.call_count)
+            self.assertEqual([1, 2, 3], [post["id"] for post in posts])
+
+    def test_full_batch_from_a_task_does_not_block_the_event_loop(self):
+        loader = BatchLoader(
+            self.api.select_posts, parameter="post_id", key_field="id", max_batch_size=1
+        )
+
+        def slow_request(**kwargs):
+            time.sleep(0.3)
+            return _create_mock_response(**kwargs)
+
+        async def main():
+            ticks = []
+
+            async def tick():
+                while True:
+                    ticks.append(time.monotonic())
+                    await asyncio.sleep(0.01)
+
+            ticker = asyncio.ensure_future(tick())
+            await asyncio.sleep(0)
+            post = await loader.aload(1)
+            ticker.cancel()
+            return post, max(b - a for a, b in zip(ticks, ticks[1:]))
+
+        with mock.patch("requests.Session.request", side_effect=slow_request):
+            post, longest_gap = asyncio.run(main())
+
+        self.assertEqual(1, post["id"])
+        self.assertLess(longest_gap, 0.2)
+
+    def test_raise_proper_exception_when_parameter_is_not_multiple(self):
+        with self.assertRaisesRegex(RestClientConfigurationError, "is not multiple"):
+            BatchLoader(self.api.filter_posts, parameter="user_id", key_field="id")
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.bulkhead import Bulkhead
+from qrest.exception import RestBulkheadFullError, RestClientConfigurationError
+
+from . import jsonplaceholderconfig
+
+
+class BulkheadTests(unittest.TestCase):
+    def test_full_bulkhead_rejects_right_away(self):
+        bulkhead = Bulkhead("posts", 1, timeout=0)
+        bulkhead.acquire()
+
+        start = time.monotonic()
+        with self.assertRaises(RestBulkheadFullError):
+            bulkhead.acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+
+    def test_full_bulkhead_waits_for_the_timeout(self):
+        bulkhead = Bulkhead("posts", 1, timeout=0.05)
+        bulkhead.acquire()
+
+        start = time.monotonic()
+        with self.assertRaises(RestBulkheadFullError):
+            bulkhead.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+    def test_release_lets_a_waiting_thread_go(self):
+        bulkhead = Bulkhead("posts", 1, timeout=5)
+        bulkhead.acquire()
+        threading.Timer(0.05, bulkhead.release).start()
+
+        bulkhead.acquire()
+
+    def test_deadline_limits_the_wait(self):
+        bulkhead = Bulkhead("posts", 1)
+        bulkhead.acquire()
+
+        with qrest.deadline(0.05):
+            with self.assertRaises(RestBulkheadFullError):
+                bulkhead.acquire()
+
+    def test_release_from_a_thread_wakes_up_a_waiting_task(self):
+        bulkhead = Bulkhead("posts", 1, timeout=5)
+        bulkhead.acquire()
+
+        async def main():
+            threading.Timer(0.05, bulkhead.release).start()
+            await asyncio.wait_for(bulkhead.aacquire(), timeout=5)
+
+        asyncio.run(main())
+
+        bulkhead.timeout = 0
+        with self.assertRaises(RestBulkheadFullError):
+            bulkhead.acquire()
+
+    def test_full_bulkhead_rejects_a_task_after_the_timeout(self):
+        bulkhead = Bulkhead("posts", 1, timeout=0.05)
+        bulkhead.acquire()
+
+        with self.assertRaises(RestBulkheadFullError):
+            asyncio.run(bulkhead.aacquire())
+
+
+class BulkheadResourceTests(unittest.TestCase):
+    def setUp(self):
+        config_class = jsonplaceholderconfig.SelectPosts
+        with mock.patch.object(config_class, "max_concurrency", 2, create=True):
+            self.api = qrest.API(jsonplaceholderconfig)
+        self.api.select_posts.config.max_url_length = 100
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _request(self, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+        mock_response = mock.Mock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        posts = [{"id": post_id} for post_id in kwargs["params"].get("id", [])]
+        mock_response.json = mock.Mock(return_value=posts)
+        return mock_response
+
+    def test_split_requests_respect_the_cap(self):
+        post_ids = list(range(1000, 1050))
+        with mock.patch("requests.Session.request", side_effect=self._request) as request:
+            posts = self.api.select_posts(post_id=post_ids)
+
+            self.assertGreater(request.call_count, 2)
+            self.assertEqual(2, self.max_in_flight)
+            self.assertEqual(post_ids, [post["id"] for post in posts])
+
+    def test_split_requests_from_a_task_respect_the_cap(self):
+        post_ids = list(range(1000, 1050))
+        with mock.patch("requests.Session.request", side_effect=self._request) as request:
+            asyncio.run(self.api.select_posts.acall(post_id=post_ids))
+
+            self.assertGreater(request.call_count, 2)
+            self.assertLessEqual(self.max_in_flight, 2)
+
+    def test_other_resources_are_not_capped(self):
+        self.assertIsNotNone(self.api.select_posts._bulkhead)
+        self.assertIsNone(self.api.all_posts._bulkhead)
+
+    def test_full_bulkhead_with_timeout_0_rejects_the_call(self):
+        self.api.select_posts._bulkhead.timeout = 0
+        self.api.select_posts._bulkhead.acquire()
+        self.api.select_posts._bulkhead.acquire()
+
+        with mock.patch("requests.Session.request", side_effect=self._request) as request:
+            with self.assertRaises(RestBulkheadFullError):
+                self.api.select_posts(post_id=[1])
+            request.assert_not_called()
+
+    def test_bad_configuration(self):
+        config_class = jsonplaceholderconfig.SelectPosts
+        for attribute, value in [("max_concurrency", 0), ("bulkhead_timeout", -1)]:
+            with mock.patch.object(config_class, attribute, value, create=True):
+                with self.assertRaises(RestClientConfigurationError):
+                    qrest.API(jsonplaceholderconfig)
@@ -0,0 +1,414 @@
+import builtins
+import itertools
+import os
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock as mock
+
+import requests
+from requests.adapters import BaseAdapter
+
+import qrest
+from qrest.auth import AuthConfig, close_sessions
+from qrest.auth.cas import PREFETCHED_TICKET_LIFETIME, CasAuthConfig, ServiceTicketPool
+from qrest.exception import RestClientConfigurationError
+
+from . import jsonplaceholderconfig
+
+TGT_URL = "https://cas.example.com/v1/tickets/TGT-1"
+
+
+class CASServer:
+    """Fake CAS server that counts the round trips and issues numbered service tickets."""
+
+    def __init__(self):
+        self.round_trips = 0
+        self.issued = 0
+
+    def post(self, url, data, **kwargs):
+        self.round_trips += 1
+        response = mock.Mock(spec=requests.Response)
+        response.status_code = 201
+        response.ok = True
+        if "username" in data:
+            response.headers = {"location": TGT_URL}
+        else:
+            self.issued += 1
+            response.text = f"ST-{self.issued}"
+        return response
+
+
+class OneTimeTicketAdapter(BaseAdapter):
+    """Transport adapter of a server that only accepts each service ticket once."""
+
+    def __init__(self):
+        super().__init__()
+        self.tickets = []
+
+    def send(self, request, **kwargs):
+        self.tickets.append(request.headers["Authorization"])
+        response = requests.Response()
+        response.status_code = 401 if self.tickets.count(self.tickets[-1]) > 1 else 200
+        response._content = b"[]"
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+def create_api(ticket_lifetime=None, prefetch_tickets=0):
+    auth_config = CasAuthConfig(
+        path=["v1", "tickets"],
+        service_name="posts",
+        ticket_lifetime=ticket_lifetime,
+        prefetch_tickets=prefetch_tickets,
+    )
+    config_class = jsonplaceholderconfig.JsonPlaceHolderConfig
+    with mock.patch.object(config_class, "authentication", auth_config):
+        return qrest.API(jsonplaceholderconfig)
+
+
+class CASAuthTests(unittest.TestCase):
+    def setUp(self):
+        self.server = CASServer()
+        self.post = mock.patch("requests.Session.post", side_effect=self.server.post)
+        self.post.start()
+        self.addCleanup(self.post.stop)
+
+    def _login(self, api):
+        api.auth.set_credentials(
+            server_url="https://cas.example.com",
+            username="user",
+            password="secret",
+            tgt_volatile_storage=True,
+        )
+
+    def _request(self, **kwargs):
+        prepared = requests.Request(kwargs["method"], kwargs["url"]).prepare()
+        kwargs["auth"](prepared)
+        self.tickets.append(prepared.headers["Authorization"])
+        response = mock.Mock(spec=requests.Response)
+        response.status_code = 200
+        response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        response.json = mock.Mock(return_value=[])
+        return response
+
+    def _call(self, api, count):
+        """Return the number of CAS round trips per call, for the given number of calls."""
+        self.tickets = []
+        round_trips = self.server.round_trips
+        with mock.patch("requests.Session.request", side_effect=self._request):
+            for _ in range(count):
+                api.all_posts()
+        return (self.server.round_trips - round_trips) / count
+
+    def test_service_ticket_is_reused(self):
+        api = create_api()
+        self._login(api)
+
+        self.assertEqual(2, self.server.round_trips)
+        self.assertEqual(0, self._call(api, 10))
+        self.assertEqual(["CAS ST-1"] * 10, self.tickets)
+
+    def test_service_ticket_expires_after_its_lifetime(self):
+        api = create_api(ticket_lifetime=30)
+        self._login(api)
+
+        with mock.patch("time.monotonic", return_value=10 ** 6):
+            self.assertEqual(0.1, self._call(api, 10))
+        self.assertEqual(["CAS ST-2"] * 10, self.tickets)
+
+    def test_lifetime_0_requests_a_service_ticket_per_call(self):
+        api = create_api(ticket_lifetime=0)
+        self._login(api)
+
+        self.assertEqual(1, self._call(api, 10))
+        self.assertEqual(10, len(set(self.tickets)))
+
+    def test_rejected_service_ticket_is_renewed(self):
+        api = create_api()
+        self._login(api)
+
+        adapter = OneTimeTicketAdapter()
+        session = requests.Session()
+        session.mount("https://", adapter)
+        first = session.get("https://jsonplaceholder.typicode.com/posts", auth=api.auth)
+        second = session.get("https://jsonplaceholder.typicode.com/posts", auth=api.auth)
+
+        self.assertEqual(200, first.status_code)
+        self.assertEqual(200, second.status_code)
+        self.assertEqual(401, second.history[0].status_code)
+        self.assertEqual(["CAS ST-1", "CAS ST-1", "CAS ST-2"], adapter.tickets)
+        self.assertEqual(3, self.server.round_trips)
+
+    def test_request_with_a_streamed_body_is_not_resent(self):
+        api = create_api()
+        self._login(api)
+
+        adapter = OneTimeTicketAdapter()
+        session = requests.Session()
+        session.mount("https://", adapter)
+        url = "https://jsonplaceholder.typicode.com/posts"
+        session.get(url, auth=api.auth)
+        response = session.request("POST", url, data=iter([b"{}"]), auth=api.auth)
+
+        self.assertEqual(401, response.status_code)
+        self.assertEqual(["CAS ST-1", "CAS ST-1"], adapter.tickets)
+        self.assertEqual(200, session.get(url, auth=api.auth).status_code)
+        self.assertEqual("CAS ST-2", adapter.tickets[-1])
+
+    def test_prefetched_service_tickets_are_used_once(self):
+        api = create_api(prefetch_tickets=4)
+        self._login(api)
+        self.addCleanup(api.auth.close)
+
+        self._call(api, 10)
+
+        self.assertEqual(10, len(set(self.tickets)))
+
+    def test_prefetched_service_tickets_expire_by_default(self):
+        api = create_api(prefetch_tickets=4)
+
+        self.assertEqual(PREFETCHED_TICKET_LIFETIME, api.auth._ticket_pool.ticket_lifetime)
+
+    def test_rejected_prefetched_ticket_discards_the_pool(self):
+        api = create_api(prefetch_tickets=4)
+        self._login(api)
+        self.addCleanup(api.auth.close)
+        pool = api.auth._ticket_pool
+        end = time.monotonic() + 5
+        while pool.size < 1 and time.monotonic() < end:
+            time.sleep(0.005)
+        with pool._condition:
+            pool._tickets.clear()
+            pool._tickets.extend((ticket, time.monotonic()) for ticket in ["ST-old", "ST-older"])
+
+        adapter = OneTimeTicketAdapter()
+        adapter.tickets = ["CAS ST-old", "CAS ST-older"]
+        session = requests.Session()
+        session.mount("https://", adapter)
+        response = session.get("https://jsonplaceholder.typicode.com/posts", auth=api.auth)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("CAS ST-old", adapter.tickets[2])
+        self.assertNotIn(adapter.tickets[3], ["CAS ST-old", "CAS ST-older"])
+        self.assertNotIn("ST-older", [ticket for ticket, _ in pool._tickets])
+
+    def test_close_stops_the_prefetch_thread(self):
+        api = create_api(prefetch_tickets=4)
+        self._login(api)
+        self._call(api, 2)
+        thread = api.auth._ticket_pool._thread
+        self.assertTrue(thread.is_alive())
+
+        api.auth.close()
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(0, api.auth._ticket_pool.size)
+
+    def test_requests_share_a_pooled_session(self):
+        api = create_api(ticket_lifetime=0)
+        self._login(api)
+        session = api.auth.session
+        self._call(api, 3)
+
+        self.assertIs(session, api.auth.session)
+        adapter = session.get_adapter("https://cas.example.com")
+        self.assertEqual(AuthConfig.max_connections, adapter._pool_maxsize)
+
+    def test_tenants_share_the_session(self):
+        tenants = [create_api(), create_api()]
+
+        self.assertIs(tenants[0].auth.session, tenants[1].auth.session)
+
+    def test_requests_use_the_timeouts_of_the_auth_config(self):
+        api = create_api()
+        api.auth.auth_config_object.read_timeout = 3
+        self._login(api)
+
+        with mock.patch("requests.Session.post", side_effect=self.server.post) as post:
+            api.auth.request_new_service_ticket()
+            self.assertEqual((AuthConfig.connect_timeout, 3), post.call_args.kwargs["timeout"])
+
+            with qrest.deadline(1):
+                api.auth.request_new_service_ticket()
+            connect, read = post.call_args.kwargs["timeout"]
+            self.assertLessEqual(read, 1)
+
+    def test_close_leaves_the_shared_session_open(self):
+        api = create_api()
+        session = api.auth.session
+        with mock.patch.object(session, "close") as close:
+            api.auth.close()
+        close.assert_not_called()
+        self.assertIs(session, api.auth.session)
+
+    def test_close_sessions_closes_the_shared_session(self):
+        api = create_api()
+        session = api.auth.session
+        with mock.patch.object(session, "close") as close:
+            close_sessions()
+        close.assert_called_once_with()
+        self.assertIsNot(session, api.auth.session)
+
+    def test_bad_configuration(self):
+        with self.assertRaises(RestClientConfigurationError):
+            CasAuthConfig(path=["v1", "tickets"], service_name="posts", ticket_lifetime=-1)
+        with self.assertRaises(RestClientConfigurationError):
+            CasAuthConfig(path=["v1", "tickets"], service_name="posts", prefetch_tickets=-1)
+        with self.assertRaises(RestClientConfigurationError):
+            CasAuthConfig(
+                path=["v1", "tickets"], service_name="posts", ticket_lifetime=0, prefetch_tickets=2
+            )
+
+
+class TGTFileTests(unittest.TestCase):
+    def setUp(self):
+        self.server = CASServer()
+        post = mock.patch("requests.Session.post", side_effect=self.server.post)
+        post.start()
+        self.addCleanup(post.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.tgt_file_name = os.path.join(self.directory, "tgt")
+
+        self.api = create_api()
+        self.api.auth.set_credentials(
+            server_url="https://cas.example.com",
+            username="user",
+            password="secret",
+            granting_ticket_filepath=self.tgt_file_name,
+        )
+
+    def test_tgt_is_written_to_file(self):
+        with open(self.tgt_file_name) as tgt_file:
+            self.assertEqual(TGT_URL, tgt_file.read())
+        self.assertEqual({"tgt", "tgt.lock"}, set(os.listdir(self.directory)))
+        self.assertEqual(0o600, os.stat(self.tgt_file_name).st_mode & 0o777)
+
+    def test_tgt_file_is_only_read_when_it_changes(self):
+        with mock.patch("builtins.open", wraps=builtins.open) as open_:
+            for _ in range(10):
+                self.assertEqual(TGT_URL, self.api.auth.ticket_granting_ticket)
+        open_.assert_not_called()
+
+        # another process renews the TGT
+        other_tgt = TGT_URL.replace("TGT-1", "TGT-2")
+        with open(self.tgt_file_name, "w") as tgt_file:
+            tgt_file.write(other_tgt)
+        os.utime(self.tgt_file_name, ns=(0, 0))
+        with mock.patch("builtins.open", wraps=builtins.open) as open_:
+            for _ in range(10):
+                self.assertEqual(other_tgt, self.api.auth.ticket_granting_ticket)
+        open_.assert_called_once()
+
+    def test_new_tgt_replaces_the_file(self):
+        inode = os.stat(self.tgt_file_name).st_ino
+        other_tgt = TGT_URL.replace("TGT-1", "TGT-2")
+
+        self.api.auth.ticket_granting_ticket = other_tgt
+
+        self.assertEqual(other_tgt, self.api.auth.ticket_granting_ticket)
+        self.assertNotEqual(inode, os.stat(self.tgt_file_name).st_ino)
+        self.assertEqual({"tgt", "tgt.lock"}, set(os.listdir(self.directory)))
+
+
+class ServiceTicketPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.counter = itertools.count(1)
+        self.delay = 0.0
+
+    def _request_ticket(self):
+        time.sleep(self.delay)
+        return f"ST-{next(self.counter)}"
+
+    def _wait_for(self, condition):
+        end = time.monotonic() + 5
+        while not condition() and time.monotonic() < end:
+            time.sleep(0.005)
+        self.assertTrue(condition())
+
+    def _pool(self, max_size, ticket_lifetime=None):
+        pool = ServiceTicketPool(self._request_ticket, max_size, ticket_lifetime)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_pool_is_refilled_in_the_background(self):
+        pool = self._pool(4)
+
+        first = pool.take()
+        self._wait_for(lambda: pool.size == 1)
+        self.assertNotEqual(first, pool.take())
+
+    def test_pool_grows_with_the_request_rate(self):
+        self.delay = 0.02
+        pool = self._pool(8)
+        pool.take()
+        self.assertEqual(1, pool.target_size)
+
+        for _ in range(20):
+            pool.take()
+            time.sleep(0.002)
+
+        self.assertGreater(pool.target_size, 1)
+        self.assertLessEqual(pool.target_size, 8)
+
+    def test_expired_tickets_are_discarded(self):
+        pool = self._pool(4, ticket_lifetime=30)
+        pool.take()
+        self._wait_for(lambda: pool.size == 1)
+        expired = pool._tickets[0][0]
+
+        with mock.patch("time.monotonic", return_value=time.monotonic() + 60):
+            self.assertNotEqual(expired, pool.take())
+
+    def test_failed_requests_do_not_stop_the_pool(self):
+        cas_is_down = threading.Event()
+        cas_is_down.set()
+        request_ticket = self._request_ticket
+
+        def request_ticket_unless_down():
+            if cas_is_down.is_set():
+                raise RuntimeError("CAS is down")
+            return request_ticket()
+
+        self._request_ticket = request_ticket_unless_down
+        pool = self._pool(2)
+        pool.retry_delay = 0.01
+        with self.assertRaises(RuntimeError):
+            pool.take()
+        cas_is_down.clear()
+
+        self._wait_for(lambda: pool.size == 1)
+
+    def test_failed_requests_back_off_and_stop_the_thread_until_the_next_take(self):
+        attempts = []
+
+        def cas_is_down():
+            attempts.append(time.monotonic())
+            raise RuntimeError("CAS is down")
+
+        self._request_ticket = cas_is_down
+        pool = self._pool(2)
+        pool.retry_delay = 0.02
+        pool.max_failures = 4
+        with self.assertRaises(RuntimeError):
+            pool.take()
+
+        self._wait_for(lambda: pool._thread is None)
+        self.assertEqual(4, len(attempts))
+        gaps = [later - earlier for earlier, later in zip(attempts[1:], attempts[2:])]
+        self.assertGreaterEqual(gaps[0], 0.04)
+        self.assertGreater(gaps[1], gaps[0])
+
+        time.sleep(0.1)
+        self.assertEqual(4, len(attempts))
+        with self.assertRaises(RuntimeError):
+            pool.take()
+        self._wait_for(lambda: len(attempts) == 6)
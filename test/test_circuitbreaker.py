@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.circuitbreaker import CircuitBreaker, CircuitBreakerPolicy
+from qrest.exception import (
+    RestCircuitOpenError,
+    RestClientConfigurationError,
+    RestInternalServerError,
+    RestResourceNotFoundError,
+)
+
+from . import jsonplaceholderconfig
+
+
+def _create_mock_response(status_code):
+    mock_response = mock.Mock(spec=requests.Response)
+    mock_response.status_code = status_code
+    mock_response.reason = "reason"
+    mock_response.url = "https://jsonplaceholder.typicode.com/posts"
+    mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+    mock_response.json = mock.Mock(return_value=[])
+    return mock_response
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        policy = CircuitBreakerPolicy(
+            failure_rate=0.5, window_size=4, minimum_calls=4, open_duration=10
+        )
+        self.breaker = CircuitBreaker("all_posts", policy)
+
+    def _call(self, success, duration=0.01):
+        token = self.breaker.before_call()
+        self.breaker.record(success, duration, token)
+
+    def test_breaker_opens_when_the_failure_rate_is_reached(self):
+        for success in [True, False, True]:
+            self._call(success)
+        self.assertEqual("closed", self.breaker.state)
+
+        self._call(False)
+
+        self.assertEqual("open", self.breaker.state)
+        with self.assertRaises(RestCircuitOpenError):
+            self.breaker.before_call()
+
+    def test_slow_calls_count_as_failures(self):
+        self.breaker.config.slow_call_duration = 1.0
+        for _ in range(4):
+            self._call(True, duration=2.0)
+
+        self.assertEqual("open", self.breaker.state)
+
+    def test_successful_probe_closes_the_breaker(self):
+        for _ in range(4):
+            self._call(False)
+
+        with mock.patch("time.monotonic", return_value=self.breaker._opened_at + 10):
+            self.assertEqual("half-open", self.breaker.state)
+            token = self.breaker.before_call()
+            # only a single probe is let through at the same time
+            with self.assertRaises(RestCircuitOpenError):
+                self.breaker.before_call()
+            self.breaker.record(True, 0.01, token)
+
+        self.assertEqual("closed", self.breaker.state)
+
+    def test_call_that_started_before_the_breaker_opened_is_no_probe(self):
+        token = self.breaker.before_call()
+        for _ in range(4):
+            self._call(False)
+
+        with mock.patch("time.monotonic", return_value=self.breaker._opened_at + 10):
+            probe = self.breaker.before_call()
+            self.breaker.record(True, 0.01, token)
+            self.assertEqual("half-open", self.breaker.state)
+            with self.assertRaises(RestCircuitOpenError):
+                self.breaker.before_call()
+
+            self.breaker.record(True, 0.01, probe)
+
+        self.assertEqual("closed", self.breaker.state)
+
+    def test_cancelled_probe_lets_another_probe_through(self):
+        for _ in range(4):
+            self._call(False)
+
+        with mock.patch("time.monotonic", return_value=self.breaker._opened_at + 10):
+            self.breaker.cancel(self.breaker.before_call())
+            self._call(True)
+
+        self.assertEqual("closed", self.breaker.state)
+
+    def test_failed_probe_opens_the_breaker_again(self):
+        for _ in range(4):
+            self._call(False)
+
+        with mock.patch("time.monotonic", return_value=self.breaker._opened_at + 10):
+            self._call(False)
+
+        self.assertEqual("open", self.breaker.state)
+
+    def test_bad_configuration(self):
+        with self.assertRaises(RestClientConfigurationError):
+            CircuitBreakerPolicy(failure_rate=0)
+        with self.assertRaises(RestClientConfigurationError):
+            CircuitBreakerPolicy(window_size=5, minimum_calls=10)
+        with self.assertRaises(RestClientConfigurationError):
+            CircuitBreakerPolicy(slow_call_duration=0)
+
+
+class CircuitBreakerResourceTests(unittest.TestCase):
+    def setUp(self):
+        policy = CircuitBreakerPolicy(window_size=2, minimum_calls=2, open_duration=60)
+        config_class = jsonplaceholderconfig.JsonPlaceHolderConfig
+        with mock.patch.object(config_class, "circuit_breaker", policy):
+            self.api = qrest.API(jsonplaceholderconfig)
+
+    def test_open_circuit_fails_fast_without_request(self):
+        with mock.patch(
+            "requests.Session.request", return_value=_create_mock_response(500)
+        ) as request:
+            for _ in range(2):
+                with self.assertRaises(RestInternalServerError):
+                    self.api.all_posts()
+
+            with self.assertRaises(RestCircuitOpenError):
+                self.api.all_posts()
+
+            self.assertEqual(2, request.call_count)
+
+        self.assertEqual("open", self.api.circuit_states()["all_posts"])
+        self.assertEqual("closed", self.api.circuit_states()["single_post"])
+
+    def test_connection_errors_open_the_circuit_of_a_task(self):
+        side_effect = requests.ConnectionError("refused")
+        with mock.patch("requests.Session.request", side_effect=side_effect):
+            for _ in range(2):
+                with self.assertRaises(requests.ConnectionError):
+                    asyncio.run(self.api.all_posts.acall())
+
+            with self.assertRaises(RestCircuitOpenError):
+                asyncio.run(self.api.all_posts.acall())
+
+    def test_cancelled_probe_of_a_task_lets_another_probe_through(self):
+        with mock.patch("requests.Session.request", return_value=_create_mock_response(500)):
+            for _ in range(2):
+                with self.assertRaises(RestInternalServerError):
+                    self.api.all_posts()
+        breaker = self.api.all_posts._circuit_breaker
+        breaker._opened_at -= 60
+        release = threading.Event()
+
+        def request(**kwargs):
+            release.wait(5)
+            return _create_mock_response(200)
+
+        async def main():
+            task = asyncio.ensure_future(self.api.all_posts.acall())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            release.set()
+
+        with mock.patch("requests.Session.request", side_effect=request):
+            asyncio.run(main())
+            self.assertEqual("half-open", self.api.circuit_states()["all_posts"])
+            self.api.all_posts()
+
+        self.assertEqual("closed", self.api.circuit_states()["all_posts"])
+
+    def test_client_errors_do_not_open_the_circuit(self):
+        with mock.patch("requests.Session.request", return_value=_create_mock_response(404)):
+            for _ in range(3):
+                with self.assertRaises(RestResourceNotFoundError):
+                    self.api.all_posts()
+
+        self.assertEqual("closed", self.api.circuit_states()["all_posts"])
+
+    def test_resource_without_policy_has_no_circuit(self):
+        api = qrest.API(jsonplaceholderconfig)
+
+        self.assertEqual({}, api.circuit_states())
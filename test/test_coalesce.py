@@ -0,0 +1,204 @@
+import asyncio
+import threading
+import time
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.coalesce import SingleFlight
+
+from . import jsonplaceholderconfig
+
+
+class SingleFlightTests(unittest.TestCase):
+    def test_concurrent_calls_with_the_same_key_share_a_single_execution(self):
+        single_flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def work():
+            calls.append(None)
+            release.wait()
+            return "result"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(single_flight.do("key", work)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        # give the threads the time to join the call in flight
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual(["result"] * 5, results)
+        self.assertEqual(0, single_flight.in_flight)
+
+    def test_sequential_calls_execute_the_work_each_time(self):
+        single_flight = SingleFlight()
+        work = mock.Mock(return_value="result")
+
+        single_flight.do("key", work)
+        single_flight.do("key", work)
+
+        self.assertEqual(2, work.call_count)
+
+    def test_exception_is_raised_for_every_caller(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+
+        def work():
+            release.wait()
+            raise ValueError("failure")
+
+        errors = []
+
+        def call():
+            try:
+                single_flight.do("key", work)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(3, len(errors))
+
+    def test_concurrent_tasks_with_the_same_key_share_a_single_execution(self):
+        single_flight = SingleFlight()
+        work = mock.Mock()
+
+        async def work_coroutine():
+            work()
+            await asyncio.sleep(0.1)
+            return "result"
+
+        async def main():
+            calls = [single_flight.ado("key", work_coroutine) for _ in range(5)]
+            return await asyncio.gather(*calls)
+
+        results = asyncio.run(main())
+
+        self.assertEqual(1, work.call_count)
+        self.assertEqual(["result"] * 5, results)
+
+    def test_cancelled_leader_does_not_cancel_the_work_of_the_others(self):
+        single_flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.1)
+            return "result"
+
+        async def main():
+            leader = asyncio.ensure_future(single_flight.ado("key", work))
+            follower = asyncio.ensure_future(single_flight.ado("key", work))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        self.assertEqual("result", asyncio.run(main()))
+        self.assertEqual(0, single_flight.in_flight)
+
+
+class CoalescingResourceTests(unittest.TestCase):
+    def setUp(self):
+        self.api = qrest.API(jsonplaceholderconfig)
+        self.api.single_post.config.coalesce = True
+
+    def _create_mock_response(self):
+        mock_response = mock.Mock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        mock_response.json = mock.Mock(return_value={"id": 42})
+        return mock_response
+
+    def _slow_request(self, **kwargs):
+        time.sleep(0.1)
+        return self._create_mock_response()
+
+    def test_concurrent_identical_calls_send_a_single_request(self):
+        with mock.patch(
+            "requests.Session.request", side_effect=self._slow_request
+        ) as mock_request:
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(self.api.single_post(item=42)))
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(1, mock_request.call_count)
+            self.assertEqual([{"id": 42}] * 5, results)
+
+    def test_concurrent_calls_with_different_parameters_are_not_coalesced(self):
+        with mock.patch(
+            "requests.Session.request", side_effect=self._slow_request
+        ) as mock_request:
+            threads = [
+                threading.Thread(target=self.api.single_post, kwargs={"item": item})
+                for item in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            urls = sorted(call[1]["url"] for call in mock_request.call_args_list)
+            expected_urls = [f"https://jsonplaceholder.typicode.com/posts/{i}" for i in range(3)]
+            self.assertEqual(expected_urls, urls)
+
+    def test_concurrent_identical_tasks_send_a_single_request(self):
+        async def main():
+            return await asyncio.gather(*[self.api.single_post.acall(item=42) for _ in range(5)])
+
+        with mock.patch(
+            "requests.Session.request", side_effect=self._slow_request
+        ) as mock_request:
+            results = asyncio.run(main())
+
+            self.assertEqual(1, mock_request.call_count)
+            self.assertEqual([{"id": 42}] * 5, results)
+
+    def test_concurrent_calls_do_not_share_the_response_object(self):
+        def request(**kwargs):
+            time.sleep(0.01)
+            response = self._create_mock_response()
+            response.json.return_value = {"id": int(kwargs["url"].split("/")[-1])}
+            return response
+
+        results = {}
+
+        def call(item):
+            results[item] = self.api.single_post.get_response(item=item)
+
+        with mock.patch("requests.Session.request", side_effect=request):
+            threads = [threading.Thread(target=call, args=(item,)) for item in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(
+            {item: {"id": item} for item in range(20)},
+            {item: response.fetch() for item, response in results.items()},
+        )
+
+    def test_post_requests_are_never_coalesced(self):
+        self.api.create_post.config.coalesce = True
+        self.assertFalse(self.api.create_post._coalesce)
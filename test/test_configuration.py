@@ -112,6 +112,20 @@ class TestParameters(unittest.TestCase):
             parameters = {"para": QueryParameter(name="sort", description=3)}
             self.UrlApiConfig(_create_endpoints(parameters=parameters))
 
+    def test_query_parameter_encoding(self):
+        parameters = {"para": QueryParameter(name="ids", multiple=True, encoding="comma")}
+        self.UrlApiConfig(_create_endpoints(parameters=parameters))
+
+        with self.assertRaises(RestClientConfigurationError):
+
+            parameters = {"para": QueryParameter(name="ids", multiple=True, encoding="tab")}
+            self.UrlApiConfig(_create_endpoints(parameters=parameters))
+
+        with self.assertRaises(RestClientConfigurationError):
+
+            parameters = {"para": QueryParameter(name="ids", encoding="pipe")}
+            self.UrlApiConfig(_create_endpoints(parameters=parameters))
+
     def test_bad_body_parameters(self):
         with self.assertRaises(RestClientConfigurationError):
 
@@ -0,0 +1,221 @@
+import asyncio
+import itertools
+import threading
+import time
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.bulkhead import Bulkhead
+from qrest.exception import RestClientConfigurationError
+from qrest import hedging
+from qrest.hedging import HedgeBudget, HedgePolicy
+from qrest.latency import LatencySketch
+
+from . import jsonplaceholderconfig
+
+
+class LatencySketchTests(unittest.TestCase):
+    def test_percentile_is_within_the_relative_accuracy(self):
+        latencies = LatencySketch(relative_accuracy=0.01)
+        for latency in range(1, 101):
+            latencies.record(latency / 100)
+
+        self.assertAlmostEqual(0.5, latencies.percentile(50), delta=0.005)
+        self.assertAlmostEqual(0.95, latencies.percentile(95), delta=0.0095)
+        self.assertAlmostEqual(1.0, latencies.percentile(100), delta=0.01)
+
+    def test_only_the_most_recent_latencies_are_kept(self):
+        latencies = LatencySketch(window_size=10)
+        for latency in range(1, 101):
+            latencies.record(latency)
+
+        self.assertEqual(10, latencies.count)
+        self.assertGreater(latencies.percentile(1), 80)
+
+    def test_no_percentile_without_latencies(self):
+        self.assertIsNone(LatencySketch().percentile(99))
+
+
+class HedgePolicyTests(unittest.TestCase):
+    def test_delay_is_used_until_enough_latencies_are_observed(self):
+        policy = HedgePolicy(delay=1.0, percentile=50, min_samples=10)
+        latencies = LatencySketch()
+        for _ in range(9):
+            latencies.record(0.2)
+
+        self.assertEqual(1.0, policy.hedge_delay(latencies))
+        latencies.record(0.2)
+        self.assertAlmostEqual(0.2, policy.hedge_delay(latencies), delta=0.002)
+
+    def test_budget_limits_the_fraction_of_hedged_requests(self):
+        budget = HedgeBudget(max_tokens=1, token_ratio=0.25)
+
+        self.assertTrue(budget.try_hedge())
+        self.assertFalse(budget.try_hedge())
+        for _ in range(4):
+            budget.record_request()
+        self.assertTrue(budget.try_hedge())
+
+    def test_bad_configuration(self):
+        with self.assertRaises(RestClientConfigurationError):
+            HedgePolicy()
+        with self.assertRaises(RestClientConfigurationError):
+            HedgePolicy(percentile=100)
+        with self.assertRaises(RestClientConfigurationError):
+            HedgePolicy(delay=0.1, budget=0.1)
+
+
+class HedgingResourceTests(unittest.TestCase):
+    def setUp(self):
+        self.api = qrest.API(jsonplaceholderconfig)
+        self.api.all_posts.config.hedge = HedgePolicy(delay=0.05)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        # let the abandoned requests finish
+        self.release.set()
+
+    def _create_mock_response(self, data):
+        mock_response = mock.Mock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        mock_response.json = mock.Mock(return_value=data)
+        return mock_response
+
+    def _first_request_stalls(self):
+        counter = itertools.count()
+
+        def request(**kwargs):
+            if next(counter) == 0:
+                self.release.wait(5)
+                return self._create_mock_response(["slow"])
+            return self._create_mock_response(["fast"])
+
+        return request
+
+    def test_slow_request_is_hedged_and_the_fastest_response_wins(self):
+        with mock.patch(
+            "requests.Session.request", side_effect=self._first_request_stalls()
+        ) as request:
+            start = time.monotonic()
+            self.assertEqual(["fast"], self.api.all_posts())
+
+            self.assertLess(time.monotonic() - start, 1)
+            self.assertEqual(2, request.call_count)
+
+    def test_slow_request_is_hedged_from_a_task(self):
+        async def main():
+            posts = await self.api.all_posts.acall()
+            # asyncio.run waits for the abandoned request before it returns
+            self.release.set()
+            return posts
+
+        with mock.patch(
+            "requests.Session.request", side_effect=self._first_request_stalls()
+        ) as request:
+            self.assertEqual(["fast"], asyncio.run(main()))
+
+            self.assertEqual(2, request.call_count)
+
+    def test_fast_request_is_not_hedged(self):
+        response = self._create_mock_response([])
+        with mock.patch("requests.Session.request", return_value=response) as request:
+            self.api.all_posts()
+
+            self.assertEqual(1, request.call_count)
+
+    def test_exhausted_budget_prevents_hedging(self):
+        budget = HedgeBudget(max_tokens=1, token_ratio=0.01)
+        budget.try_hedge()
+        self.api.all_posts.config.hedge = HedgePolicy(delay=0.05, budget=budget)
+
+        def request(**kwargs):
+            time.sleep(0.1)
+            return self._create_mock_response([])
+
+        with mock.patch("requests.Session.request", side_effect=request) as request:
+            self.api.all_posts()
+
+            self.assertEqual(1, request.call_count)
+
+    def test_request_without_budget_is_sent_from_the_calling_thread(self):
+        budget = HedgeBudget(max_tokens=1, token_ratio=0.01)
+        budget.try_hedge()
+        self.api.all_posts.config.hedge = HedgePolicy(delay=0.05, budget=budget)
+        threads = []
+
+        def request(**kwargs):
+            threads.append(threading.current_thread())
+            return self._create_mock_response([])
+
+        with mock.patch("requests.Session.request", side_effect=request):
+            self.api.all_posts()
+
+        self.assertEqual([threading.current_thread()], threads)
+
+    def test_requests_that_can_be_hedged_are_sent_from_a_bounded_executor(self):
+        threads = set()
+
+        def request(**kwargs):
+            threads.add(threading.current_thread())
+            return self._create_mock_response([])
+
+        with mock.patch("requests.Session.request", side_effect=request):
+            for _ in range(10):
+                self.api.all_posts()
+
+        self.assertLessEqual(len(threads), hedging.MAX_PRIMARIES_IN_FLIGHT)
+        for thread in threads:
+            self.assertTrue(thread.name.startswith("qrest-hedge-primary"))
+
+    def test_request_is_sent_from_the_calling_thread_when_the_executor_is_full(self):
+        threads = []
+
+        def request(**kwargs):
+            threads.append(threading.current_thread())
+            time.sleep(0.1)
+            return self._create_mock_response([])
+
+        full = threading.BoundedSemaphore(1)
+        full.acquire()
+        with mock.patch.object(hedging, "_primaries_in_flight", full):
+            with mock.patch("requests.Session.request", side_effect=request):
+                self.api.all_posts()
+
+        self.assertEqual([threading.current_thread()], threads)
+
+    def test_abandoned_request_keeps_its_bulkhead_slot(self):
+        bulkhead = self.api.all_posts._bulkhead = Bulkhead("all_posts", 2, timeout=0)
+
+        with mock.patch("requests.Session.request", side_effect=self._first_request_stalls()):
+            self.assertEqual(["fast"], self.api.all_posts())
+            self.assertTrue(bulkhead.try_acquire())
+            self.assertFalse(bulkhead.try_acquire())
+
+            self.release.set()
+            end = time.monotonic() + 5
+            acquired = bulkhead.try_acquire()
+            while not acquired and time.monotonic() < end:
+                time.sleep(0.005)
+                acquired = bulkhead.try_acquire()
+            self.assertTrue(acquired)
+
+    def test_full_bulkhead_prevents_hedging(self):
+        self.api.all_posts._bulkhead = Bulkhead("all_posts", 1, timeout=0)
+
+        def request(**kwargs):
+            time.sleep(0.1)
+            return self._create_mock_response([])
+
+        with mock.patch("requests.Session.request", side_effect=request) as request:
+            self.api.all_posts()
+
+            self.assertEqual(1, request.call_count)
+
+    def test_post_request_is_never_hedged(self):
+        self.api.create_post.config.hedge = HedgePolicy(delay=0)
+
+        self.assertIsNone(self.api.create_post._hedge_delay({"method": "POST"}))
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFERRED_MODULES = ["requests", "urllib3", "asyncio", "qrest.auth", "qrest.transport"]
+"""the modules that are only imported when they are first used"""
+
+
+def run(code: str) -> subprocess.CompletedProcess:
+    """Run the given code in a new Python process that reports the time of each import."""
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def imported_modules(stderr: str) -> set:
+    """Return the names of the modules in the given output of python -X importtime."""
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            modules.add(name.strip())
+    return modules
+
+
+class ImportTests(unittest.TestCase):
+    def test_import_defers_the_transport_auth_and_asyncio(self):
+        modules = imported_modules(run("import qrest").stderr)
+
+        self.assertIn("qrest", modules)
+        for name in DEFERRED_MODULES:
+            self.assertNotIn(name, modules)
+
+    def test_configuration_module_defers_the_transport_auth_and_asyncio(self):
+        modules = imported_modules(run("import test.jsonplaceholderconfig").stderr)
+
+        self.assertIn("qrest.conf", modules)
+        for name in DEFERRED_MODULES:
+            self.assertNotIn(name, modules)
+
+    def test_api_imports_the_transport(self):
+        code = "\n".join(
+            [
+                "import sys",
+                "import qrest",
+                "from test import jsonplaceholderconfig",
+                "qrest.API(jsonplaceholderconfig)",
+                "print(sorted(name for name in sys.modules if name in "
+                f"{DEFERRED_MODULES!r}))",
+            ]
+        )
+        self.assertEqual("['qrest.transport', 'requests', 'urllib3']", run(code).stdout.strip())
+
+    def test_api_with_authentication_imports_the_auth_module(self):
+        code = "\n".join(
+            [
+                "import sys",
+                "import qrest",
+                "from qrest.auth import UserPassAuthConfig",
+                "from test import jsonplaceholderconfig",
+                "config_class = jsonplaceholderconfig.JsonPlaceHolderConfig",
+                "config_class.authentication = UserPassAuthConfig()",
+                "api = qrest.API(jsonplaceholderconfig)",
+                "print(type(api.auth).__name__)",
+            ]
+        )
+        self.assertEqual("UserPassAuth", run(code).stdout.strip())
+
+    def test_resource_module_still_provides_the_api(self):
+        code = "import qrest.resource; import qrest; print(qrest.resource.API is qrest.API)"
+        self.assertEqual("True", run(code).stdout.strip())
@@ -1,9 +1,11 @@
+import asyncio
 import unittest
 import unittest.mock as mock
 
 import requests
 
 import qrest
+from qrest.exception import RestClientConfigurationError
 from qrest.response import Response
 
 from . import jsonplaceholderconfig
@@ -37,6 +39,13 @@ class ContentResponse(Response):
         pass
 
 
+class EmptyListResponse(ContentResponse):
+    """Provide an empty list as the content of interest, so split requests can be combined."""
+
+    def _parse(self):
+        self.data = []
+
+
 class TestJsonPlaceHolder(unittest.TestCase):
     def setUp(self):
         self.mock_response = mock.Mock(spec=requests.Response)
@@ -50,13 +59,16 @@ class TestJsonPlaceHolder(unittest.TestCase):
         api = qrest.API(jsonplaceholderconfig)
         api.all_posts.response = ContentResponse()
 
-        with mock.patch("requests.request", return_value=self.mock_response) as mock_request:
+        with mock.patch(
+            "requests.Session.request", return_value=self.mock_response
+        ) as mock_request:
             posts = api.all_posts()
 
             mock_request.assert_called_with(
                 method="GET",
                 auth=None,
                 verify=False,
+                timeout=(10, 60),
                 url="https://jsonplaceholder.typicode.com/posts",
                 params={},
                 json={},
@@ -70,13 +82,16 @@ class TestJsonPlaceHolder(unittest.TestCase):
         api = qrest.API(jsonplaceholderconfig)
         api.all_posts.response = ContentResponse()
 
-        with mock.patch("requests.request", return_value=self.mock_response) as mock_request:
+        with mock.patch(
+            "requests.Session.request", return_value=self.mock_response
+        ) as mock_request:
             posts = api.all_posts()
 
             mock_request.assert_called_with(
                 method="GET",
                 auth=None,
                 verify=False,
+                timeout=(10, 60),
                 url="https://jsonplaceholder.typicode.com/posts",
                 params={},
                 json={},
@@ -90,13 +105,16 @@ class TestJsonPlaceHolder(unittest.TestCase):
         api = qrest.API(jsonplaceholderconfig)
         api.single_post.response = ContentResponse()
 
-        with mock.patch("requests.request", return_value=self.mock_response) as mock_request:
+        with mock.patch(
+            "requests.Session.request", return_value=self.mock_response
+        ) as mock_request:
             post = api.single_post(item=1)
 
             mock_request.assert_called_with(
                 method="GET",
                 auth=None,
                 verify=False,
+                timeout=(10, 60),
                 url="https://jsonplaceholder.typicode.com/posts/1",
                 params={},
                 json={},
@@ -113,13 +131,16 @@ class TestJsonPlaceHolder(unittest.TestCase):
         api = qrest.API(jsonplaceholderconfig)
         api.filter_posts.response = ContentResponse()
 
-        with mock.patch("requests.request", return_value=self.mock_response) as mock_request:
+        with mock.patch(
+            "requests.Session.request", return_value=self.mock_response
+        ) as mock_request:
             posts = api.filter_posts(user_id=1)
 
             mock_request.assert_called_with(
                 method="GET",
                 auth=None,
                 verify=False,
+                timeout=(10, 60),
                 url="https://jsonplaceholder.typicode.com/posts",
                 params={"userId": 1},
                 json={},
@@ -133,7 +154,7 @@ class TestJsonPlaceHolder(unittest.TestCase):
         api = qrest.API(jsonplaceholderconfig)
         api.filter_posts.response = ContentResponse()
 
-        with mock.patch("requests.request", return_value=self.mock_response):
+        with mock.patch("requests.Session.request", return_value=self.mock_response):
             response = api.filter_posts.get_response(user_id=1)
             self.assertIs(api.filter_posts.response, response)
 
@@ -141,13 +162,16 @@ class TestJsonPlaceHolder(unittest.TestCase):
         api = qrest.API(jsonplaceholderconfig)
         api.comments.response = ContentResponse()
 
-        with mock.patch("requests.request", return_value=self.mock_response) as mock_request:
+        with mock.patch(
+            "requests.Session.request", return_value=self.mock_response
+        ) as mock_request:
             comments = api.comments(post_id=1)
 
             mock_request.assert_called_with(
                 method="GET",
                 auth=None,
                 verify=False,
+                timeout=(10, 60),
                 url="https://jsonplaceholder.typicode.com/posts/1/comments",
                 params={},
                 json={},
@@ -169,13 +193,16 @@ class TestJsonPlaceHolder(unittest.TestCase):
         content = "this is the new data posted using qREST"
         user_id = 200
 
-        with mock.patch("requests.request", return_value=self.mock_response) as mock_request:
+        with mock.patch(
+            "requests.Session.request", return_value=self.mock_response
+        ) as mock_request:
             response = api.create_post.get_response(title=title, content=content, user_id=user_id)
 
             mock_request.assert_called_with(
                 method="POST",
                 auth=None,
                 verify=False,
+                timeout=(10, 60),
                 url="https://jsonplaceholder.typicode.com/posts",
                 params={},
                 json={"title": title, "body": content, "userId": user_id},
@@ -190,13 +217,16 @@ class TestJsonPlaceHolder(unittest.TestCase):
 
         file = open(qrest.__file__, 'rb')
 
-        with mock.patch("requests.request", return_value=self.mock_response) as mock_request:
+        with mock.patch(
+            "requests.Session.request", return_value=self.mock_response
+        ) as mock_request:
             response = api.upload_file.get_response(file=('__init__.py', file))
 
             mock_request.assert_called_with(
                 method="POST",
                 auth=None,
                 verify=False,
+                timeout=(10, 60),
                 url="https://jsonplaceholder.typicode.com/files",
                 params={},
                 json={},
@@ -204,3 +234,194 @@ class TestJsonPlaceHolder(unittest.TestCase):
                 headers={"Content-type": "application/json; charset=UTF-8"},
             )
             self.assertIs(api.upload_file.response, response)
+
+
+class TestSplitLongURLs(unittest.TestCase):
+    def setUp(self):
+        self.api = qrest.API(jsonplaceholderconfig)
+
+    def _create_mock_response(self, **kwargs):
+        mock_response = mock.Mock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        posts = [{"id": post_id} for post_id in kwargs["params"]["id"]]
+        mock_response.json = mock.Mock(return_value=posts)
+        return mock_response
+
+    def test_long_url_is_split_into_multiple_requests(self):
+        self.api.select_posts.config.max_url_length = 100
+        post_ids = list(range(1000, 1050))
+
+        with mock.patch(
+            "requests.Session.request", side_effect=self._create_mock_response
+        ) as request:
+            posts = self.api.select_posts(post_id=post_ids)
+
+            self.assertGreater(request.call_count, 1)
+            for call in request.call_args_list:
+                prepared = requests.Request(url=call[1]["url"], params=call[1]["params"]).prepare()
+                self.assertLessEqual(len(prepared.url), 100)
+            self.assertEqual(post_ids, [post["id"] for post in posts])
+
+    def test_short_url_is_sent_in_a_single_request(self):
+        with mock.patch(
+            "requests.Session.request", side_effect=self._create_mock_response
+        ) as request:
+            posts = self.api.select_posts(post_id=[1, 2, 3])
+
+            self.assertEqual(1, request.call_count)
+            self.assertEqual([1, 2, 3], [post["id"] for post in posts])
+
+    def test_raise_proper_exception_when_a_single_value_is_too_long(self):
+        self.api.select_posts.config.max_url_length = 50
+
+        with self.assertRaisesRegex(qrest.exception.RestClientQueryError, "maximum length"):
+            self.api.select_posts(post_id=["x" * 50, "y"])
+
+    def test_long_post_request_is_sent_without_split(self):
+        self.api.select_posts.config.max_url_length = 100
+        self.api.select_posts.config.method = "POST"
+        post_ids = list(range(1000, 1050))
+
+        with mock.patch(
+            "requests.Session.request", side_effect=self._create_mock_response
+        ) as request:
+            self.api.select_posts(post_id=post_ids)
+
+            self.assertEqual(1, request.call_count)
+            self.assertEqual(post_ids, request.call_args[1]["params"]["id"])
+
+    def test_split_requests_from_a_task(self):
+        self.api.select_posts.config.max_url_length = 100
+        post_ids = list(range(1000, 1050))
+
+        with mock.patch(
+            "requests.Session.request", side_effect=self._create_mock_response
+        ) as request:
+            posts = asyncio.run(self.api.select_posts.acall(post_id=post_ids))
+
+            self.assertGreater(request.call_count, 1)
+            self.assertEqual(post_ids, [post["id"] for post in posts])
+
+
+class TestQueryParameterEncoding(unittest.TestCase):
+    def setUp(self):
+        self.api = qrest.API(jsonplaceholderconfig)
+        self.api.select_posts.response = ContentResponse()
+        self.post_id = self.api.select_posts.config.parameters["post_id"]
+
+        mock_response = mock.Mock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.content = b"Hello World!"
+        mock_response.headers = {}
+        self.mock_response = mock_response
+
+    def _sent_params(self, encoding, post_ids):
+        with mock.patch.object(self.post_id, "encoding", encoding):
+            with mock.patch(
+                "requests.Session.request", return_value=self.mock_response
+            ) as request:
+                self.api.select_posts(post_id=post_ids)
+                return request.call_args[1]["params"]
+
+    def _sent_url(self, encoding, post_ids):
+        with mock.patch.object(self.post_id, "encoding", encoding):
+            with mock.patch(
+                "requests.Session.request", return_value=self.mock_response
+            ) as request:
+                self.api.select_posts(post_id=post_ids)
+                kwargs = request.call_args[1]
+                prepared = requests.Request(url=kwargs["url"], params=kwargs["params"]).prepare()
+                return prepared.url
+
+    def test_repeat_encoding_passes_the_list(self):
+        self.assertEqual({"id": [1, 2, 3]}, self._sent_params("repeat", [1, 2, 3]))
+
+    def test_comma_encoding_joins_the_list(self):
+        self.assertEqual(
+            "https://jsonplaceholder.typicode.com/posts?id=1,2,3",
+            self._sent_url("comma", [1, 2, 3]),
+        )
+
+    def test_pipe_encoding_joins_the_list(self):
+        # requests percent-encodes a pipe in any URL, but keeps it as a single value
+        self.assertEqual(
+            "https://jsonplaceholder.typicode.com/posts?id=1%7C2%7C3",
+            self._sent_url("pipe", [1, 2, 3]),
+        )
+
+    def test_brackets_encoding_appends_brackets_to_the_name(self):
+        self.assertEqual({"id[]": [1, 2, 3]}, self._sent_params("brackets", [1, 2, 3]))
+
+    def test_single_value_is_not_encoded(self):
+        self.assertEqual({"id": 1}, self._sent_params("comma", 1))
+
+    def test_comma_encoding_needs_fewer_requests_to_split_a_long_url(self):
+        self.api.select_posts.config.max_url_length = 200
+        post_ids = list(range(1000, 1100))
+
+        self.api.select_posts.response = EmptyListResponse()
+        with mock.patch("requests.Session.request", return_value=self.mock_response) as request:
+            self.api.select_posts(post_id=post_ids)
+            repeat_count = request.call_count
+
+        with mock.patch.object(self.post_id, "encoding", "comma"):
+            with mock.patch(
+                "requests.Session.request", return_value=self.mock_response
+            ) as request:
+                self.api.select_posts(post_id=post_ids)
+                comma_count = request.call_count
+                for call in request.call_args_list:
+                    prepared = requests.Request(url=call[1]["url"], params=call[1]["params"])
+                    self.assertLessEqual(len(prepared.prepare().url), 200)
+
+        self.assertLess(comma_count, repeat_count)
+
+
+class TestPrefetchRelated(unittest.TestCase):
+    def setUp(self):
+        self.api = qrest.API(jsonplaceholderconfig)
+
+    def _create_mock_response(self, json):
+        mock_response = mock.Mock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        mock_response.json = mock.Mock(return_value=json)
+        return mock_response
+
+    def _request(self, url, **kwargs):
+        if url.endswith("/posts"):
+            return self._create_mock_response([{"id": 1}, {"id": 2}, {"id": 1}])
+        post_id = int(url.split("/")[-2])
+        return self._create_mock_response([{"postId": post_id, "body": f"on {post_id}"}])
+
+    def test_related_items_are_attached_to_each_item(self):
+        with mock.patch("requests.Session.request", side_effect=self._request) as request:
+            posts = self.api.all_posts.prefetch_related("comments")
+
+            expected_posts = [
+                {"id": 1, "comments": [{"postId": 1, "body": "on 1"}]},
+                {"id": 2, "comments": [{"postId": 2, "body": "on 2"}]},
+                {"id": 1, "comments": [{"postId": 1, "body": "on 1"}]},
+            ]
+            self.assertEqual(expected_posts, posts)
+            # one request for the posts and one for the comments of each distinct post
+            self.assertEqual(3, request.call_count)
+
+    def test_related_items_are_attached_from_a_task(self):
+        with mock.patch("requests.Session.request", side_effect=self._request) as request:
+            posts = asyncio.run(self.api.all_posts.aprefetch_related("comments", max_workers=1))
+
+            self.assertEqual([{"postId": 2, "body": "on 2"}], posts[1]["comments"])
+            self.assertEqual(3, request.call_count)
+
+    def test_raise_proper_exception_for_unknown_relation(self):
+        with mock.patch("requests.Session.request", side_effect=self._request):
+            with self.assertRaisesRegex(qrest.exception.RestClientQueryError, "not a relation"):
+                self.api.all_posts.prefetch_related("authors")
+
+    def test_raise_proper_exception_for_relation_to_unknown_resource(self):
+        relation = qrest.RelatedResource(resource="authors", field="userId", parameter="id")
+        with mock.patch.object(jsonplaceholderconfig.AllPosts, "authors", relation, create=True):
+            with self.assertRaisesRegex(RestClientConfigurationError, "unknown resource"):
+                qrest.API(jsonplaceholderconfig)
@@ -0,0 +1,115 @@
+import threading
+import time
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.conf import LazyEndpoints
+from qrest.exception import RestClientConfigurationError
+from qrest.resource import JSONResource
+
+from . import jsonplaceholderconfig
+from .generatedconfig import create_config_module
+
+
+class LazyAPITests(unittest.TestCase):
+    def test_lazy_api_creates_resources_on_first_access(self):
+        api = qrest.API(jsonplaceholderconfig, lazy=True)
+        self.assertIsInstance(api.config.endpoints, LazyEndpoints)
+        self.assertEqual({}, api.config.endpoints.created())
+
+        self.assertIsInstance(api.single_post, JSONResource)
+        self.assertIs(api.single_post, api.single_post)
+        self.assertEqual(["single_post"], list(api.config.endpoints.created()))
+
+        # the relation of all_posts to comments is checked with the config of comments
+        api.all_posts
+        self.assertEqual(
+            ["single_post", "all_posts", "comments"], list(api.config.endpoints.created())
+        )
+        self.assertEqual(qrest.API(jsonplaceholderconfig).resources, api.resources)
+
+    def test_lazy_resource_gets_the_defaults_of_the_api(self):
+        api = qrest.API(jsonplaceholderconfig, lazy=True)
+
+        config = api.single_post.config
+        self.assertEqual("application/json; charset=UTF-8", config.headers["Content-type"])
+        self.assertEqual(10, config.connect_timeout)
+
+    def test_lazy_resource_sends_the_same_request(self):
+        response = mock.Mock(spec=requests.Response)
+        response.status_code = 200
+        response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        response.json = mock.Mock(return_value={"id": 1})
+
+        with mock.patch("requests.Session.request", return_value=response) as request:
+            qrest.API(jsonplaceholderconfig).single_post(item=1)
+            eager_call = request.call_args
+            qrest.API(jsonplaceholderconfig, lazy=True).single_post(item=1)
+
+            self.assertEqual(eager_call, request.call_args)
+
+    def test_configuration_error_surfaces_on_first_access(self):
+        config_class = jsonplaceholderconfig.SelectPosts
+        with mock.patch.object(config_class, "max_concurrency", 0, create=True):
+            api = qrest.API(jsonplaceholderconfig, lazy=True)
+
+            api.all_posts
+            with self.assertRaises(RestClientConfigurationError):
+                api.select_posts
+
+    def test_unknown_resource(self):
+        api = qrest.API(jsonplaceholderconfig, lazy=True)
+
+        with self.assertRaises(AttributeError):
+            api.unknown_posts
+
+    def test_concurrent_first_accesses_share_a_resource(self):
+        api = qrest.API(jsonplaceholderconfig, lazy=True)
+        resources = []
+
+        def access():
+            resources.append(api.comments)
+
+        threads = [threading.Thread(target=access) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(8, len(resources))
+        self.assertTrue(all(resource is resources[0] for resource in resources))
+
+
+class StartupTests(unittest.TestCase):
+    def _construction_time(self, module, **kwargs):
+        """Return the shortest of several construction times of an API, in seconds."""
+        times = []
+        for _ in range(5):
+            start = time.perf_counter()
+            qrest.API(module, **kwargs)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def test_lazy_construction_is_faster(self):
+        module = create_config_module(300)
+
+        eager = self._construction_time(module)
+        lazy = self._construction_time(module, lazy=True)
+
+        # a coarse bound: the lazy construction is about two orders of magnitude faster
+        self.assertLess(lazy * 5, eager)
+
+    def test_lazy_construction_creates_no_configuration(self):
+        module = create_config_module(300)
+
+        eager = qrest.API(module)
+        lazy = qrest.API(module, lazy=True)
+
+        self.assertEqual(300, len(eager.config.endpoints))
+        self.assertEqual({}, lazy.config.endpoints.created())
+        self.assertEqual(eager.resources, lazy.resources)
+        self.assertEqual("resource_7", lazy.resource_7.name)
+        self.assertEqual(["resource_7"], list(lazy.config.endpoints.created()))
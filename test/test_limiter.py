@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.exception import RestClientConfigurationError
+from qrest.limiter import AdaptiveConcurrency, ConcurrencyLimiter
+
+from . import jsonplaceholderconfig
+
+
+class ConcurrencyLimiterTests(unittest.TestCase):
+    def test_aimd_increases_the_limit_while_the_latency_is_flat(self):
+        limiter = ConcurrencyLimiter(AdaptiveConcurrency(initial_limit=4))
+        for _ in range(20):
+            limiter.record(0.1, True)
+
+        self.assertGreater(limiter.limit, 4)
+
+    def test_aimd_decreases_the_limit_on_failures(self):
+        limiter = ConcurrencyLimiter(AdaptiveConcurrency(initial_limit=8, backoff_ratio=0.5))
+        limiter.record(0.1, False)
+
+        self.assertEqual(4, limiter.limit)
+
+    def test_gradient_decreases_the_limit_when_the_latency_climbs(self):
+        limiter = ConcurrencyLimiter(AdaptiveConcurrency(algorithm="gradient", initial_limit=16))
+        for _ in range(10):
+            limiter.record(0.1, True)
+        limit = limiter.limit
+        for _ in range(10):
+            limiter.record(1.0, True)
+
+        self.assertLess(limiter.limit, limit)
+
+    def test_limit_stays_within_bounds(self):
+        limiter = ConcurrencyLimiter(
+            AdaptiveConcurrency(initial_limit=2, min_limit=2, max_limit=3)
+        )
+        for _ in range(100):
+            limiter.record(0.1, True)
+        self.assertEqual(3, limiter.limit)
+        for _ in range(100):
+            limiter.record(0.1, False)
+        self.assertEqual(2, limiter.limit)
+
+    def test_release_wakes_up_a_waiting_thread(self):
+        limiter = ConcurrencyLimiter(AdaptiveConcurrency(initial_limit=1))
+        limiter.acquire()
+        acquired = threading.Event()
+
+        def acquire():
+            limiter.acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+        limiter.release()
+        thread.join()
+
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(1, limiter.in_flight)
+
+    def test_release_from_a_thread_wakes_up_a_waiting_task(self):
+        limiter = ConcurrencyLimiter(AdaptiveConcurrency(initial_limit=1))
+        limiter.acquire()
+
+        async def main():
+            threading.Timer(0.05, limiter.release).start()
+            await asyncio.wait_for(limiter.aacquire(), timeout=5)
+
+        asyncio.run(main())
+
+        self.assertEqual(1, limiter.in_flight)
+
+    def test_bad_configuration(self):
+        with self.assertRaises(RestClientConfigurationError):
+            AdaptiveConcurrency(algorithm="vegas")
+        with self.assertRaises(RestClientConfigurationError):
+            AdaptiveConcurrency(initial_limit=64, max_limit=32)
+        with self.assertRaises(RestClientConfigurationError):
+            AdaptiveConcurrency(backoff_ratio=1)
+
+
+class AdaptiveConcurrencyResourceTests(unittest.TestCase):
+    def setUp(self):
+        concurrency = AdaptiveConcurrency(initial_limit=2, max_limit=2)
+        config_class = jsonplaceholderconfig.JsonPlaceHolderConfig
+        with mock.patch.object(config_class, "concurrency", concurrency):
+            self.api = qrest.API(jsonplaceholderconfig)
+        self.api.select_posts.config.max_url_length = 100
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _request(self, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+        mock_response = mock.Mock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        posts = [{"id": post_id} for post_id in kwargs["params"].get("id", [])]
+        mock_response.json = mock.Mock(return_value=posts)
+        return mock_response
+
+    def test_split_requests_respect_the_limit(self):
+        post_ids = list(range(1000, 1050))
+        with mock.patch("requests.Session.request", side_effect=self._request) as request:
+            posts = self.api.select_posts(post_id=post_ids)
+
+            self.assertGreater(request.call_count, 2)
+            self.assertEqual(2, self.max_in_flight)
+            self.assertEqual(post_ids, [post["id"] for post in posts])
+
+    def test_split_requests_from_a_task_respect_the_limit(self):
+        post_ids = list(range(1000, 1050))
+        with mock.patch("requests.Session.request", side_effect=self._request) as request:
+            asyncio.run(self.api.select_posts.acall(post_id=post_ids))
+
+            self.assertGreater(request.call_count, 2)
+            self.assertLessEqual(self.max_in_flight, 2)
+
+    def test_failures_lower_the_limit(self):
+        response = mock.Mock(spec=requests.Response)
+        response.status_code = 500
+        response.reason = "reason"
+        with mock.patch("requests.Session.request", return_value=response):
+            with self.assertRaises(qrest.exception.RestInternalServerError):
+                self.api.all_posts()
+
+        self.assertEqual(1, self.api.all_posts._limiter.limit)
@@ -0,0 +1,53 @@
+import netrc
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+
+import qrest
+from qrest.auth import NetrcOrUserPassAuthConfig, load_netrc
+
+from . import jsonplaceholderconfig
+
+
+class NetrcCacheTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.netrc_path = os.path.join(directory.name, "netrc")
+        self._write("user", "secret")
+
+    def _write(self, login, password):
+        with open(self.netrc_path, "w") as netrc_file:
+            for index in range(1000):
+                netrc_file.write(f"machine host{index}.example.com login x password y\n")
+            netrc_file.write(
+                f"machine jsonplaceholder.typicode.com login {login} password {password}\n"
+            )
+        os.chmod(self.netrc_path, 0o600)
+
+    def _login(self):
+        config_class = jsonplaceholderconfig.JsonPlaceHolderConfig
+        with mock.patch.object(config_class, "authentication", NetrcOrUserPassAuthConfig()):
+            api = qrest.API(jsonplaceholderconfig)
+        api.auth.set_credentials(netrc_path=self.netrc_path)
+        return api.auth.login_tuple
+
+    def test_netrc_file_is_parsed_once_for_all_api_instances(self):
+        with mock.patch("qrest.auth.netrc", wraps=netrc.netrc) as parse:
+            for _ in range(10):
+                self.assertEqual(("user", "secret"), self._login())
+
+        parse.assert_called_once_with(file=self.netrc_path)
+
+    def test_netrc_file_is_parsed_again_when_it_changes(self):
+        self.assertEqual(("user", "secret"), self._login())
+
+        self._write("other", "password")
+        os.utime(self.netrc_path, ns=(0, 0))
+
+        self.assertEqual(("other", "password"), self._login())
+
+    def test_missing_netrc_file(self):
+        with self.assertRaises(FileNotFoundError):
+            load_netrc(self.netrc_path + ".missing")
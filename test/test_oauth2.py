@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+import unittest
+import unittest.mock as mock
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import BaseAdapter
+
+import qrest
+from qrest.auth.oauth2 import OAuth2AuthConfig, OAuth2TokenError
+from qrest.exception import RestClientConfigurationError
+
+from . import jsonplaceholderconfig
+
+TOKEN_URL = "https://auth.example.com/oauth2/token"
+
+
+class TokenServer:
+    """Fake OAuth2 token end-point that counts the token requests and issues numbered tokens."""
+
+    def __init__(self, expires_in=3600):
+        self.expires_in = expires_in
+        self.issued = 0
+        self.delay = 0.0
+        self.released = threading.Event()
+        self.released.set()
+        self.down = False
+        self.lock = threading.Lock()
+
+    def post(self, url, data, auth, **kwargs):
+        if self.down:
+            raise requests.ConnectionError("token end-point is down")
+        self.released.wait(5)
+        time.sleep(self.delay)
+        with self.lock:
+            self.issued += 1
+            token = f"token-{self.issued}"
+        response = mock.Mock(spec=requests.Response)
+        response.status_code = 200
+        response.ok = auth == ("client", "secret")
+        response.json = mock.Mock(
+            return_value={
+                "access_token": token,
+                "token_type": "Bearer",
+                "expires_in": self.expires_in,
+            }
+        )
+        return response
+
+
+class RevokingAdapter(BaseAdapter):
+    """Transport adapter of a server that rejects the access tokens in revoked."""
+
+    def __init__(self, revoked):
+        super().__init__()
+        self.revoked = revoked
+        self.tokens = []
+
+    def send(self, request, **kwargs):
+        token = request.headers["Authorization"]
+        self.tokens.append(token)
+        response = requests.Response()
+        response.status_code = 401 if token in self.revoked else 200
+        response._content = b"[]"
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+def create_api(refresh_margin=60):
+    auth_config = OAuth2AuthConfig(TOKEN_URL, scope="read", refresh_margin=refresh_margin)
+    config_class = jsonplaceholderconfig.JsonPlaceHolderConfig
+    with mock.patch.object(config_class, "authentication", auth_config):
+        return qrest.API(jsonplaceholderconfig)
+
+
+class OAuth2AuthTests(unittest.TestCase):
+    def setUp(self):
+        self.server = TokenServer()
+        post = mock.patch("requests.Session.post", side_effect=self.server.post)
+        self.post = post.start()
+        self.addCleanup(post.stop)
+
+        self.api = create_api()
+        self.api.auth.set_credentials(client_id="client", client_secret="secret")
+
+    def _request(self, **kwargs):
+        prepared = requests.Request(kwargs["method"], kwargs["url"]).prepare()
+        kwargs["auth"](prepared)
+        response = mock.Mock(spec=requests.Response)
+        response.status_code = 200
+        response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        response.json = mock.Mock(return_value=prepared.headers["Authorization"])
+        return response
+
+    def test_token_is_requested_with_the_client_credentials(self):
+        self.assertEqual(1, self.server.issued)
+        kwargs = self.post.call_args.kwargs
+        self.assertEqual(TOKEN_URL, kwargs["url"])
+        self.assertEqual({"grant_type": "client_credentials", "scope": "read"}, kwargs["data"])
+
+    def test_token_is_reused(self):
+        with mock.patch("requests.Session.request", side_effect=self._request):
+            for _ in range(10):
+                self.assertEqual("Bearer token-1", self.api.all_posts())
+
+        self.assertEqual(1, self.server.issued)
+
+    def test_token_is_refreshed_ahead_of_expiry(self):
+        with mock.patch("time.monotonic", return_value=time.monotonic() + 3590):
+            self.assertEqual("token-2", self.api.auth.access_token())
+        self.assertEqual(2, self.server.issued)
+
+    def test_expires_in_as_a_string_is_a_number_of_seconds(self):
+        self.server.expires_in = "3600"
+        self.api.auth.invalidate_access_token()
+        self.assertEqual("token-2", self.api.auth.access_token())
+
+        with mock.patch("time.monotonic", return_value=time.monotonic() + 3590):
+            self.assertEqual("token-3", self.api.auth.access_token())
+
+    def test_expires_in_that_is_not_a_number_never_expires(self):
+        self.server.expires_in = "soon"
+        self.api.auth.invalidate_access_token()
+        self.assertEqual("token-2", self.api.auth.access_token())
+
+        with mock.patch("time.monotonic", return_value=time.monotonic() + 10 ** 6):
+            self.assertEqual("token-2", self.api.auth.access_token())
+
+    def test_concurrent_threads_share_a_single_refresh(self):
+        self.api.auth.invalidate_access_token()
+        self.server.delay = 0.05
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            tokens = list(executor.map(lambda _: self.api.auth.access_token(), range(10)))
+
+        self.assertEqual(["token-2"] * 10, tokens)
+        self.assertEqual(2, self.server.issued)
+
+    def test_concurrent_tasks_share_a_single_refresh(self):
+        self.api.auth.invalidate_access_token()
+        self.server.delay = 0.05
+
+        async def main():
+            calls = [self.api.all_posts.acall() for _ in range(10)]
+            return await asyncio.gather(*calls)
+
+        with mock.patch("requests.Session.request", side_effect=self._request):
+            tokens = asyncio.run(main())
+
+        self.assertEqual(["Bearer token-2"] * 10, tokens)
+        self.assertEqual(2, self.server.issued)
+
+    def test_valid_token_is_used_during_a_refresh(self):
+        self.server.released.clear()
+        refresh_due = time.monotonic() + 3590
+        with mock.patch("time.monotonic", return_value=refresh_due):
+            refresh = threading.Thread(target=self.api.auth.access_token)
+            refresh.start()
+            while not self.api.auth._refreshing:
+                time.sleep(0.001)
+
+            self.assertEqual("token-1", self.api.auth.access_token())
+            self.server.released.set()
+            refresh.join()
+
+            self.assertEqual("token-2", self.api.auth.access_token())
+
+    def test_failed_refresh_keeps_the_valid_token(self):
+        self.server.down = True
+
+        with mock.patch("time.monotonic", return_value=time.monotonic() + 3590):
+            self.assertEqual("token-1", self.api.auth.access_token())
+
+    def _session(self, adapter):
+        session = requests.Session()
+        session.mount("https://", adapter)
+        return session
+
+    def test_rejected_token_is_renewed(self):
+        adapter = RevokingAdapter(revoked={"Bearer token-1"})
+        url = "https://jsonplaceholder.typicode.com/posts"
+
+        response = self._session(adapter).get(url, auth=self.api.auth)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(401, response.history[0].status_code)
+        self.assertEqual(["Bearer token-1", "Bearer token-2"], adapter.tokens)
+
+    def test_request_with_a_streamed_body_is_not_resent(self):
+        adapter = RevokingAdapter(revoked={"Bearer token-1"})
+        url = "https://jsonplaceholder.typicode.com/posts"
+
+        response = self._session(adapter).request(
+            "POST", url, data=iter([b"{}"]), auth=self.api.auth
+        )
+
+        self.assertEqual(401, response.status_code)
+        self.assertEqual(["Bearer token-1"], adapter.tokens)
+        self.assertEqual("token-2", self.api.auth.access_token())
+
+    def test_bad_credentials(self):
+        api = create_api()
+        with self.assertRaises(OAuth2TokenError):
+            api.auth.set_credentials(client_id="client", client_secret="wrong")
+
+    def test_bad_configuration(self):
+        with self.assertRaises(RestClientConfigurationError):
+            OAuth2AuthConfig("token")
+        with self.assertRaises(RestClientConfigurationError):
+            OAuth2AuthConfig(TOKEN_URL, refresh_margin=-1)
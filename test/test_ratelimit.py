@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.exception import RestClientConfigurationError, RestDeadlineExceededError
+from qrest.ratelimit import TokenBucket
+
+from . import jsonplaceholderconfig
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_burst_up_to_capacity_does_not_wait(self):
+        bucket = TokenBucket(rate=1, capacity=3)
+
+        with mock.patch("time.sleep") as sleep:
+            for _ in range(3):
+                bucket.acquire()
+
+            sleep.assert_not_called()
+
+    def test_request_beyond_capacity_waits_for_the_refill(self):
+        bucket = TokenBucket(rate=10, capacity=1)
+
+        with mock.patch("time.sleep") as sleep:
+            bucket.acquire()
+            bucket.acquire()
+
+            (wait,), _ = sleep.call_args
+            self.assertAlmostEqual(0.1, wait, places=2)
+
+    def test_waiting_requests_reserve_consecutive_tokens(self):
+        bucket = TokenBucket(rate=10, capacity=1)
+        waits = []
+
+        with mock.patch("time.sleep", side_effect=waits.append):
+            threads = [threading.Thread(target=bucket.acquire) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(3, len(waits))
+        for expected, wait in zip([0.1, 0.2, 0.3], sorted(waits)):
+            self.assertAlmostEqual(expected, wait, places=2)
+
+    def test_task_awaits_the_refill(self):
+        bucket = TokenBucket(rate=10, capacity=1)
+
+        async def main():
+            await bucket.aacquire()
+            await bucket.aacquire()
+
+        with mock.patch("asyncio.sleep", new=mock.AsyncMock()) as sleep:
+            asyncio.run(main())
+
+            (wait,), _ = sleep.call_args
+            self.assertAlmostEqual(0.1, wait, places=2)
+
+    def test_deadline_limits_the_wait(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        bucket.acquire()
+
+        with mock.patch("time.sleep") as sleep:
+            with qrest.deadline(0.5):
+                with self.assertRaises(RestDeadlineExceededError):
+                    bucket.acquire()
+            sleep.assert_not_called()
+
+            # the token of the request that gave up goes to the next request
+            bucket.acquire()
+            (wait,), _ = sleep.call_args
+            self.assertLessEqual(wait, 1)
+
+    def test_deadline_limits_the_wait_of_a_task(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+
+        async def main():
+            await bucket.aacquire()
+            with qrest.deadline(0.5):
+                await bucket.aacquire()
+
+        with self.assertRaises(RestDeadlineExceededError):
+            asyncio.run(main())
+
+    def test_bad_configuration(self):
+        with self.assertRaises(RestClientConfigurationError):
+            TokenBucket(rate=0)
+        with self.assertRaises(RestClientConfigurationError):
+            TokenBucket(rate=1, capacity=0)
+
+
+class RateLimitResourceTests(unittest.TestCase):
+    def setUp(self):
+        self.mock_response = mock.Mock(spec=requests.Response)
+        self.mock_response.status_code = 200
+        self.mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        self.mock_response.json = mock.Mock(return_value=[])
+
+    def test_api_and_resource_limits_are_acquired_before_each_request(self):
+        api_bucket = mock.Mock(spec=TokenBucket)
+        resource_bucket = mock.Mock(spec=TokenBucket)
+
+        api = qrest.API(jsonplaceholderconfig)
+        api.config.rate_limit = api_bucket
+        api.all_posts.config.rate_limit = resource_bucket
+
+        with mock.patch("requests.Session.request", return_value=self.mock_response):
+            api.all_posts()
+            api.single_post(item=1)
+
+        self.assertEqual(2, api_bucket.acquire.call_count)
+        self.assertEqual(1, resource_bucket.acquire.call_count)
@@ -0,0 +1,188 @@
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.exception import RestClientConfigurationError, RestInternalServerError
+from qrest.retry import RetryBudget, RetryPolicy
+
+from . import jsonplaceholderconfig
+
+
+def _create_mock_response(status_code, headers=None):
+    mock_response = mock.Mock(spec=requests.Response)
+    mock_response.status_code = status_code
+    mock_response.reason = "reason"
+    mock_response.url = "https://jsonplaceholder.typicode.com/posts"
+    mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+    mock_response.headers.update(headers or {})
+    mock_response.json = mock.Mock(return_value=[])
+    return mock_response
+
+
+class RetryPolicyTests(unittest.TestCase):
+    def test_backoff_stays_within_bounds(self):
+        policy = RetryPolicy(base_delay=0.1, max_delay=1.0)
+
+        delay = None
+        for _ in range(100):
+            delay = policy.backoff(delay)
+            self.assertGreaterEqual(delay, 0.1)
+            self.assertLessEqual(delay, 1.0)
+
+    def test_retry_after_in_seconds_is_honored(self):
+        policy = RetryPolicy()
+        response = _create_mock_response(503, {"Retry-After": "7"})
+
+        self.assertEqual(7.0, policy.delay(None, response))
+
+    def test_retry_after_as_date_is_honored(self):
+        policy = RetryPolicy()
+        response = _create_mock_response(429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+
+        self.assertEqual(0.0, policy.delay(None, response))
+
+    def test_retry_after_longer_than_maximum_stops_the_retries(self):
+        policy = RetryPolicy(max_retry_after=5)
+        response = _create_mock_response(503, {"Retry-After": "7"})
+
+        self.assertIsNone(policy.delay(None, response))
+
+    def test_only_idempotent_methods_are_retried_by_default(self):
+        policy = RetryPolicy()
+
+        self.assertTrue(policy.can_retry("GET", 1))
+        self.assertTrue(policy.can_retry("PUT", 1))
+        self.assertFalse(policy.can_retry("POST", 1))
+
+    def test_bad_configuration(self):
+        with self.assertRaises(RestClientConfigurationError):
+            RetryPolicy(max_attempts=0)
+        with self.assertRaises(RestClientConfigurationError):
+            RetryPolicy(base_delay=2, max_delay=1)
+        with self.assertRaises(RestClientConfigurationError):
+            RetryPolicy(budget=10)
+
+
+class RetryBudgetTests(unittest.TestCase):
+    def test_failures_exhaust_the_budget(self):
+        budget = RetryBudget(max_tokens=10, token_ratio=0.1)
+
+        for _ in range(5):
+            self.assertTrue(budget.allows_retry())
+            budget.record_failure()
+
+        self.assertFalse(budget.allows_retry())
+
+    def test_successes_replenish_the_budget(self):
+        budget = RetryBudget(max_tokens=10, token_ratio=0.5)
+        for _ in range(5):
+            budget.record_failure()
+
+        budget.record_success()
+
+        self.assertTrue(budget.allows_retry())
+
+
+@mock.patch("time.sleep")
+class RetryResourceTests(unittest.TestCase):
+    def setUp(self):
+        self.api = qrest.API(jsonplaceholderconfig)
+        self.api.all_posts.config.retry = RetryPolicy(max_attempts=3)
+        self.api.create_post.config.retry = RetryPolicy(max_attempts=3)
+
+    def test_transient_server_error_is_retried(self, sleep):
+        responses = [_create_mock_response(503), _create_mock_response(200)]
+        with mock.patch("requests.Session.request", side_effect=responses) as request:
+            self.assertEqual([], self.api.all_posts())
+
+            self.assertEqual(2, request.call_count)
+            self.assertEqual(1, sleep.call_count)
+
+    def test_connection_error_is_retried(self, sleep):
+        responses = [requests.ConnectionError("reset"), _create_mock_response(200)]
+        with mock.patch("requests.Session.request", side_effect=responses) as request:
+            self.assertEqual([], self.api.all_posts())
+
+            self.assertEqual(2, request.call_count)
+
+    def test_last_error_is_raised_when_attempts_are_exhausted(self, sleep):
+        with mock.patch(
+            "requests.Session.request", return_value=_create_mock_response(500)
+        ) as request:
+            with self.assertRaises(RestInternalServerError):
+                self.api.all_posts()
+
+            self.assertEqual(3, request.call_count)
+
+    def test_post_is_not_retried(self, sleep):
+        with mock.patch(
+            "requests.Session.request", return_value=_create_mock_response(500)
+        ) as request:
+            with self.assertRaises(RestInternalServerError):
+                self.api.create_post(title="title", content="content")
+
+            self.assertEqual(1, request.call_count)
+
+    def test_retried_upload_sends_the_whole_file(self, sleep):
+        self.api.upload_file.config.retry = RetryPolicy(max_attempts=3, methods=["POST"])
+        bodies = []
+
+        def request(**kwargs):
+            (_, (_, upload)), = kwargs["files"]
+            bodies.append(upload.read())
+            return _create_mock_response(503 if len(bodies) < 3 else 200)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "upload.txt")
+            with open(path, "wb") as upload:
+                upload.write(b"content" * 100)
+            with open(path, "rb") as upload:
+                with mock.patch("requests.Session.request", side_effect=request):
+                    self.api.upload_file(file=("upload.txt", upload))
+
+        self.assertEqual([b"content" * 100] * 3, bodies)
+
+    def test_upload_that_cannot_be_rewound_is_not_retried(self, sleep):
+        self.api.upload_file.config.retry = RetryPolicy(max_attempts=3, methods=["POST"])
+        upload = mock.Mock(spec=io.BufferedReader)
+        upload.seekable.return_value = False
+
+        with mock.patch(
+            "requests.Session.request", return_value=_create_mock_response(503)
+        ) as request:
+            with self.assertRaises(Exception):
+                self.api.upload_file(file=("upload.txt", upload))
+
+            self.assertEqual(1, request.call_count)
+
+    def test_retry_after_is_honored(self, sleep):
+        responses = [_create_mock_response(429, {"Retry-After": "2"}), _create_mock_response(200)]
+        with mock.patch("requests.Session.request", side_effect=responses):
+            self.api.all_posts()
+
+            sleep.assert_called_once_with(2.0)
+
+    def test_no_retry_without_policy(self, sleep):
+        self.api.all_posts.config.retry = None
+        with mock.patch(
+            "requests.Session.request", return_value=_create_mock_response(503)
+        ) as request:
+            with self.assertRaises(Exception):
+                self.api.all_posts()
+
+            self.assertEqual(1, request.call_count)
+
+    def test_transient_server_error_is_retried_from_a_task(self, sleep):
+        responses = [_create_mock_response(503), _create_mock_response(200)]
+        with mock.patch("asyncio.sleep", new=mock.AsyncMock()) as async_sleep:
+            with mock.patch("requests.Session.request", side_effect=responses) as request:
+                self.assertEqual([], asyncio.run(self.api.all_posts.acall()))
+
+                self.assertEqual(2, request.call_count)
+                self.assertEqual(1, async_sleep.await_count)
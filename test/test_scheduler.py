@@ -0,0 +1,281 @@
+import asyncio
+import threading
+import time
+import unittest
+import unittest.mock as mock
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import qrest
+from qrest.exception import (
+    RestClientConfigurationError,
+    RestDeadlineExceededError,
+    RestRequestShedError,
+)
+from qrest.scheduler import RequestScheduler, current_priority
+
+from . import jsonplaceholderconfig
+
+URL = "https://jsonplaceholder.typicode.com/posts"
+
+
+class RequestSchedulerTests(unittest.TestCase):
+    def _wait_in_thread(self, scheduler, priority, order, errors=None):
+        def wait():
+            try:
+                with scheduler.slot(URL, priority):
+                    order.append(priority)
+            except RestRequestShedError:
+                errors.append(priority)
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        # give the thread the time to join the queue
+        time.sleep(0.05)
+        return thread
+
+    def test_waiting_requests_go_in_the_order_of_their_priority(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+        order = []
+
+        with scheduler.slot(URL):
+            threads = [
+                self._wait_in_thread(scheduler, priority, order)
+                for priority in ["low", "normal", "high"]
+            ]
+            self.assertEqual(1, scheduler.in_flight("jsonplaceholder.typicode.com"))
+            self.assertEqual(3, scheduler.queued("jsonplaceholder.typicode.com"))
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(["high", "normal", "low"], order)
+        self.assertEqual(0, scheduler.in_flight("jsonplaceholder.typicode.com"))
+
+    def test_full_queue_sheds_the_lowest_priority_first(self):
+        scheduler = RequestScheduler(max_in_flight=1, max_queued=1)
+        order, errors = [], []
+
+        with scheduler.slot(URL):
+            low = self._wait_in_thread(scheduler, "low", order, errors)
+            high = self._wait_in_thread(scheduler, "high", order, errors)
+            low.join()
+            self.assertEqual(["low"], errors)
+
+            with self.assertRaises(RestRequestShedError):
+                with scheduler.slot(URL, "normal"):
+                    pass
+        high.join()
+
+        self.assertEqual(["high"], order)
+
+    def test_hosts_have_separate_limits(self):
+        scheduler = RequestScheduler(max_in_flight=1, max_queued=0)
+
+        with scheduler.slot(URL):
+            with scheduler.slot("https://example.com/posts"):
+                pass
+
+    def test_deadline_limits_the_wait(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+
+        with scheduler.slot(URL):
+            with qrest.deadline(0.05):
+                with self.assertRaises(RestDeadlineExceededError):
+                    with scheduler.slot(URL):
+                        pass
+
+        self.assertEqual(0, scheduler.queued("jsonplaceholder.typicode.com"))
+
+    def test_tasks_wait_in_the_order_of_their_priority(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+        order = []
+
+        async def wait(priority):
+            await scheduler.aacquire(URL, priority)
+            order.append(priority)
+            scheduler.release(URL)
+
+        async def main():
+            await scheduler.aacquire(URL)
+            tasks = [asyncio.ensure_future(wait(p)) for p in ["low", "normal", "high"]]
+            await asyncio.sleep(0.05)
+            self.assertEqual(3, scheduler.queued("jsonplaceholder.typicode.com"))
+            scheduler.release(URL)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(main())
+
+        self.assertEqual(["high", "normal", "low"], order)
+        self.assertEqual(0, scheduler.in_flight("jsonplaceholder.typicode.com"))
+
+    def test_deadline_limits_the_wait_of_a_task(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+
+        async def main():
+            await scheduler.aacquire(URL)
+            with qrest.deadline(0.05):
+                with self.assertRaises(RestDeadlineExceededError):
+                    await scheduler.aacquire(URL)
+
+        asyncio.run(main())
+
+        self.assertEqual(0, scheduler.queued("jsonplaceholder.typicode.com"))
+
+    def test_cancelled_task_leaves_the_queue(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+
+        async def main():
+            await scheduler.aacquire(URL)
+            task = asyncio.ensure_future(scheduler.aacquire(URL))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            scheduler.release(URL)
+
+        asyncio.run(main())
+
+        self.assertEqual(0, scheduler.queued("jsonplaceholder.typicode.com"))
+        self.assertEqual(0, scheduler.in_flight("jsonplaceholder.typicode.com"))
+
+    def test_bad_configuration(self):
+        with self.assertRaises(RestClientConfigurationError):
+            RequestScheduler(max_in_flight=0)
+        with self.assertRaises(RestClientConfigurationError):
+            RequestScheduler(default_priority="urgent")
+        with self.assertRaises(RestClientConfigurationError):
+            with RequestScheduler().slot(URL, "urgent"):
+                pass
+
+
+class SchedulerResourceTests(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = RequestScheduler()
+        self.api = qrest.API(jsonplaceholderconfig)
+        self.api.config.scheduler = self.scheduler
+
+        self.mock_response = mock.Mock(spec=requests.Response)
+        self.mock_response.status_code = 200
+        self.mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        self.mock_response.json = mock.Mock(return_value=[])
+
+    def _priority_of_call(self, function):
+        with mock.patch.object(self.scheduler, "slot", wraps=self.scheduler.slot) as slot:
+            with mock.patch("requests.Session.request", return_value=self.mock_response):
+                function()
+            (_, priority), _ = slot.call_args
+            return priority
+
+    def test_priority_of_the_resource_config_is_the_default(self):
+        self.api.all_posts.config.priority = "low"
+
+        self.assertEqual("low", self._priority_of_call(self.api.all_posts))
+
+    def test_priority_of_the_call_overrides_the_default(self):
+        self.api.all_posts.config.priority = "low"
+
+        def call():
+            with qrest.priority("high"):
+                self.api.all_posts()
+
+        self.assertEqual("high", self._priority_of_call(call))
+
+    def test_timeout_starts_when_the_slot_is_granted(self):
+        self.scheduler.max_in_flight = 1
+        self.api.all_posts.config.read_timeout = 10
+        granted = threading.Event()
+
+        def hold_the_slot():
+            with self.scheduler.slot(URL):
+                granted.set()
+                time.sleep(0.3)
+
+        thread = threading.Thread(target=hold_the_slot)
+        thread.start()
+        granted.wait(5)
+        with mock.patch("requests.Session.request", return_value=self.mock_response) as request:
+            with qrest.deadline(1):
+                self.api.all_posts()
+        thread.join()
+
+        _, read_timeout = request.call_args.kwargs["timeout"]
+        self.assertLess(read_timeout, 0.9)
+
+    def _durations_after_waiting_for_a_slot(self, call):
+        """Return the latency and the duration of the attempt the resource records for the given
+        call, which waits 0.3 seconds for its slot.
+
+        """
+        self.scheduler.max_in_flight = 1
+        resource = self.api.all_posts
+        granted = threading.Event()
+
+        def hold_the_slot():
+            with self.scheduler.slot(URL):
+                granted.set()
+                time.sleep(0.3)
+
+        thread = threading.Thread(target=hold_the_slot)
+        thread.start()
+        granted.wait(5)
+        with mock.patch.object(
+            resource._latencies, "record", wraps=resource._latencies.record
+        ) as record, mock.patch.object(
+            resource, "_after_attempt", wraps=resource._after_attempt
+        ) as after_attempt:
+            with mock.patch("requests.Session.request", return_value=self.mock_response):
+                call(resource)
+        thread.join()
+
+        (latency,), _ = record.call_args
+        (duration, _, _), _ = after_attempt.call_args
+        return latency, duration
+
+    def test_wait_for_the_slot_is_not_part_of_the_latency(self):
+        latency, duration = self._durations_after_waiting_for_a_slot(lambda resource: resource())
+
+        self.assertLess(latency, 0.2)
+        self.assertLess(duration, 0.2)
+
+    def test_wait_of_a_task_for_the_slot_is_not_part_of_the_latency(self):
+        latency, duration = self._durations_after_waiting_for_a_slot(
+            lambda resource: asyncio.run(resource.acall())
+        )
+
+        self.assertLess(latency, 0.2)
+        self.assertLess(duration, 0.2)
+
+    def test_tasks_wait_for_a_slot_without_a_thread_of_the_executor(self):
+        self.scheduler.max_in_flight = 1
+        order = []
+
+        def request(**kwargs):
+            order.append(current_priority())
+            return self.mock_response
+
+        async def call(priority):
+            with qrest.priority(priority):
+                await self.api.all_posts.acall()
+
+        async def main():
+            # a task that waited in a thread would keep the only thread from the other tasks
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=1))
+            await self.scheduler.aacquire(URL)
+            tasks = [asyncio.ensure_future(call(priority)) for priority in ["low", "high"]]
+            await asyncio.sleep(0.05)
+            self.assertEqual(2, self.scheduler.queued("jsonplaceholder.typicode.com"))
+            self.scheduler.release(URL)
+            await asyncio.gather(*tasks)
+
+        with mock.patch("requests.Session.request", side_effect=request):
+            asyncio.run(main())
+
+        self.assertEqual(["high", "low"], order)
+
+    def test_unknown_priority_of_resource_is_rejected(self):
+        config_class = jsonplaceholderconfig.JsonPlaceHolderConfig
+        with mock.patch.object(jsonplaceholderconfig.AllPosts, "priority", "urgent", create=True):
+            with mock.patch.object(config_class, "scheduler", self.scheduler):
+                with self.assertRaises(RestClientConfigurationError):
+                    qrest.API(jsonplaceholderconfig)
@@ -0,0 +1,136 @@
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.conf import ResourceConfig
+from qrest.exception import RestClientConfigurationError
+from qrest.snapshot import snapshot_path
+
+from .generatedconfig import ENDPOINT
+
+HEADER = '''
+from qrest import APIConfig, ResourceConfig, QueryParameter
+from qrest.retry import RetryBudget, RetryPolicy
+
+
+class GeneratedConfig(APIConfig):
+    url = "https://api.example.com"
+    default_headers = {{"Content-type": "application/json; charset=UTF-8"}}
+    retry = RetryPolicy(max_attempts=2, base_delay=0, budget=RetryBudget())
+    read_timeout = {read_timeout}
+'''
+
+
+class SnapshotTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.module_dir = os.path.join(directory.name, "modules")
+        self.snapshot_dir = os.path.join(directory.name, "snapshots")
+        os.mkdir(self.module_dir)
+        sys.path.insert(0, self.module_dir)
+        self.addCleanup(sys.path.remove, self.module_dir)
+        self.addCleanup(sys.modules.pop, "snapshotconfig", None)
+
+    def _module(self, count, read_timeout=60):
+        """Write and import a configuration module with the given number of endpoints."""
+        source = [HEADER.format(read_timeout=read_timeout)]
+        source.extend(ENDPOINT.format(index=index) for index in range(count))
+        path = os.path.join(self.module_dir, "snapshotconfig.py")
+        with open(path, "w") as module_file:
+            module_file.write("\n".join(source))
+        # a rewrite within the same second must not import the bytecode of the previous module
+        os.utime(path, ns=(read_timeout * 10**9, read_timeout * 10**9))
+        sys.modules.pop("snapshotconfig", None)
+        importlib.invalidate_caches()
+        return importlib.import_module("snapshotconfig")
+
+    def test_snapshot_is_written_and_loaded_without_validation(self):
+        module = self._module(3)
+        eager = qrest.API(module)
+        qrest.API(module, snapshot_dir=self.snapshot_dir)
+        self.assertTrue(os.path.exists(snapshot_path(module, self.snapshot_dir)))
+
+        with mock.patch.object(ResourceConfig, "validate") as validate:
+            api = qrest.API(module, snapshot_dir=self.snapshot_dir)
+            validate.assert_not_called()
+
+        self.assertEqual(eager.resources, api.resources)
+        for name, config in eager.config.endpoints.items():
+            snapshot_config = api.config.endpoints[name]
+            self.assertEqual(config.headers, snapshot_config.headers)
+            self.assertEqual(config.path, snapshot_config.path)
+            self.assertEqual(sorted(config.parameters), sorted(snapshot_config.parameters))
+            self.assertEqual(config.read_timeout, snapshot_config.read_timeout)
+
+    def test_snapshot_shares_the_policies_of_the_module(self):
+        module = self._module(3)
+        qrest.API(module, snapshot_dir=self.snapshot_dir)
+        api = qrest.API(module, snapshot_dir=self.snapshot_dir)
+
+        self.assertIs(module.GeneratedConfig.retry, api.resource_0.config.retry)
+
+    def test_snapshot_sends_the_same_request(self):
+        response = mock.Mock(spec=requests.Response)
+        response.status_code = 200
+        response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        response.json = mock.Mock(return_value={"id": 1})
+        module = self._module(3)
+        qrest.API(module, snapshot_dir=self.snapshot_dir)
+
+        with mock.patch("requests.Session.request", return_value=response) as request:
+            qrest.API(module).resource_1(item_id=1, user_id=2)
+            eager_call = request.call_args
+            qrest.API(module, snapshot_dir=self.snapshot_dir).resource_1(item_id=1, user_id=2)
+
+            self.assertEqual(eager_call, request.call_args)
+
+    def test_changed_module_replaces_the_snapshot(self):
+        module = self._module(3)
+        qrest.API(module, snapshot_dir=self.snapshot_dir)
+
+        module = self._module(4, read_timeout=30)
+        with mock.patch.object(ResourceConfig, "validate") as validate:
+            api = qrest.API(module, snapshot_dir=self.snapshot_dir)
+            validate.assert_called()
+        self.assertEqual(30, api.resource_3.config.read_timeout)
+
+        with mock.patch.object(ResourceConfig, "validate") as validate:
+            qrest.API(module, snapshot_dir=self.snapshot_dir)
+            validate.assert_not_called()
+
+    def test_corrupt_snapshot_is_replaced(self):
+        module = self._module(3)
+        os.makedirs(self.snapshot_dir)
+        with open(snapshot_path(module, self.snapshot_dir), "wb") as snapshot_file:
+            snapshot_file.write(b"not a snapshot")
+
+        api = qrest.API(module, snapshot_dir=self.snapshot_dir)
+
+        self.assertEqual(3, len(api.resources))
+        with mock.patch.object(ResourceConfig, "validate") as validate:
+            qrest.API(module, snapshot_dir=self.snapshot_dir)
+            validate.assert_not_called()
+
+    def test_lazy_api_cannot_use_a_snapshot(self):
+        module = self._module(3)
+        with self.assertRaises(RestClientConfigurationError):
+            qrest.API(module, lazy=True, snapshot_dir=self.snapshot_dir)
+
+    def test_changed_key_replaces_the_snapshot(self):
+        module = self._module(3)
+        qrest.API(module, snapshot_dir=self.snapshot_dir, snapshot_key="production")
+
+        with mock.patch.object(ResourceConfig, "validate") as validate:
+            qrest.API(module, snapshot_dir=self.snapshot_dir, snapshot_key="staging")
+            validate.assert_called()
+
+        with mock.patch.object(ResourceConfig, "validate") as validate:
+            qrest.API(module, snapshot_dir=self.snapshot_dir, snapshot_key="staging")
+            validate.assert_not_called()
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest.auth import UserPassAuthConfig
+from qrest.batching import BatchLoader
+
+from . import jsonplaceholderconfig
+
+
+class TenantTests(unittest.TestCase):
+    def setUp(self):
+        config_class = jsonplaceholderconfig.JsonPlaceHolderConfig
+        self.tenants = {}
+        with mock.patch.object(config_class, "authentication", UserPassAuthConfig()):
+            self.api = qrest.API(jsonplaceholderconfig)
+            for name in ["tenant1", "tenant2"]:
+                self.tenants[name] = self.api.create_auth()
+        self.api.auth.set_credentials(username="api", password="secret")
+        for name, auth in self.tenants.items():
+            auth.set_credentials(username=name, password="secret")
+        self.api.select_posts.config.max_url_length = 100
+
+        self.lock = threading.Lock()
+        self.logins = []
+
+    def _request(self, **kwargs):
+        with self.lock:
+            self.logins.append(kwargs["auth"].username)
+        mock_response = mock.Mock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+        mock_response.json = mock.Mock(return_value=[])
+        return mock_response
+
+    def test_calls_use_the_auth_of_the_tenant(self):
+        with mock.patch("requests.Session.request", side_effect=self._request):
+            self.api.all_posts()
+            with self.api.as_tenant(self.tenants["tenant1"]):
+                self.api.all_posts()
+                with self.api.as_tenant(self.tenants["tenant2"]):
+                    self.api.all_posts()
+                self.api.all_posts()
+            self.api.all_posts()
+
+        self.assertEqual(["api", "tenant1", "tenant2", "tenant1", "api"], self.logins)
+
+    def test_split_requests_use_the_auth_of_the_tenant(self):
+        post_ids = list(range(1000, 1050))
+        with mock.patch("requests.Session.request", side_effect=self._request):
+            with self.api.as_tenant(self.tenants["tenant1"]):
+                self.api.select_posts(post_id=post_ids)
+                asyncio.run(self.api.select_posts.acall(post_id=post_ids))
+
+        self.assertGreater(len(self.logins), 2)
+        self.assertEqual({"tenant1"}, set(self.logins))
+
+    def test_batches_use_the_auth_of_the_tenant(self):
+        loader = BatchLoader(
+            self.api.select_posts, parameter="post_id", key_field="id", window=0.1
+        )
+        batches = []
+
+        def request(**kwargs):
+            with self.lock:
+                batches.append((kwargs["auth"].username, sorted(kwargs["params"]["id"])))
+            return self._request(**kwargs)
+
+        def load(tenant, post_id):
+            with self.api.as_tenant(self.tenants[tenant]):
+                loader.load(post_id)
+
+        with mock.patch("requests.Session.request", side_effect=request):
+            threads = [
+                threading.Thread(target=load, args=args)
+                for args in [("tenant1", 1), ("tenant2", 2), ("tenant1", 3)]
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual([("tenant1", [1, 3]), ("tenant2", [2])], sorted(batches))
+
+    def test_tenants_share_the_resources_and_the_session(self):
+        with mock.patch("requests.Session.request", side_effect=self._request):
+            with self.api.as_tenant(self.tenants["tenant1"]):
+                self.api.all_posts()
+
+        for name in self.api.config.endpoints:
+            self.assertIs(self.api.session, getattr(self.api, name)._session)
+
+    def test_tenants_do_not_share_coalesced_requests(self):
+        self.api.all_posts.config.coalesce = True
+        release = threading.Event()
+
+        def request(**kwargs):
+            release.wait(5)
+            return self._request(**kwargs)
+
+        def call(tenant):
+            with self.api.as_tenant(self.tenants[tenant]):
+                self.api.all_posts()
+
+        with mock.patch("requests.Session.request", side_effect=request):
+            threads = [
+                threading.Thread(target=call, args=(tenant,))
+                for tenant in ["tenant1", "tenant1", "tenant2"]
+            ]
+            for thread in threads:
+                thread.start()
+            threading.Timer(0.1, release.set).start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(["tenant1", "tenant2"], sorted(self.logins))
+
+    def test_session_does_not_keep_cookies(self):
+        self.api.session.cookies.set("session", "tenant1", domain="jsonplaceholder.typicode.com")
+
+        self.assertEqual(0, len(self.api.session.cookies))
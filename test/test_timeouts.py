@@ -0,0 +1,173 @@
+import asyncio
+import unittest
+import unittest.mock as mock
+
+import requests
+
+import qrest
+from qrest import timeouts
+from qrest.timeouts import AdaptiveTimeout
+from qrest.exception import RestClientConfigurationError, RestDeadlineExceededError
+from qrest.latency import LatencySketch
+from qrest.retry import RetryPolicy
+
+from . import jsonplaceholderconfig
+
+
+def _create_mock_response(status_code=200, headers=None, **kwargs):
+    mock_response = mock.Mock(spec=requests.Response)
+    mock_response.status_code = status_code
+    mock_response.reason = "reason"
+    mock_response.url = "https://jsonplaceholder.typicode.com/posts"
+    mock_response.headers = {"Content-type": "application/json; charset=UTF-8"}
+    mock_response.headers.update(headers or {})
+    mock_response.json = mock.Mock(return_value=[])
+    return mock_response
+
+
+class DeadlineTests(unittest.TestCase):
+    def test_no_deadline_leaves_the_timeouts_as_is(self):
+        self.assertIsNone(timeouts.remaining())
+        self.assertEqual((3, 5), timeouts.request_timeout(3, 5))
+        self.assertIsNone(timeouts.request_timeout(None, None))
+
+    def test_deadline_limits_the_timeouts(self):
+        with qrest.deadline(2):
+            connect, read = timeouts.request_timeout(3, None)
+
+        self.assertLessEqual(connect, 2)
+        self.assertLessEqual(read, 2)
+
+    def test_nested_deadline_cannot_extend_the_outer_one(self):
+        with qrest.deadline(1):
+            with qrest.deadline(100):
+                self.assertLessEqual(timeouts.remaining(), 1)
+            with qrest.deadline(0.5):
+                self.assertLessEqual(timeouts.remaining(), 0.5)
+
+        self.assertIsNone(timeouts.remaining())
+
+    def test_passed_deadline_raises_the_proper_exception(self):
+        with qrest.deadline(0):
+            with self.assertRaises(RestDeadlineExceededError):
+                timeouts.request_timeout(3, 5)
+
+
+class AdaptiveTimeoutTests(unittest.TestCase):
+    def test_timeout_is_a_multiple_of_the_percentile(self):
+        adaptive_timeout = AdaptiveTimeout(percentile=99, multiplier=3, floor=0.1, min_samples=10)
+        latencies = LatencySketch()
+        for _ in range(100):
+            latencies.record(0.5)
+
+        self.assertAlmostEqual(1.5, adaptive_timeout.read_timeout(latencies), delta=0.015)
+
+    def test_timeout_stays_within_floor_and_ceiling(self):
+        adaptive_timeout = AdaptiveTimeout(floor=1, ceiling=10, min_samples=1)
+        fast, slow = LatencySketch(), LatencySketch()
+        fast.record(0.01)
+        slow.record(30)
+
+        self.assertEqual(1, adaptive_timeout.read_timeout(fast))
+        self.assertEqual(10, adaptive_timeout.read_timeout(slow))
+
+    def test_no_timeout_without_enough_latencies(self):
+        latencies = LatencySketch()
+        latencies.record(0.5)
+
+        self.assertIsNone(AdaptiveTimeout(min_samples=2).read_timeout(latencies))
+
+    def test_bad_configuration(self):
+        with self.assertRaises(RestClientConfigurationError):
+            AdaptiveTimeout(floor=10, ceiling=1)
+        with self.assertRaises(RestClientConfigurationError):
+            AdaptiveTimeout(multiplier=0.5)
+
+
+class TimeoutResourceTests(unittest.TestCase):
+    def setUp(self):
+        self.api = qrest.API(jsonplaceholderconfig)
+
+    def test_timeouts_of_the_api_are_the_default(self):
+        with mock.patch(
+            "requests.Session.request", return_value=_create_mock_response()
+        ) as request:
+            self.api.all_posts()
+
+            self.assertEqual((10, 60), request.call_args[1]["timeout"])
+
+    def test_resource_overrides_the_timeouts_of_the_api(self):
+        self.api.all_posts.config.read_timeout = 5
+
+        with mock.patch(
+            "requests.Session.request", return_value=_create_mock_response()
+        ) as request:
+            self.api.all_posts()
+
+            self.assertEqual((10, 5), request.call_args[1]["timeout"])
+
+    def test_adaptive_timeout_follows_the_observed_latencies(self):
+        self.api.all_posts.config.adaptive_timeout = AdaptiveTimeout(
+            multiplier=2, floor=0.1, min_samples=2
+        )
+
+        with mock.patch(
+            "requests.Session.request", return_value=_create_mock_response()
+        ) as request:
+            self.api.all_posts()
+            self.assertEqual((10, 60), request.call_args[1]["timeout"])
+
+            for _ in range(2):
+                self.api.all_posts._latencies.record(0.5)
+            self.api.all_posts()
+            _, read_timeout = request.call_args[1]["timeout"]
+            self.assertAlmostEqual(1.0, read_timeout, delta=0.01)
+
+    def test_deadline_is_shared_by_split_requests_in_other_threads(self):
+        self.api.select_posts.config.max_url_length = 100
+
+        with mock.patch("requests.Session.request", side_effect=_create_mock_response) as request:
+            with qrest.deadline(2):
+                self.api.select_posts(post_id=list(range(1000, 1050)))
+
+            self.assertGreater(request.call_count, 1)
+            for call in request.call_args_list:
+                self.assertLessEqual(call[1]["timeout"][1], 2)
+
+    def test_deadline_applies_to_a_task(self):
+        with mock.patch(
+            "requests.Session.request", return_value=_create_mock_response()
+        ) as request:
+            with qrest.deadline(2):
+                asyncio.run(self.api.all_posts.acall())
+
+            self.assertLessEqual(request.call_args[1]["timeout"][1], 2)
+
+    def test_passed_deadline_sends_no_request(self):
+        with mock.patch(
+            "requests.Session.request", return_value=_create_mock_response()
+        ) as request:
+            with qrest.deadline(0):
+                with self.assertRaises(RestDeadlineExceededError):
+                    self.api.all_posts()
+
+            request.assert_not_called()
+
+    @mock.patch("time.sleep")
+    def test_no_retry_beyond_the_deadline(self, sleep):
+        self.api.all_posts.config.retry = RetryPolicy(max_attempts=3)
+        response = _create_mock_response(503, {"Retry-After": "5"})
+
+        with mock.patch("requests.Session.request", return_value=response) as request:
+            with qrest.deadline(2):
+                with self.assertRaises(Exception):
+                    self.api.all_posts()
+
+            self.assertEqual(1, request.call_count)
+            sleep.assert_not_called()
+
+    def test_bad_configuration(self):
+        with self.assertRaises(RestClientConfigurationError):
+            qrest.ResourceConfig(path=["posts"], method="GET", connect_timeout=0)
+        with self.assertRaises(RestClientConfigurationError):
+            qrest.ResourceConfig(path=["posts"], method="GET", read_timeout="60")